@@ -0,0 +1,327 @@
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+
+def _normalized(vectors):
+    # An EmbeddingStore gives its float32 vectors through np.asarray
+    if sp.issparse(vectors):
+        return normalize(sp.csr_matrix(vectors, dtype=np.float32))
+    return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def _dot(vectors, query):
+    '''Returns the dot products of every row of vectors (dense or sparse) with one dense query vector.'''
+
+    return np.asarray(vectors @ query).ravel()
+
+
+def _attach(index, path, vectors):
+    if index.orders.shape[0] != vectors.shape[0]:
+        raise ValueError(f'{path} indexes {index.orders.shape[0]} vectors, got {vectors.shape[0]}')
+    index.vectors = _normalized(vectors)
+    return index
+
+
+class _AnnIndex:
+    '''What LshIndex and IvfIndex share: each finds candidate rows for a query its own way, then the
+    candidates are ranked exactly by cosine similarity.
+    '''
+
+    vectors = None
+
+    def __len__(self):
+        return 0 if self.vectors is None else self.vectors.shape[0]
+
+    def query(self, query, k=10, probes=None):
+        '''Takes a query vector (dense, or a 1 row sparse matrix) and returns (rows, scores) for its k
+        most similar indexed vectors by cosine similarity, most similar first. Fewer than k come back if
+        there are fewer candidates.
+        '''
+
+        if sp.issparse(query):
+            query = query.toarray()
+        query = np.asarray(query, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        rows = self.candidates(query, probes)
+        scores = _dot(self.vectors[rows], query)
+        if len(rows) > k:
+            top = np.argpartition(scores, -k)[-k:]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def query_row(self, row, k=10, probes=None):
+        '''Same as query() for a vector already in the index, given its row number (it'll be in the results).'''
+
+        vector = self.vectors[row]
+        return self.query(vector.toarray() if sp.issparse(vector) else vector, k, probes)
+
+
+class LshIndex(_AnnIndex):
+    '''Approximate nearest neighbor index for cosine similarity, by random-projection LSH.
+
+    Each of n_tables hash tables gives every vector an n_bits signature, one bit per random hyperplane
+    (which side of it the vector falls on), so similar vectors tend to share buckets. A query collects
+    the dishes in its own bucket in every table, plus the probes nearest buckets (the ones reached by
+    flipping the bits it was closest to the hyperplane on), and ranks just those candidates exactly.
+
+    More tables or probes raise recall and cost; more bits make buckets smaller, queries faster and
+    recall lower. Best on dense embedding weights; see IvfIndex for TF-IDF rows. Buckets are kept as
+    sorted arrays rather than dicts, so save/load is a single np.savez.
+
+    Arguments: int (optional), int (optional), int (optional), int (optional)
+    '''
+
+    def __init__(self, n_tables=8, n_bits=14, probes=2, seed=0):
+        if n_bits > 63:
+            raise ValueError("n_bits can be at most 63")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probes = probes
+        self.seed = seed
+        self.vectors = None
+        self.planes = None
+        self.orders = None
+        self.keys = None
+
+    def __repr__(self):
+        return f'LshIndex(n_tables={self.n_tables}, n_bits={self.n_bits}, probes={self.probes})'
+
+    def build(self, vectors):
+        '''Takes an (n, dim) array or sparse matrix of vectors and indexes them. Returns the index.'''
+
+        self.vectors = _normalized(vectors)
+        rng = np.random.default_rng(self.seed)
+        self.planes = rng.standard_normal((self.vectors.shape[1], self.n_tables * self.n_bits)).astype(np.float32)
+
+        keys = self._keys(np.asarray(self.vectors @ self.planes))
+        self.orders = np.argsort(keys, axis=0, kind="stable").astype(np.int32)
+        self.keys = np.take_along_axis(keys, self.orders, axis=0)
+        return self
+
+    def _keys(self, projections):
+        '''Takes (rows, n_tables * n_bits) projections and returns (rows, n_tables) integer bucket keys.'''
+
+        bits = (projections > 0).reshape(len(projections), self.n_tables, self.n_bits)
+        weights = np.left_shift(np.uint64(1), np.arange(self.n_bits, dtype=np.uint64))
+        return (bits.astype(np.uint64) * weights).sum(axis=2, dtype=np.uint64)
+
+    def candidates(self, query, probes=None):
+        '''Returns the row numbers sharing a bucket with query (a dense vector) in any table, including the
+        probes nearest buckets in each.
+        '''
+
+        probes = self.probes if probes is None else probes
+        projection = (query @ self.planes).reshape(self.n_tables, self.n_bits)
+        key = self._keys(projection.reshape(1, -1))[0]
+
+        found = []
+        for table in range(self.n_tables):
+            table_keys = [key[table]]
+            # Flip the bits the query was nearest the hyperplane on, one at a time, closest first
+            for bit in np.argsort(np.abs(projection[table]))[:probes]:
+                table_keys.append(key[table] ^ np.uint64(1 << int(bit)))
+            column = self.keys[:, table]
+            for bucket in table_keys:
+                start, stop = np.searchsorted(column, [bucket, bucket + np.uint64(1)])
+                found.append(self.orders[start:stop, table])
+        if not found:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def save(self, path):
+        '''Saves the hash tables (not the vectors, which load() takes back).'''
+
+        with open(path, "wb") as to_write:
+            np.savez(to_write, params=np.array([self.n_tables, self.n_bits, self.probes, self.seed]),
+                     planes=self.planes, orders=self.orders, keys=self.keys)
+
+    @classmethod
+    def load(cls, path, vectors):
+        '''Takes a path written by save() and the vectors the index was built on.'''
+
+        with np.load(path) as data:
+            n_tables, n_bits, probes, seed = (int(value) for value in data["params"])
+            index = cls(n_tables, n_bits, probes, seed)
+            index.planes, index.orders, index.keys = data["planes"], data["orders"], data["keys"]
+        return _attach(index, path, vectors)
+
+
+class IvfIndex(_AnnIndex):
+    '''Approximate nearest neighbor index for cosine similarity, by an inverted file of k-means clusters.
+
+    The vectors are split into n_lists clusters by spherical k-means (trained on a sample of at most
+    train_size of them). A query is compared with the n_lists centroids, and only the dishes in its
+    probes closest clusters are ranked exactly. More probes raise recall and cost. Unlike LshIndex it
+    copes well with sparse TF-IDF rows, whose nearest neighbors are often only at a cosine of 0.2-0.4,
+    too far apart for random hyperplanes to keep them in the same bucket. Saved and loaded like LshIndex.
+
+    Arguments: int (optional), int (optional), int (optional), int (optional), int (optional)
+    '''
+
+    def __init__(self, n_lists=256, probes=8, iterations=10, train_size=20000, seed=0):
+        self.n_lists = n_lists
+        self.probes = probes
+        self.iterations = iterations
+        self.train_size = train_size
+        self.seed = seed
+        self.vectors = None
+        self.centroids = None
+        self.orders = None
+        self.offsets = None
+
+    def __repr__(self):
+        return f'IvfIndex(n_lists={self.n_lists}, probes={self.probes})'
+
+    def _assign(self, vectors, block_size=8192):
+        assigned = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], block_size):
+            assigned[start:start + block_size] = np.asarray(vectors[start:start + block_size] @ self.centroids.T).argmax(axis=1)
+        return assigned
+
+    def _centroids(self, vectors, assigned, n_lists):
+        members = sp.csr_matrix((np.ones(len(assigned), dtype=np.float32), (assigned, np.arange(len(assigned)))),
+                                shape=(n_lists, vectors.shape[0]))
+        sums = members @ vectors
+        return normalize(sums.toarray() if sp.issparse(sums) else np.asarray(sums)).astype(np.float32)
+
+    def build(self, vectors):
+        '''Takes an (n, dim) array or sparse matrix of vectors and indexes them. Returns the index.'''
+
+        self.vectors = _normalized(vectors)
+        n = self.vectors.shape[0]
+        n_lists = max(1, min(self.n_lists, n))
+        rng = np.random.default_rng(self.seed)
+        sample = self.vectors[np.sort(rng.choice(n, size=min(n, max(self.train_size, n_lists)), replace=False))]
+
+        start = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)]
+        self.centroids = (start.toarray() if sp.issparse(start) else np.array(start)).astype(np.float32)
+        for _ in range(self.iterations):
+            assigned = self._assign(sample)
+            centroids = self._centroids(sample, assigned, n_lists)
+            # Clusters that lost all their members keep their old centroid
+            empty = np.bincount(assigned, minlength=n_lists) == 0
+            centroids[empty] = self.centroids[empty]
+            self.centroids = centroids
+
+        assigned = self._assign(self.vectors)
+        self.orders = np.argsort(assigned, kind="stable").astype(np.int32)
+        self.offsets = np.searchsorted(assigned[self.orders], np.arange(n_lists + 1)).astype(np.int64)
+        return self
+
+    def candidates(self, query, probes=None):
+        '''Returns the row numbers in the probes clusters closest to query (a dense vector).'''
+
+        probes = min(self.probes if probes is None else probes, len(self.centroids))
+        closest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        return np.sort(np.concatenate([self.orders[self.offsets[c]:self.offsets[c + 1]] for c in closest]))
+
+    def save(self, path):
+        '''Saves the clusters (not the vectors, which load() takes back).'''
+
+        with open(path, "wb") as to_write:
+            np.savez(to_write, params=np.array([self.n_lists, self.probes, self.iterations, self.train_size, self.seed]),
+                     centroids=self.centroids, orders=self.orders, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path, vectors):
+        '''Takes a path written by save() and the vectors the index was built on.'''
+
+        with np.load(path) as data:
+            index = cls(*(int(value) for value in data["params"]))
+            index.centroids, index.orders, index.offsets = data["centroids"], data["orders"], data["offsets"]
+        return _attach(index, path, vectors)
+
+
+def exact_top_k(vectors, rows, k=10):
+    '''Returns the exact top-k rows by cosine similarity for each row number in rows, as a list of arrays.'''
+
+    vectors = _normalized(vectors)
+    results = []
+    for row in rows:
+        query = vectors[row].toarray().ravel() if sp.issparse(vectors) else vectors[row]
+        scores = _dot(vectors, query)
+        top = np.argpartition(scores, -k)[-k:]
+        results.append(top[np.argsort(-scores[top], kind="stable")])
+    return results
+
+
+def benchmark_ann(vectors, indexes, k=10, queries=200, seed=0):
+    '''Takes vectors (dense or sparse) and a list of unbuilt indexes (LshIndex or IvfIndex, with the settings to
+    try) and measures each against brute force on queries random rows: build time, mean query latency,
+    mean number of candidates ranked and recall@k (share of the exact top-k found). Prints a table and
+    returns it.
+
+    Arguments: array or sparse matrix, list of indexes, int (optional), int (optional), int (optional)
+    Returns: list of dicts
+    '''
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(vectors.shape[0], size=min(queries, vectors.shape[0]), replace=False)
+
+    start = time.perf_counter()
+    exact = exact_top_k(vectors, rows, k)
+    brute_ms = (time.perf_counter() - start) / len(rows) * 1000
+
+    results = []
+    print(f'{vectors.shape[0]:,} vectors, {vectors.shape[1]:,} dims, brute force: {brute_ms:.2f} ms/query')
+    print(f'{"index":45} {"build s":>8} {"ms/query":>9} {"speedup":>8} {"candidates":>11} {"recall@" + str(k):>10}')
+    for index in indexes:
+        start = time.perf_counter()
+        index.build(vectors)
+        build_seconds = time.perf_counter() - start
+
+        found, candidates = 0, 0
+        start = time.perf_counter()
+        for row, truth in zip(rows, exact):
+            approximate, _ = index.query_row(row, k)
+            found += len(np.intersect1d(approximate, truth))
+        query_ms = (time.perf_counter() - start) / len(rows) * 1000
+        for row in rows[:50]:
+            query = index.vectors[row].toarray().ravel() if sp.issparse(index.vectors) else index.vectors[row]
+            candidates += len(index.candidates(query))
+
+        result = {"index": repr(index), "build_seconds": build_seconds, "query_ms": query_ms, "speedup": brute_ms / query_ms,
+                  "candidates": candidates / min(50, len(rows)), "recall": found / (len(rows) * k)}
+        results.append(result)
+        print(f'{result["index"]:45} {build_seconds:>8.2f} {query_ms:>9.2f} {result["speedup"]:>7.1f}x '
+              f'{result["candidates"]:>11,.0f} {result["recall"]:>10.3f}')
+    return results
+
+
+def clustered_vectors(n, dim, clusters=1000, spread=0.35, seed=0):
+    '''Returns n synthetic dense vectors grouped around clusters random centers, standing in for dish embeddings.'''
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    return centers[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def default_indexes():
+    return [LshIndex(n_tables=4, n_bits=16, probes=0), LshIndex(n_tables=8, n_bits=14, probes=2),
+            LshIndex(n_tables=16, n_bits=14, probes=2), IvfIndex(n_lists=256, probes=4),
+            IvfIndex(n_lists=256, probes=8), IvfIndex(n_lists=256, probes=16)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k and latency of LshIndex and IvfIndex settings against brute force.")
+    parser.add_argument("--corpus", help="a saved Corpus (corpus.npz) to benchmark on its TF-IDF rows")
+    parser.add_argument("--dishes", type=int, default=100000, help="number of synthetic dense vectors otherwise")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.corpus:
+        from Corpus import Corpus
+        vectors = Corpus.load(args.corpus).matrix
+    else:
+        vectors = clustered_vectors(args.dishes, args.dim)
+    benchmark_ann(vectors, default_indexes(), k=args.k, queries=args.queries)
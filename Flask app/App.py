@@ -1,15 +1,34 @@
-from flask import Flask, render_template, url_for, request
+from flask import Flask, render_template, url_for, request, jsonify
 import os
+import hashlib
+import json
 import numpy as np
 import pandas as pd
 import pickle
 from Similarity import find_similar, get_closest
+from Store import ModelStore
+from Cache import ResponseCache
 import re
 
 image_folder = os.path.join('static', 'images')
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = image_folder
+# How long browsers and CDNs may reuse a GET API response before revalidating it with its ETag
+app.config['API_MAX_AGE'] = 300
+# Most dishes one API request can ask about
+app.config['API_MAX_BATCH'] = 100
+# Total size of the cached results and pages, see /metrics for how well it's doing
+app.config['CACHE_MAX_BYTES'] = 64 * 1024 * 1024
+# Served over ASGI (see Asgi.py): threads running requests, and how many more may wait before getting 503
+app.config['SERVER_WORKERS'] = 4
+app.config['SERVER_QUEUE'] = 64
+
+# Similarity artifacts are loaded once per process and shared by every request
+store = ModelStore(app.config['UPLOAD_FOLDER'])
+store.warm_up(background=True)
+# Results and rendered pages, emptied whenever the store loads new artifacts
+cache = ResponseCache(app.config['CACHE_MAX_BYTES'])
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
@@ -21,37 +40,189 @@ def home():
 def show_closest():
     
     background = os.path.join(app.config['UPLOAD_FOLDER'], 'Earth.png')
-    cosine_pickle = os.path.join(app.config['UPLOAD_FOLDER'], 'cosine_sims.pickle')
-    foods_pickle = os.path.join(app.config['UPLOAD_FOLDER'], 'initial_df.pickle')
 
     if request.method == 'POST':
-        selection = request.form['food-search']
-        with open(cosine_pickle, "rb") as to_read:
-            cosines = pickle.load(to_read)
-        with open(foods_pickle, "rb") as to_read:
-            df = pickle.load(to_read)
-        closest, text, origin, image_link, page_link = get_closest(selection, cosines, df)
+        model = store.get()
+        selection = model.names.resolve(request.form['food-search'])
+        if selection is None:
+            return not_found_page(model, request.form['food-search'], background)
 
+        # The page only depends on the dish and the model, so popular dishes are rendered once per model
+        def render():
+            closest, text, origin, image_link, page_link = closest_result(model, selection)
+            return render_template("Test-test.html", background_image=background, closest=closest, origin=origin, text=text, image_link=image_link, page_link=page_link, selection=selection)
 
-        return render_template("Test-test.html", background_image=background, closest=closest, origin=origin, text=text, image_link=image_link, page_link=page_link, selection=selection)
+        return cache.cached(('/closest', selection), model.version, render)
 
 @app.route('/closest2', methods=['POST', 'GET'])
 def show_country():
 
     background = os.path.join(app.config['UPLOAD_FOLDER'], 'Earth.png')
-    cosine_pickle = os.path.join(app.config['UPLOAD_FOLDER'], 'cosine_sims.pickle')
-    foods_pickle = os.path.join(app.config['UPLOAD_FOLDER'], 'initial_df.pickle')
 
     if request.method == 'POST':
-        selection = request.form['food-search']
-        with open(cosine_pickle, "rb") as to_read:
-            cosines = pickle.load(to_read)
-        with open(foods_pickle, "rb") as to_read:
-            df = pickle.load(to_read)
-        closest, text, origin, image_link, page_link = get_closest(selection, cosines, df)
+        model = store.get()
+        selection = model.names.resolve(request.form['food-search'])
+        if selection is None:
+            return not_found_page(model, request.form['food-search'], background)
+
+        def render():
+            closest, text, origin, image_link, page_link = closest_result(model, selection)
+            return render_template("Test-test-test.html", background_image=background, closest=closest, origin=origin, text=text, image_link=image_link, page_link=page_link)
+
+        return cache.cached(('/closest2', selection), model.version, render)
+
+
+def closest_result(model, selection):
+
+    return cache.cached(('get_closest', selection), model.version, lambda: get_closest(selection, model.neighbors, model.foods, model.cards))
+
+
+# The search form again, saying the dish wasn't found and offering the closest names to pick from
+def not_found_page(model, selection, background):
+
+    return render_template("Test.html", background_image=background, error=f'No dish called {selection}', suggestions=model.names.suggest(selection, 5)), 404
+
+
+# Typeahead for the search box: ?term= (what jQuery UI autocomplete sends) or ?q=, and optionally n
+@app.route('/suggest')
+def suggest():
+
+    text = request.args.get('term', request.args.get('q', ''))
+    n = max(1, min(request.args.get('n', 10, type=int), 50))
+    return jsonify(store.get().names.suggest(text, n))
+
+
+# JSON API. GET /api/v1/similar?dish=Pho&dish=Ramen&k=5, GET /api/v1/similar/<dish>?k=5 or POST
+# /api/v1/similar with {"dishes": [...], "k": 5}. Optional: origin and continent (keep only neighbors whose
+# origin or continent contains the text) and scores (include similarities). Filters only search the
+# neighbors the index keeps for each dish, so a filtered dish can get fewer than k.
+@app.route('/api/v1/similar', methods=['GET', 'POST'])
+def api_similar():
+
+    if request.method == 'POST':
+        options = request.get_json(silent=True)
+        if not isinstance(options, dict):
+            return api_error("Expected a JSON object")
+        dishes = options.get("dishes", options.get("dish", []))
+        dishes = [dishes] if isinstance(dishes, str) else dishes
+    else:
+        options = request.args
+        dishes = request.args.getlist('dish')
+    return similar_response(dishes, options)
+
+
+@app.route('/api/v1/similar/<path:dish>')
+def api_similar_dish(dish):
+
+    return similar_response([dish], request.args, single=True)
+
+
+def api_error(message, status=400):
+
+    return jsonify({"error": message}), status
+
+
+def read_options(options, model):
+    '''Takes the query string or JSON body and returns (k, scores, filters), raising ValueError with the
+    message for the client if one is bad.
+    '''
+
+    try:
+        k = int(options.get('k', min(10, model.neighbors.k)))
+    except (TypeError, ValueError):
+        raise ValueError("k must be a whole number")
+    if not 1 <= k <= model.neighbors.k:
+        raise ValueError(f'k must be between 1 and {model.neighbors.k}')
+    scores = options.get('scores', False)
+    if isinstance(scores, str):
+        scores = scores.lower() in ("1", "true", "yes")
+    filters = {}
+    for field in ("origin", "continent"):
+        text = options.get(field)
+        if text:
+            if not isinstance(text, str):
+                raise ValueError(f'{field} must be a string')
+            if field not in model.places:
+                raise ValueError(f'These dishes have no {field} to filter on')
+            filters[field] = text
+    return k, bool(scores), filters
+
+
+def similar_response(dishes, options, single=False):
+
+    model = store.get()
+    if not isinstance(dishes, list) or not dishes or not all(isinstance(dish, str) for dish in dishes):
+        return api_error("Give at least one dish name")
+    if len(dishes) > app.config['API_MAX_BATCH']:
+        return api_error(f'At most {app.config["API_MAX_BATCH"]} dishes per request')
+    try:
+        k, scores, filters = read_options(options, model)
+    except ValueError as error:
+        return api_error(str(error))
+
+    # The answer only depends on the artifacts and the question, so the ETag can be checked before any lookup
+    cacheable = request.method in ('GET', 'HEAD')
+    etag = hashlib.sha1(json.dumps([model.tag, dishes, k, scores, filters]).encode("utf-8")).hexdigest()
+    if cacheable and etag in request.if_none_match:
+        return cache_headers(app.response_class(status=304), etag)
+
+    results = cache.cached(('/api/v1/similar', etag), model.version, lambda: similar_results(model, dishes, k, scores, filters))
+    if single and results[0]["dish"] is None:
+        return jsonify(results[0]), 404
+    response = jsonify({"model": model.tag, "k": k, "results": results[0] if single else results})
+    return cache_headers(response, etag) if cacheable else response
+
+
+def cache_headers(response, etag):
+
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['API_MAX_AGE']
+    return response
+
+
+def similar_results(model, dishes, k, scores, filters):
+    '''Resolves the dish names and looks up all their neighbors at once. Returns a list with, per dish,
+    what was asked, the dish it resolved to and its similar dishes (or an error and suggestions).
+    '''
+
+    resolved = [model.names.resolve(dish) for dish in dishes]
+    rows = [model.neighbors.rows[name] for name in resolved if name is not None]
+    allowed = None
+    for field, text in filters.items():
+        matches = model.allowed(field, text)
+        allowed = matches if allowed is None else allowed & matches
+    neighbors, similarities, counts = model.neighbors.closest_many(rows, k, allowed)
+    neighbor_names = model.name_array[neighbors].tolist()
+    similarities = np.round(similarities.astype(float), 6).tolist()
+
+    results = []
+    found = iter(zip(neighbor_names, similarities, counts.tolist()))
+    for dish, name in zip(dishes, resolved):
+        if name is None:
+            results.append({"query": dish, "dish": None, "error": f'No dish called {dish}', "suggestions": model.names.suggest(dish, 5)})
+            continue
+        names, values, count = next(found)
+        if scores:
+            similar = [{"dish": other, "score": value} for other, value in zip(names[:count], values[:count])]
+        else:
+            similar = names[:count]
+        results.append({"query": dish, "dish": name, "similar": similar})
+    return results
+
+
+@app.route('/ready')
+def ready():
+
+    status = store.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
 
+@app.route('/metrics')
+def metrics():
 
-        return render_template("Test-test-test.html", background_image=background, closest=closest, origin=origin, text=text, image_link=image_link, page_link=page_link)
+    server = app.extensions.get("asgi")
+    return jsonify({"cache": cache.stats(), "model": store.status(), "server": server.stats() if server else None})
 
 
 @app.route('/predict', methods=['POST', 'GET'])
@@ -0,0 +1,187 @@
+import os
+import struct
+
+import numpy as np
+
+from Neighbors import NeighborIndex
+
+# File layout, all little-endian, every section starting on a 64 byte boundary:
+#   header    magic, format version, n (dishes), k (neighbors), dim (vector width), then
+#             the byte offset of each section and the size of the string blob
+#   vectors   float32 (n, dim), C order like the data block of an .npy file (dim may be 0)
+#   neighbors int32 (n, k)
+#   scores    float32 (n, k)
+#   strings   uint64 (n + 1) offsets into a UTF-8 blob holding the dish names back to back
+MAGIC = b"WIKI2VEC"
+VERSION = 1
+HEADER = struct.Struct("<8sHHQQQQQQQQ")
+HEADER_SIZE = 128
+ALIGN = 64
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+class Artifact(NeighborIndex):
+    '''A NeighborIndex (plus optional dish vectors) read straight out of an artifact file with numpy.memmap.
+    Nothing is copied onto the heap except the dish names, so every worker process opening the same
+    file shares one copy in the OS page cache.
+    '''
+
+    def __init__(self, names, neighbors, scores, vectors, path=None, version=VERSION):
+        super().__init__(names, neighbors, scores)
+        self.vectors = vectors
+        self.path = path
+        self.version = version
+
+    @property
+    def index(self):
+        return self.rows
+
+    @property
+    def rindex(self):
+        return self.names
+
+
+def _section(path, dtype, offset, shape, mode="r"):
+    if 0 in shape:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=shape)
+
+
+def _layout(names, k, dim):
+    '''Returns the header, the section offsets, the string offsets and the string blob for an artifact.'''
+
+    n = len(names)
+    encoded = [name.encode("utf-8") for name in names]
+    string_offsets = np.zeros(n + 1, dtype="<u8")
+    string_offsets[1:] = np.cumsum([len(name) for name in encoded])
+    blob = b"".join(encoded)
+
+    vectors_offset = HEADER_SIZE
+    neighbors_offset = _aligned(vectors_offset + n * dim * 4)
+    scores_offset = _aligned(neighbors_offset + n * k * 4)
+    strings_offset = _aligned(scores_offset + n * k * 4)
+
+    header = HEADER.pack(MAGIC, VERSION, 0, n, k, dim, vectors_offset, neighbors_offset, scores_offset, strings_offset, len(blob))
+    return header, (vectors_offset, neighbors_offset, scores_offset, strings_offset), string_offsets, blob
+
+
+def write_artifact(path, names, neighbors, scores, vectors=None):
+    '''Takes dish names, an (n, k) neighbor array, an (n, k) score array and optionally an (n, dim) array
+    of dish vectors and writes them to path in the artifact format. The file is written next to path and
+    renamed into place, so a running app never opens a half written artifact.
+
+    Arguments: string (path), list of strings, array, array, array (optional)
+    Returns: (none)
+    '''
+
+    n = len(names)
+    neighbors = np.ascontiguousarray(neighbors, dtype="<i4")
+    scores = np.ascontiguousarray(scores, dtype="<f4")
+    vectors = np.zeros((n, 0), dtype="<f4") if vectors is None else np.ascontiguousarray(vectors, dtype="<f4")
+    if neighbors.shape != scores.shape or neighbors.shape[0] != n or vectors.shape[0] != n:
+        raise ValueError("names, neighbors, scores and vectors must all have one row per dish")
+
+    header, (vectors_offset, neighbors_offset, scores_offset, strings_offset), string_offsets, blob = _layout(names, neighbors.shape[1], vectors.shape[1])
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, "wb") as to_write:
+        for offset, data in [(0, header), (vectors_offset, vectors), (neighbors_offset, neighbors),
+                             (scores_offset, scores), (strings_offset, string_offsets)]:
+            to_write.write(b"\0" * (offset - to_write.tell()))
+            to_write.write(data.tobytes() if isinstance(data, np.ndarray) else data)
+        to_write.write(blob)
+    os.replace(temp_path, path)
+
+
+class ArtifactWriter:
+    '''Writes an artifact a block of rows at a time, for results too big to hold in memory at once.
+
+    The header and dish names are written up front, then the neighbor, score (and vector) sections of
+    the file are memory mapped and filled in by write() as blocks arrive, in any order. close() flushes
+    the file and renames it into place; if anything fails in a with block the partial file is removed.
+
+    Arguments: string (path), list of strings (dish names), int (k), int (optional, vector width)
+    '''
+
+    def __init__(self, path, names, k, dim=0):
+        self.path = path
+        self.temp_path = f'{path}.tmp'
+        n = len(names)
+        header, (vectors_offset, neighbors_offset, scores_offset, strings_offset), string_offsets, blob = _layout(names, k, dim)
+        with open(self.temp_path, "wb") as to_write:
+            to_write.write(header)
+            to_write.truncate(strings_offset)
+            to_write.seek(strings_offset)
+            to_write.write(string_offsets.tobytes())
+            to_write.write(blob)
+
+        self.vectors = _section(self.temp_path, "<f4", vectors_offset, (n, dim), mode="r+")
+        self.neighbors = _section(self.temp_path, "<i4", neighbors_offset, (n, k), mode="r+")
+        self.scores = _section(self.temp_path, "<f4", scores_offset, (n, k), mode="r+")
+
+    def write(self, start, neighbors, scores, vectors=None):
+        '''Takes the first row number of a block and its neighbors and scores (and vectors) and writes them.'''
+
+        stop = start + len(neighbors)
+        self.neighbors[start:stop] = neighbors
+        self.scores[start:stop] = scores
+        if vectors is not None:
+            self.vectors[start:stop] = vectors
+
+    def close(self):
+        for section in (self.vectors, self.neighbors, self.scores):
+            if isinstance(section, np.memmap):
+                section.flush()
+        self.vectors = self.neighbors = self.scores = None
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        self.vectors = self.neighbors = self.scores = None
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        if error_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def save_artifact(path, neighbor_index, vectors=None):
+    '''Writes a NeighborIndex (and optionally the dish vectors) to path in the artifact format.'''
+
+    write_artifact(path, neighbor_index.names, neighbor_index.neighbors, neighbor_index.scores, vectors)
+
+
+def open_artifact(path):
+    '''Takes the path of an artifact file and returns an Artifact whose arrays are memory mapped from it.
+
+    Arguments: string (path)
+    Returns: Artifact
+    '''
+
+    with open(path, "rb") as to_read:
+        header = to_read.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f'{path} is too short to be an artifact file')
+    (magic, version, _, n, k, dim, vectors_offset, neighbors_offset,
+     scores_offset, strings_offset, blob_size) = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not an artifact file')
+    if version > VERSION:
+        raise ValueError(f'{path} is artifact format version {version}, this code reads up to {VERSION}')
+
+    vectors = _section(path, "<f4", vectors_offset, (n, dim))
+    neighbors = _section(path, "<i4", neighbors_offset, (n, k))
+    scores = _section(path, "<f4", scores_offset, (n, k))
+    string_offsets = _section(path, "<u8", strings_offset, (n + 1,))
+    blob = bytes(_section(path, "u1", strings_offset + string_offsets.nbytes, (blob_size,)))
+    names = [blob[string_offsets[i]:string_offsets[i + 1]].decode("utf-8") for i in range(n)]
+
+    return Artifact(names, neighbors, scores, vectors, path=path, version=version)
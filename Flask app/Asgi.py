@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsgiApp:
+    '''Serves a WSGI app (the Flask app) over ASGI, for running under an ASGI server such as uvicorn.
+
+    The event loop only does the network side. Each request's WSGI call (the name lookup, neighbor
+    lookup and rendering) runs in a thread pool of workers threads, so a slow request never stalls the
+    loop. Admission is bounded: at most workers + queue_size requests are running or waiting at once,
+    and any more are answered 503 with Retry-After straight away instead of piling up in memory and
+    timing out later (backpressure a load balancer can act on).
+
+    On shutdown (the ASGI lifespan event, sent when the server gets SIGTERM or SIGINT) new requests get
+    503 and the ones already admitted get up to shutdown_timeout seconds to finish before the pool is
+    shut down.
+
+    Arguments: WSGI app, int (optional), int (optional), float (optional), int (optional, bytes)
+    '''
+
+    def __init__(self, wsgi_app, workers=4, queue_size=64, shutdown_timeout=30.0, max_body=1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.workers = workers
+        self.queue_size = queue_size
+        self.shutdown_timeout = shutdown_timeout
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="similarity")
+        # Only touched from the event loop thread, so plain counters are enough
+        self.in_flight = 0
+        self.served = 0
+        self.rejected = 0
+        self.shutting_down = False
+        self._idle = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "served": self.served,
+            "rejected": self.rejected,
+            "shutting_down": self.shutting_down,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._idle = asyncio.Event()
+                self._idle.set()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def shutdown(self):
+        '''Stops admitting requests, waits up to shutdown_timeout for the admitted ones, then stops the pool.'''
+
+        self.shutting_down = True
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _http(self, scope, receive, send):
+        if self.shutting_down:
+            await self._reject(send, 503, b"Shutting down", close=True)
+            return
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            await self._reject(send, 503, b"Too busy, try again shortly")
+            return
+
+        self.in_flight += 1
+        if self._idle is not None:
+            self._idle.clear()
+        try:
+            body = await self._read_body(receive)
+            if body is None:
+                await self._reject(send, 413, b"Request body too large")
+                return
+            environ = wsgi_environ(scope, body)
+            status, headers, chunks = await asyncio.get_running_loop().run_in_executor(self.executor, call_wsgi, self.wsgi_app, environ)
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": b"".join(chunks)})
+            self.served += 1
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0 and self._idle is not None:
+                self._idle.set()
+
+    async def _read_body(self, receive):
+        '''Returns the request body, or None once it passes max_body.'''
+
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def _reject(self, send, status, message, close=False):
+        headers = [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(message)).encode()), (b"retry-after", b"1")]
+        if close:
+            headers.append((b"connection", b"close"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": message})
+
+
+def wsgi_environ(scope, body):
+    '''Returns the WSGI environ (PEP 3333) for an ASGI http scope and its request body.'''
+
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        # WSGI wants the path as bytes decoded as latin-1, ASGI gives it decoded as UTF-8
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f'HTTP/{scope.get("http_version", "1.1")}',
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        # Repeated headers are joined, as a WSGI server would
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    # The body has been read in full, so its length is known even for a chunked request with no
+    # Content-Length header, and Flask won't parse a form without one
+    environ["CONTENT_LENGTH"] = str(len(body))
+    environ.pop("HTTP_TRANSFER_ENCODING", None)
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    '''Runs the WSGI app on environ (in a worker thread) and returns (status, headers, body chunks) in
+    ASGI form.
+    '''
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        chunks = list(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], chunks
+
+
+def _application():
+    from App import app
+
+    application = AsgiApp(app, workers=app.config['SERVER_WORKERS'], queue_size=app.config['SERVER_QUEUE'])
+    # So /metrics can report the executor alongside the cache
+    app.extensions["asgi"] = application
+    return application
+
+
+# What an ASGI server imports (uvicorn Asgi:application); not built when this file is run to start one
+if __name__ != "__main__":
+    application = _application()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the app over ASGI with uvicorn (pip install uvicorn).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--processes", type=int, default=1, help="server processes, each memory maps the same artifacts")
+    parser.add_argument("--shutdown-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("Serving needs an ASGI server: pip install uvicorn")
+    uvicorn.run("Asgi:application", host=args.host, port=args.port, workers=args.processes, timeout_graceful_shutdown=args.shutdown_timeout, lifespan="on")
@@ -0,0 +1,138 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from Corpus import Corpus
+from Neighbors import top_k_rows
+from Artifacts import ArtifactWriter, open_artifact
+
+
+# Bytes of working memory per similarity cell in a block: the dense float32 block plus argpartition's int64 indices
+BYTES_PER_CELL = 12
+
+# Set in each worker process by _start_worker, so the matrix is sent to each worker once, not per block
+_matrix = None
+_k = None
+
+
+def _start_worker(matrix, k):
+    global _matrix, _k
+    _matrix, _k = matrix, k
+
+
+def _score_block(start, stop):
+    sims = _matrix[start:stop] @ _matrix.T
+    if sp.issparse(sims):
+        sims = sims.toarray()
+    neighbors, scores = top_k_rows(sims, _k, offset=start)
+    return start, neighbors, scores
+
+
+def block_size_for(memory, n, processes):
+    '''Returns the largest block size that keeps the similarity blocks of all processes within memory bytes.'''
+
+    return max(1, int(memory // (processes * n * BYTES_PER_CELL)))
+
+
+def build_neighbor_file(corpus, path, k=20, block_size=512, processes=None):
+    '''Takes a Corpus and writes the top-k neighbors and cosine similarities of every dish to an artifact
+    file at path, without ever holding the n x n similarities. Rows are scored block_size at a time in a
+    pool of processes (all cores by default) and each block goes straight to disk as it comes back. Peak
+    memory is about processes * block_size * n * 12 bytes on top of the matrix itself.
+
+    Arguments: Corpus, string (path), int (optional), int (optional), int (optional)
+    Returns: dict (throughput stats)
+    '''
+
+    matrix = normalize(corpus.matrix).astype(np.float32)
+    n = matrix.shape[0]
+    # A single dish has no neighbors: k is 0 and every list is empty
+    k = max(0, min(k, n - 1))
+    processes = processes or os.cpu_count() or 1
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+    start_time = time.perf_counter()
+    with ArtifactWriter(path, corpus.dishes, k) as writer:
+        if processes == 1:
+            _start_worker(matrix, k)
+            for start, stop in blocks:
+                writer.write(*_score_block(start, stop))
+        else:
+            with ProcessPoolExecutor(processes, initializer=_start_worker, initargs=(matrix, k)) as pool:
+                # A couple of blocks queued per process keeps them busy without results piling up in memory
+                pending = deque()
+                for start, stop in blocks:
+                    pending.append(pool.submit(_score_block, start, stop))
+                    if len(pending) >= 2 * processes:
+                        writer.write(*pending.popleft().result())
+                while pending:
+                    writer.write(*pending.popleft().result())
+    seconds = time.perf_counter() - start_time
+
+    stats = {
+        "dishes": n,
+        "k": k,
+        "block_size": block_size,
+        "processes": processes,
+        "seconds": seconds,
+        "rows_per_second": n / seconds,
+        "pairs_per_second": n * n / seconds,
+        "peak_block_bytes": processes * min(block_size, n) * n * BYTES_PER_CELL,
+    }
+    print(f'{n} dishes, k={k}, {len(blocks)} blocks of {block_size} on {processes} processes: {seconds:.2f}s, '
+          f'{stats["rows_per_second"]:,.0f} rows/s, {stats["pairs_per_second"]:,.0f} pairs/s, '
+          f'~{stats["peak_block_bytes"] / 2 ** 20:,.0f} MB of similarity blocks at once')
+    return stats
+
+
+def verify_neighbor_file(corpus, path, block_size=512, tolerance=1e-5):
+    '''Checks an artifact's neighbor lists against the exact sklearn cosine_similarity of the corpus: each
+    row's scores must be the k highest exact similarities (ties may come in any order) and each neighbor's
+    score must be its exact similarity. Returns the list of dish names that don't match.
+
+    Arguments: Corpus, string (path), int (optional), float (optional)
+    Returns: list of strings
+    '''
+
+    artifact = open_artifact(path)
+    if artifact.names != corpus.dishes:
+        raise ValueError(f'{path} is not built from this corpus')
+    k = artifact.k
+    mismatched = []
+    for start in range(0, len(corpus), block_size):
+        exact = cosine_similarity(corpus.matrix[start:start + block_size], corpus.matrix)
+        rows = np.arange(exact.shape[0])
+        exact[rows, rows + start] = -np.inf
+        expected = -np.sort(-exact, axis=1)[:, :k]
+        stored = np.asarray(artifact.scores[start:start + block_size])
+        listed = np.take_along_axis(exact, np.asarray(artifact.neighbors[start:start + block_size]), axis=1)
+        bad = (np.abs(expected - stored) > tolerance).any(axis=1) | (np.abs(listed - stored) > tolerance).any(axis=1)
+        mismatched.extend(corpus.dishes[start + i] for i in np.flatnonzero(bad))
+    print(f'{len(corpus) - len(mismatched)} of {len(corpus)} neighbor lists match the exact cosine similarities')
+    return mismatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the neighbor artifact from a saved Corpus (corpus.npz).")
+    parser.add_argument("corpus")
+    parser.add_argument("output")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--memory", type=float, help="MB for similarity blocks, overrides --block-size")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--verify", action="store_true", help="check the result against the exact computation")
+    args = parser.parse_args()
+
+    corpus = Corpus.load(args.corpus)
+    processes = args.processes or os.cpu_count() or 1
+    block_size = block_size_for(args.memory * 2 ** 20, len(corpus), processes) if args.memory else args.block_size
+    build_neighbor_file(corpus, args.output, k=args.k, block_size=block_size, processes=processes)
+    if args.verify:
+        verify_neighbor_file(corpus, args.output)
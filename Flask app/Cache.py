@@ -0,0 +1,119 @@
+import pickle
+import threading
+from collections import OrderedDict
+
+
+def size_of(value):
+    '''Returns roughly how many bytes value holds: its length for text (UTF-8) and bytes, otherwise the
+    length of its pickle, which tracks the size of lists, tuples and dicts of those well enough to bound by.
+    '''
+
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, bytes):
+        return len(value)
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class ResponseCache:
+    '''An in-process LRU cache of computed results and rendered pages, bounded by the total size of its
+    values rather than their number, since a rendered page can be a hundred times a neighbor list.
+
+    Every get and put carries the version of the model it's for (the Snapshot version, which only goes up).
+    The first one with a newer version than the cache holds empties it, so nothing computed from old
+    artifacts is served after a reload and no old entries linger taking up space. Requests still finishing
+    on the old snapshot miss and don't store anything. Safe to share between threads.
+
+    Arguments: int (optional, bytes)
+    '''
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.too_large = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _current(self, version):
+        '''Empties the cache if version is newer than its entries, and says whether version is current.'''
+
+        if version > self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.bytes = 0
+            self.version = version
+        return version == self.version
+
+    def get(self, key, version):
+        '''Returns the value cached under key for this version, or None.'''
+
+        with self._lock:
+            entry = self.entries.get(key) if self._current(version) else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, version):
+        '''Caches value under key for this version, evicting the least recently used entries to stay within
+        max_bytes. A value bigger than max_bytes on its own isn't cached. Returns value.
+        '''
+
+        size = size_of(value)
+        with self._lock:
+            if not self._current(version):
+                return value
+            if size > self.max_bytes:
+                self.too_large += 1
+                return value
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def cached(self, key, version, compute):
+        '''Returns the value cached under key, or computes it with compute() and caches it. Two threads
+        missing at once both compute; the later put just replaces the earlier.
+        '''
+
+        value = self.get(key, version)
+        if value is None:
+            value = self.put(key, compute(), version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "too_large": self.too_large,
+            }
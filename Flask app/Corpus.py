@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class Corpus:
+    '''The document-term matrix with its labels, kept sparse: a CSR matrix (dishes x terms), the terms
+    (vocabulary) and the dish names. Stands in for the dense counts_df; rows and terms are looked up by
+    label but nothing is ever turned into a dense dishes x vocabulary array.
+
+    Arguments: sparse matrix, list of strings (terms), list of strings (dish names)
+    '''
+
+    def __init__(self, matrix, terms, dishes):
+        self.matrix = sp.csr_matrix(matrix)
+        self.terms = list(terms)
+        self.dishes = list(dishes)
+        if self.matrix.shape != (len(self.dishes), len(self.terms)):
+            raise ValueError(f'Matrix is {self.matrix.shape} but there are {len(self.dishes)} dishes and {len(self.terms)} terms')
+        self.dish_index = {dish: i for i, dish in enumerate(self.dishes)}
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer, matrix, dishes):
+        '''Takes a fitted sklearn vectorizer, the matrix it returned and the dish names of its rows.'''
+
+        if hasattr(vectorizer, "get_feature_names_out"):
+            terms = vectorizer.get_feature_names_out()
+        else:
+            terms = vectorizer.get_feature_names()
+        return cls(matrix, terms, dishes)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def __len__(self):
+        return len(self.dishes)
+
+    def __contains__(self, dish):
+        return dish in self.dish_index
+
+    def row(self, dish):
+        '''Returns a dish's row as a (1, terms) sparse matrix. Raises KeyError for unknown dishes.'''
+
+        return self.matrix[self.dish_index[dish]]
+
+    def weight(self, dish, term):
+        '''Returns the weight of term for dish, like counts_df.loc[dish, term] (0.0 if the term isn't in it).'''
+
+        return float(self.matrix[self.dish_index[dish], self.term_index[term]])
+
+    def terms_of(self, dish):
+        '''Returns the terms in a dish's document and their weights as a Series, highest weight first.'''
+
+        row = self.row(dish)
+        order = np.argsort(-row.data, kind="stable")
+        return pd.Series(row.data[order], index=[self.terms[i] for i in row.indices[order]], name=dish)
+
+    def dishes_with(self, term):
+        '''Returns the dishes whose documents contain term and its weight in each as a Series, highest first.'''
+
+        column = self.matrix[:, self.term_index[term]].tocsc()
+        order = np.argsort(-column.data, kind="stable")
+        return pd.Series(column.data[order], index=[self.dishes[i] for i in column.indices[order]], name=term)
+
+    def top_terms(self, dish, n=10):
+        '''Returns a list of (term, weight) tuples for the n highest weighted terms of a dish.'''
+
+        return list(self.terms_of(dish).head(n).items())
+
+    def similarity(self, dish, other):
+        '''Returns the cosine similarity of two dishes (rows are l2 normalized, as TfidfVectorizer returns them).'''
+
+        return float(self.row(dish).multiply(self.row(other)).sum())
+
+    def to_frame(self, dishes):
+        '''Returns the rows of a handful of dishes as a DataFrame labelled like counts_df. Only those rows are
+        made dense, so it is meant for looking at a few dishes side by side, not the whole corpus.
+        '''
+
+        rows = [self.dish_index[dish] for dish in dishes]
+        return pd.DataFrame(self.matrix[rows].toarray(), index=list(dishes), columns=self.terms)
+
+    def save(self, path):
+        with open(path, "wb") as to_write:
+            np.savez(to_write, data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+                     shape=np.array(self.matrix.shape), terms=np.array(self.terms, dtype=str), dishes=np.array(self.dishes, dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            matrix = sp.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+            return cls(matrix, data["terms"].tolist(), data["dishes"].tolist())
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+DTYPES = ("float32", "float16", "int8")
+
+
+class EmbeddingStore:
+    '''Embedding vectors with their name mappings, L2 normalized once when the store is made, so a dot
+    product between two rows is their cosine similarity whatever the caller did to the weights.
+
+    Stored as float32 by default, or float16 (half the memory) or int8 (a quarter, each row scaled so its
+    largest component is 127, with the scale kept per row). Scores always come back as float32; float16
+    and int8 rows are converted block_size rows at a time, so no full float32 copy is ever made.
+
+    Takes the place of the index/rindex globals (country_index and index_country, link_index and
+    index_link): index maps names to rows and rindex rows to names, same as those and as an Artifact.
+
+    Arguments: array (n, dim), list of strings (names), string (optional), int (optional)
+    '''
+
+    def __init__(self, weights, names, dtype="float32", block_size=65536):
+        if dtype not in DTYPES:
+            raise ValueError(f'dtype must be one of {", ".join(DTYPES)}, not {dtype}')
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 2 or weights.shape[0] != len(names):
+            raise ValueError(f'weights are {weights.shape} but there are {len(names)} names')
+
+        self.rindex = list(names)
+        self.index = {name: i for i, name in enumerate(self.rindex)}
+        self.dtype = dtype
+        self.block_size = block_size
+
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized = weights / norms
+        self.scales = None
+        if dtype == "int8":
+            # Per row, so a row of small components doesn't lose its precision to a row of large ones
+            largest = np.abs(normalized).max(axis=1, keepdims=True)
+            largest[largest == 0] = 1.0
+            self.codes = np.round(normalized / largest * 127).astype(np.int8)
+            self.scales = (largest / 127).astype(np.float32).ravel()
+        else:
+            self.codes = normalized.astype(dtype)
+
+    @classmethod
+    def from_index(cls, weights, index, dtype="float32"):
+        '''Takes weights and a dict of names to rows (like country_index or link_index) and returns a store.'''
+
+        names = [None] * len(index)
+        for name, row in index.items():
+            names[row] = name
+        return cls(weights, names, dtype)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def __len__(self):
+        return len(self.rindex)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def vectors(self, rows=slice(None)):
+        '''Returns the normalized float32 vectors of rows (row numbers or a slice, all of them by default).'''
+
+        vectors = self.codes[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows, None]
+        return vectors
+
+    def __array__(self, dtype=None, copy=None):
+        vectors = self.vectors()
+        return vectors if dtype is None else vectors.astype(dtype)
+
+    def vector(self, name):
+        '''Returns a name's normalized float32 vector. Raises KeyError for names not in the store.'''
+
+        return self.vectors(self.index[name])
+
+    def similarities(self, rows):
+        '''Takes a row number (or an array of them) and returns the cosine similarity of it with every
+        row, as a float32 array of shape (n,) (or (len(rows), n)).
+        '''
+
+        single = np.ndim(rows) == 0
+        queries = np.atleast_2d(self.vectors(np.atleast_1d(rows)))
+        sims = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            sims[:, start:stop] = queries @ self.vectors(slice(start, stop)).T
+        return sims[0] if single else sims
+
+    def save(self, path):
+        with open(path, "wb") as to_write:
+            np.savez(to_write, codes=self.codes, scales=np.zeros(0, dtype=np.float32) if self.scales is None else self.scales,
+                     names=np.array(self.rindex, dtype=str), dtype=np.array(self.dtype))
+
+    @classmethod
+    def load(cls, path):
+        '''Loads a saved store as it was stored, without normalizing or quantizing again.'''
+
+        with np.load(path) as data:
+            store = cls.__new__(cls)
+            store.codes, store.dtype = data["codes"], str(data["dtype"])
+            store.scales = data["scales"] if store.dtype == "int8" else None
+            store.rindex = data["names"].tolist()
+        store.index = {name: i for i, name in enumerate(store.rindex)}
+        store.block_size = 65536
+        return store
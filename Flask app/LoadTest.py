@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+
+class Connection:
+    '''One keep-alive HTTP/1.1 connection, just enough of the protocol to send a request and read the
+    status and body back (Content-Length or chunked).
+    '''
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.open = True
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, method, host, path, body=b"", content_type="application/x-www-form-urlencoded"):
+        head = f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n'
+        if body:
+            head += f'Content-Type: {content_type}\r\n'
+        self.writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+                if size == 0:
+                    break
+            data = b"".join(chunks)
+        else:
+            data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, data
+
+    def close(self):
+        self.open = False
+        self.writer.close()
+
+
+def percentile(values, share):
+    '''Returns the value share (0 to 1) of the way through values, nearest rank.'''
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+async def fetch_dishes(host, port, per_letter=50):
+    '''Collects dish names to query from the app's own /suggest, a letter at a time.'''
+
+    connection = await Connection.connect(host, port)
+    dishes = []
+    for letter in string.ascii_lowercase:
+        status, data = await connection.request("GET", host, f'/suggest?{urlencode({"term": letter, "n": per_letter})}')
+        if status == 200:
+            dishes.extend(name for name in json.loads(data) if name not in dishes)
+    connection.close()
+    return dishes
+
+
+async def load_test(url, rps, seconds, dishes, connections=64, skew=1.0, path="/closest", seed=0):
+    '''Sends POST path requests for random dishes at rps a second for seconds, open loop: each request
+    goes out at its scheduled time whether or not earlier ones have finished, and its latency is counted
+    from then, so time spent waiting for a free connection or behind a slow server shows up in the numbers.
+    Dishes are picked with weight 1 / rank^skew, so a few popular ones come up over and over.
+
+    Returns a dictionary of the latencies (ms) and the count of each status.
+    '''
+
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(dishes))]
+    total = int(rps * seconds)
+    picks = rng.choices(dishes, weights, k=total)
+
+    idle = asyncio.Queue()
+    opened = 0
+    latencies = []
+    statuses = Counter()
+
+    async def one(scheduled, dish):
+        nonlocal opened
+        await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        connection = None
+        try:
+            if idle.empty() and opened < connections:
+                opened += 1
+                connection = await Connection.connect(host, port)
+            else:
+                connection = await idle.get()
+            status, _ = await connection.request("POST", host, path, urlencode({"food-search": dish}).encode("utf-8"))
+            statuses[status] += 1
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            statuses["error"] += 1
+            if connection is not None:
+                connection.close()
+            else:
+                opened -= 1
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+        if connection is not None and connection.open:
+            idle.put_nowait(connection)
+        elif connection is not None:
+            opened -= 1
+
+    start = time.perf_counter() + 0.1
+    await asyncio.gather(*(one(start + i / rps, dish) for i, dish in enumerate(picks)))
+    elapsed = time.perf_counter() - start
+    while not idle.empty():
+        idle.get_nowait().close()
+    return {"latencies": latencies, "statuses": statuses, "seconds": elapsed}
+
+
+def report(results, rps):
+    latencies = results["latencies"]
+    ok = results["statuses"].get(200, 0)
+    print(f'{len(latencies)} requests at {rps} rps target, {len(latencies) / results["seconds"]:.1f} rps achieved, {ok} ok')
+    print("statuses: " + ", ".join(f'{status}: {count}' for status, count in sorted(results["statuses"].items(), key=str)))
+    print(f'p50 {percentile(latencies, 0.5):.1f} ms, p90 {percentile(latencies, 0.9):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms, max {max(latencies):.1f} ms')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive /closest at a target rate and report p50/p99 latency.")
+    parser.add_argument("url", nargs="?", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--skew", type=float, default=1.0, help="0 for every dish equally often")
+    parser.add_argument("--path", default="/closest")
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    dishes = asyncio.run(fetch_dishes(parts.hostname, parts.port or 80))
+    if not dishes:
+        raise SystemExit(f'No dish names from {args.url}/suggest')
+    results = asyncio.run(load_test(args.url, args.rps, args.seconds, dishes, args.connections, args.skew, args.path))
+    report(results, args.rps)
@@ -0,0 +1,126 @@
+import bisect
+import re
+from collections import Counter
+
+import unidecode
+
+
+SPACE_RUNS = re.compile(r"\s+")
+
+
+def fold(name):
+    '''Returns the form names are matched on: unidecoded (the same way the pipeline does it), lower case
+    and with runs of whitespace collapsed, so "Crème brûlée", "creme  brulee" and "CREME BRULEE" are one.
+    '''
+
+    return SPACE_RUNS.sub(" ", unidecode.unidecode(name).lower()).strip()
+
+
+def trigrams(folded):
+    # Padded like pg_trgm, so the start and end of a name weigh as much as its middle
+    padded = f'  {folded} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameResolver:
+    '''Turns what someone typed into the dish name it means, built once per set of names.
+
+    exact()   a dict lookup on the folded name, so case, accents and spacing don't matter
+    prefix()  names starting with the text, then names with a word starting with it, by binary search
+              over the sorted folded names and word starts (a flattened trie)
+    fuzzy()   "did you mean": names sharing the most trigrams with the text, by Dice coefficient,
+              from an inverted index of trigram to names, so only names sharing a trigram get scored
+    resolve() the exact match only, so a typo is never silently taken for a different dish
+    suggest() the typeahead and "did you mean" list: prefix matches, topped up with fuzzy ones scoring
+              at least cutoff
+
+    Arguments: list of strings (dish names)
+    '''
+
+    def __init__(self, names, cutoff=0.3):
+        self.names = list(dict.fromkeys(names))
+        self.cutoff = cutoff
+        self.folded = [fold(name) for name in self.names]
+
+        self.exact_index = {}
+        for i, folded in enumerate(self.folded):
+            self.exact_index.setdefault(folded, i)
+
+        # (folded text from a word start, is it the start of the name, name number), sorted for bisect
+        starts = []
+        for i, folded in enumerate(self.folded):
+            starts.append((folded, 0, i))
+            for match in re.finditer(" ", folded):
+                starts.append((folded[match.end():], 1, i))
+        starts.sort()
+        self.start_keys = [key for key, _, _ in starts]
+        self.starts = [(inner, i) for _, inner, i in starts]
+
+        postings = {}
+        self.trigram_counts = []
+        for i, folded in enumerate(self.folded):
+            grams = trigrams(folded)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return self.exact(name) is not None
+
+    def exact(self, text):
+        i = self.exact_index.get(fold(text))
+        return None if i is None else self.names[i]
+
+    def prefix(self, text, n=10):
+        '''Returns up to n names starting with text, then names with a later word starting with it, each group
+        shortest first.
+        '''
+
+        folded = fold(text)
+        if not folded:
+            return []
+        start = bisect.bisect_left(self.start_keys, folded)
+        # Everything starting with folded sorts before folded + the highest character
+        stop = bisect.bisect_left(self.start_keys, folded + "\U0010ffff", start)
+        matches = {}
+        for inner, i in self.starts[start:stop]:
+            matches[i] = min(inner, matches.get(i, inner))
+        ranked = sorted(matches, key=lambda i: (matches[i], len(self.names[i]), self.folded[i]))
+        return [self.names[i] for i in ranked[:n]]
+
+    def fuzzy(self, text, n=5, cutoff=0.0):
+        '''Returns up to n (name, score) tuples for the names most like text, best first, score being the
+        Dice coefficient of their trigrams (1.0 for the same trigrams), above cutoff.
+        '''
+
+        grams = trigrams(fold(text))
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = [(2 * count / (len(grams) + self.trigram_counts[i]), i) for i, count in shared.items()]
+        scored = [(score, i) for score, i in scored if score > cutoff]
+        scored.sort(key=lambda pair: (-pair[0], len(self.names[pair[1]]), self.folded[pair[1]]))
+        return [(self.names[i], score) for score, i in scored[:n]]
+
+    def resolve(self, text):
+        '''Returns the dish name text means, its exact (folded) match, or None. Close misses are left to
+        suggest(), for the user to pick from.
+        '''
+
+        return self.exact(text)
+
+    def suggest(self, text, n=10):
+        '''Returns up to n names for a search box: prefix matches first, then fuzzy matches for typos.'''
+
+        suggestions = self.prefix(text, n)
+        if len(suggestions) < n:
+            for name, _ in self.fuzzy(text, n, cutoff=self.cutoff):
+                if name not in suggestions:
+                    suggestions.append(name)
+                    if len(suggestions) == n:
+                        break
+        return suggestions
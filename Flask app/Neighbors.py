@@ -0,0 +1,119 @@
+import numpy as np
+
+from Corpus import Corpus
+from Embeddings import EmbeddingStore
+
+
+class NeighborIndex:
+    '''Top-k most similar dishes for every dish, stored as two compact (n, k) arrays: neighbor row
+    numbers (int32) and their cosine similarities (float32), each row sorted most similar first.
+    Memory is n * k * 8 bytes instead of the n * n * 8 of a full cosine similarity df.
+
+    Arguments: list of strings (dish names), array (neighbors), array (scores)
+    '''
+
+    def __init__(self, names, neighbors, scores):
+        self.names = list(names)
+        self.neighbors = neighbors
+        self.scores = scores
+        self.rows = {name: i for i, name in enumerate(self.names)}
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def closest(self, name, n=None):
+        '''Takes a dish name and returns a list of (dish name, similarity) tuples for its n closest dishes.
+        Raises KeyError for names not in the index, same as indexing the old cosine df.
+        '''
+
+        row = self.rows[name]
+        n = self.k if n is None else min(n, self.k)
+        return [(self.names[j], float(score)) for j, score in zip(self.neighbors[row, :n], self.scores[row, :n])]
+
+    def closest_many(self, rows, n=None, allowed=None):
+        '''Takes an array of row numbers and returns the (neighbors, scores, counts) of their n closest dishes
+        in one fancy-indexed read of the arrays: two (rows, n) arrays, most similar first, and how many of
+        each row's n are real. With allowed, a boolean array over all rows, only allowed neighbors are kept,
+        so a row can have fewer than n (only the k stored neighbors are searched, not every dish).
+        '''
+
+        rows = np.asarray(rows, dtype=np.intp)
+        n = self.k if n is None else min(n, self.k)
+        neighbors = np.asarray(self.neighbors[rows])
+        scores = np.asarray(self.scores[rows])
+        if allowed is None:
+            return neighbors[:, :n], scores[:, :n], np.full(len(rows), n)
+
+        keep = np.asarray(allowed)[neighbors]
+        # A stable sort on "not kept" moves the kept neighbors to the front in their original order
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :n]
+        counts = np.minimum(keep.sum(axis=1), n)
+        return np.take_along_axis(neighbors, order, axis=1), np.take_along_axis(scores, order, axis=1), counts
+
+    def save(self, path):
+        with open(path, "wb") as to_write:
+            np.savez(to_write, names=np.array(self.names, dtype=str), neighbors=self.neighbors, scores=self.scores)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["names"].tolist(), data["neighbors"], data["scores"])
+
+
+def top_k_rows(sims, k, offset=0, rows=None):
+    '''Takes a block of similarity rows (block, n) whose first row is row number offset of the full matrix
+    (or whose rows are the row numbers in rows) and returns the top-k (neighbors, scores) for each row,
+    excluding the row itself. With k 0 (a single dish has no neighbors) both arrays are (block, 0).
+    '''
+
+    sims = np.asarray(sims, dtype=np.float32)
+    if k <= 0:
+        # argpartition(sims, -0)[:, -0:] would be every column, the row itself included
+        return np.empty((sims.shape[0], 0), dtype=np.int32), np.empty((sims.shape[0], 0), dtype=np.float32)
+    block = np.arange(sims.shape[0])
+    sims[block, block + offset if rows is None else np.asarray(rows)] = -np.inf
+
+    # argpartition gets the k largest in O(n), only those k then get sorted
+    top = np.argpartition(sims, -k, axis=1)[:, -k:]
+    top_scores = np.take_along_axis(sims, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1).astype(np.int32), np.take_along_axis(top_scores, order, axis=1)
+
+
+def build_neighbor_index(matrix, names=None, k=20, block_size=512):
+    '''Takes a document-term matrix (sparse or dense, rows L2 normalized as TfidfVectorizer returns them)
+    and matching dish names, or a Corpus or EmbeddingStore, and returns a NeighborIndex of the k most similar dishes for
+    each dish. Similarities are computed block_size rows at a time so the full n x n matrix never exists.
+
+    Arguments: matrix, Corpus or EmbeddingStore, list of strings (optional with a Corpus or store), int (optional), int (optional)
+    Returns: NeighborIndex
+    '''
+
+    if isinstance(matrix, Corpus):
+        names = matrix.dishes if names is None else names
+        matrix = matrix.matrix
+    if isinstance(matrix, EmbeddingStore):
+        names = matrix.rindex if names is None else names
+
+    n = matrix.shape[0]
+    k = max(0, min(k, n - 1))
+    neighbors = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    for start in range(0, n, block_size):
+        if isinstance(matrix, EmbeddingStore):
+            sims = matrix.similarities(np.arange(start, min(start + block_size, n)))
+        else:
+            sims = matrix[start:start + block_size] @ matrix.T
+        if hasattr(sims, "toarray"):
+            sims = sims.toarray()
+        neighbors[start:start + block_size], scores[start:start + block_size] = top_k_rows(sims, k, offset=start)
+
+    return NeighborIndex(names, neighbors, scores)
@@ -1,21 +1,81 @@
 import pandas as pd
 import numpy as np
 import re
+import os
+import pickle
+import time
+from collections import namedtuple
+import scipy.sparse as sp
+from Artifacts import Artifact, open_artifact
+from Corpus import Corpus
+from Embeddings import EmbeddingStore
 
-def find_similar(name, weights, index, rindex, index_name='country', n=10, least=False, return_dist=False, plot=False):
-    """Find n most similar items (or least) to name based on embeddings. Option to also plot the results"""
+# Same as "(  )( *)": a run of two or more spaces
+SPACE_RUNS = re.compile(" {2,}")
+
+
+def _resolve(weights, index, rindex):
+    '''Unpacks an artifact path, Artifact or Corpus into (weights, index, rindex); passes arrays through.'''
+
+    if isinstance(weights, str):
+        weights = open_artifact(weights)
+    if isinstance(weights, Artifact):
+        index, rindex, weights = weights.index, weights.rindex, weights.vectors
+    if isinstance(weights, Corpus):
+        index, rindex, weights = weights.dish_index, weights.dishes, weights.matrix
+    if isinstance(weights, EmbeddingStore):
+        index, rindex = weights.index, weights.rindex
+    return weights, index, rindex
+
+
+def _scores(weights, rows):
+    '''Returns the dot products of the given rows with every row, as a dense (len(rows), n) array.'''
+
+    if isinstance(weights, EmbeddingStore):
+        return weights.similarities(rows)
+    sims = weights[rows] @ weights.T
+    return sims.toarray() if sp.issparse(sims) else np.asarray(sims)
+
+
+def top_n(dists, n):
+    '''Returns the positions of the n largest dists in ascending order, like np.argsort(dists)[-n:], but
+    only those n get sorted: argpartition finds them in O(len(dists)).
+    '''
+
+    if n >= len(dists):
+        return np.argsort(dists)
+    top = np.argpartition(dists, -n)[-n:]
+    return top[np.argsort(dists[top])]
+
+
+def find_similar(name, weights, index=None, rindex=None, index_name='country', n=10, least=False, return_dist=False, plot=False, ann=None):
+    """Find n most similar items (or least) to name based on embeddings. Option to also plot the results.
+    weights can also be an Artifact, or the path of an artifact file, in which case its memory mapped
+    vectors and dish names are used, a Corpus, whose sparse rows are used as they are, or an
+    EmbeddingStore, whose rows are normalized so the scores are cosine similarities.
+    ann is an optional LshIndex or IvfIndex (Ann.py) built on the same weights, to look up only its
+    candidates instead of scoring every row; dists is then NaN outside the n returned."""
     
+    weights, index, rindex = _resolve(weights, index, rindex)
+
     # Check to make sure `name` is in index
     try:
+        if ann is not None and not least:
+            rows, scores = ann.query_row(index[name], n)
         # Calculate dot product between book and all others
-        dists = np.dot(weights, weights[index[name]])
+        else:
+            dists = _scores(weights, [index[name]])[0]
     except KeyError:
         print(f'{name} not found')
         return
     
-    # Sort distance indexes from smallest to largest
-    sorted_dists = np.argsort(dists)
-    closest = sorted_dists[-n:]
+    if ann is not None and not least:
+        dists = np.full(weights.shape[0], np.nan, dtype=np.float32)
+        dists[rows] = scores
+        closest = rows[::-1]
+    else:
+        # Indexes of the n largest distances, smallest to largest
+        closest = top_n(dists, n)
         
     # Need distances later on
     if return_dist:
@@ -30,19 +90,70 @@ def find_similar(name, weights, index, rindex, index_name='country', n=10, least
         print(f'{index_name.capitalize()}: {rindex[c]:{max_width + 2}} Similarity: {dists[c]:.{2}}')
 
 
-def get_closest(input_dish, cosine_df, df):
+def find_similar_batch(names, weights, index=None, rindex=None, n=10, least=False, exclude_self=True, block_size=1024):
+    '''Finds the n most (or least) similar items for many names at once, e.g. for the whole menu. Each block
+    of block_size names is scored against every item with one matrix product, and the top (or bottom) n
+    of each row are picked with argpartition before only those get sorted. weights can be anything
+    find_similar takes. Names not in index are reported and left out.
+
+    Returns a structured array of shape (names found, n) with fields query (the name asked about), name,
+    row and similarity, each row most similar first (least similar first with least=True).
+
+    Arguments: list of strings, array (or Artifact, path or Corpus), dict (optional), list (optional), int (optional), bool (optional), bool (optional), int (optional)
+    Returns: structured array
+    '''
+
+    weights, index, rindex = _resolve(weights, index, rindex)
+    found = [name for name in names if name in index]
+    for name in names:
+        if name not in index:
+            print(f'{name} not found')
+    rows = np.array([index[name] for name in found], dtype=np.int64)
+
+    total = weights.shape[0]
+    n = min(n, total - 1 if exclude_self else total)
+    labels = np.array([str(rindex[i]) for i in range(total)])
+    width = max([len(str(name)) for name in found] + [labels.dtype.itemsize // 4, 1])
+    results = np.zeros((len(found), n), dtype=[("query", f'U{width}'), ("name", f'U{width}'), ("row", np.int32), ("similarity", np.float32)])
+    sign = -1 if least else 1
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        sims = _scores(weights, block)
+        # Flip the sign for the least similar, so both are a top-n
+        sims = sign * sims.astype(np.float32)
+        if exclude_self:
+            sims[np.arange(len(block)), block] = -np.inf
+
+        top = np.argpartition(sims, -n, axis=1)[:, -n:]
+        order = np.argsort(-np.take_along_axis(sims, top, axis=1), axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        chunk = results[start:start + len(block)]
+        chunk["query"] = np.array(found[start:start + len(block)])[:, None]
+        chunk["row"] = top
+        chunk["name"] = labels[top]
+        chunk["similarity"] = sign * np.take_along_axis(sims, top, axis=1)
+    return results
 
-    reset_df = df.set_index("Food")
 
-    closest = cosine_df[input_dish].sort_values(ascending=False)[1:].idxmax()
-    if len(reset_df.loc[closest]["Text"]) > 1000:
-        text = reset_df.loc[closest]["Text"][:1000] + "..."
+# What the result page shows for a dish, all worked out ahead of time
+DishCard = namedtuple("DishCard", ["text", "origin", "image_link", "page_link"])
+
+
+def dish_card(row):
+    """Takes a dish's row of the foods df and returns its DishCard: the text cut to 1000 characters and
+    before "See also", the origin title cased (except of, and, the), the image link and the page link."""
+
+    if len(row["Text"]) > 1000:
+        text = row["Text"][:1000] + "..."
     else:
-        text = reset_df.loc[closest]["Text"]
+        text = row["Text"]
     text = text.split("See also")[0]
-    text = re.sub("(  )( *)", " ", text)
+    text = SPACE_RUNS.sub(" ", text)
     origin = []
-    for word in reset_df.loc[closest]["Origin"].split(" "):
+    # Dishes added since the last full build may not have an origin
+    origin_text = row["Origin"] if isinstance(row["Origin"], str) else ""
+    for word in origin_text.split(" "):
         if word != "of" and word != "and" and word != "the":
             origin.append(f'{word.capitalize()} ')
         else:
@@ -50,9 +161,74 @@ def get_closest(input_dish, cosine_df, df):
     
     origin = " ".join(origin).strip()
     try:
-        image_link = reset_df.loc[closest]["WORKING URLs"][1]
-    except IndexError:
+        image_link = row["WORKING URLs"][1]
+    except (IndexError, TypeError):
         image_link = ""
-    page_link = reset_df.loc[closest]["URL"]
+    page_link = row["URL"]
+
+    return DishCard(text, origin, image_link, page_link)
+
+
+def build_dish_cards(df):
+    """Takes the foods df and returns a dict of every dish's DishCard, keyed by Food. For a name that's in
+    the df twice, the first row is used, as df.set_index("Food").loc would."""
+
+    cards = {}
+    for row in df.to_dict("records"):
+        if row["Food"] not in cards:
+            cards[row["Food"]] = dish_card(row)
+    return cards
+
+
+def save_dish_cards(path, cards):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, "wb") as to_write:
+        pickle.dump(cards, to_write)
+    os.replace(temp_path, path)
+
+
+def load_dish_cards(path):
+    with open(path, "rb") as to_read:
+        return pickle.load(to_read)
+
+
+def get_closest(input_dish, neighbor_index, df, cards=None):
+    """Returns the closest dish to input_dish and what the result page shows for it. With cards (from
+    build_dish_cards) that's a dict lookup; otherwise the card is worked out from df, the foods df or the
+    same df already indexed by Food."""
+
+    # Neighbors are precomputed and sorted, so the closest other dish is just the first entry
+    closest = neighbor_index.closest(input_dish, 1)[0][0]
+    if cards is not None:
+        card = cards[closest]
+    else:
+        reset_df = df if df.index.name == "Food" else df.set_index("Food")
+        row = reset_df.loc[closest]
+        card = dish_card(dict(row, Food=closest))
+
+    return (closest,) + tuple(card)
+
+
+def benchmark_get_closest(neighbor_index, df, queries=1000, seed=0):
+    """Times get_closest for queries random dishes the old way (the df indexed on every call), from the df
+    indexed once, and from prebuilt cards, checking all three give the same results. Prints and returns
+    the mean milliseconds per call for each."""
+
+    names = list(np.random.default_rng(seed).choice(neighbor_index.names, size=queries))
+    foods = df.set_index("Food")
+    start = time.perf_counter()
+    cards = build_dish_cards(df)
+    build_seconds = time.perf_counter() - start
+
+    timings = {}
+    results = {}
+    for label, arguments in [("df per call", (df, None)), ("indexed df", (foods, None)), ("cards", (None, cards))]:
+        start = time.perf_counter()
+        results[label] = [get_closest(name, neighbor_index, *arguments) for name in names]
+        timings[label] = (time.perf_counter() - start) / queries * 1000
+    same = results["df per call"] == results["indexed df"] == results["cards"]
 
-    return closest, text, origin, image_link, page_link
\ No newline at end of file
+    print(f'{len(cards)} cards built in {build_seconds:.2f}s; same results: {same}')
+    for label, ms in timings.items():
+        print(f'{label:12} {ms:.4f} ms/request ({timings["df per call"] / ms:.0f}x)')
+    return timings
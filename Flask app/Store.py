@@ -0,0 +1,171 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from Artifacts import open_artifact
+from Names import NameResolver, fold
+from Similarity import build_dish_cards, load_dish_cards
+
+
+# The df columns the API can filter neighbors on, by the name of the filter, where the df has them
+FILTER_COLUMNS = {"origin": "Origin", "continent": "Continent"}
+
+
+def load_pickle(path):
+    with open(path, "rb") as to_read:
+        return pickle.load(to_read)
+
+
+class Snapshot:
+    '''One loaded set of similarity artifacts. Never mutated after loading, so requests can share it freely.
+    The df indexed by Food, the result cards (built from the df if no current cards file was loaded) and
+    the NameResolver of the dish names are built here once, not per request. So are the filterable columns,
+    folded and lined up with the neighbor rows, so a filter is one vectorized search.
+
+    tag identifies the artifacts by their mtimes, so unlike version it is the same in every process
+    serving the same files and changes whenever they do (the API's ETags are built on it).
+    '''
+
+    def __init__(self, neighbors, df, mtimes, version, cards=None):
+        self.neighbors = neighbors
+        self.df = df
+        self.foods = df.set_index("Food")
+        self.cards = cards if cards is not None else build_dish_cards(df)
+        self.names = NameResolver(neighbors.names)
+        self.name_array = np.array(neighbors.names, dtype=object)
+        unique = df.drop_duplicates("Food").set_index("Food")
+        self.places = {}
+        for field, column in FILTER_COLUMNS.items():
+            if column in unique.columns:
+                values = unique[column].reindex(neighbors.names)
+                self.places[field] = np.array([fold(value) if isinstance(value, str) else "" for value in values])
+        self.mtimes = mtimes
+        self.tag = hashlib.sha1(repr(sorted(mtimes.items())).encode("utf-8")).hexdigest()[:16]
+        self.version = version
+        self.loaded_at = time.time()
+
+    def allowed(self, field, text):
+        '''Returns a boolean array over the neighbor rows, True for the dishes whose field (origin or
+        continent) contains text, ignoring case and accents.
+        '''
+
+        return np.char.find(self.places[field], fold(text)) >= 0
+
+
+class ModelStore:
+    '''Keeps the neighbor index and the foods df resident in memory for the life of the process.
+
+    The artifacts are loaded once (see warm_up) and handed out read-only to every request and thread.
+    Every check_interval seconds a request also compares the files' mtimes against the loaded
+    snapshot; if they changed, a fresh snapshot is loaded in a background thread and swapped in
+    once complete, so requests keep being served from the old one in the meantime.
+
+    Arguments: string (folder), float (optional)
+    '''
+
+    files = {"neighbors": "dishes.w2v", "df": "initial_df.pickle", "cards": "dish_cards.pickle"}
+    loaders = {"neighbors": open_artifact, "df": load_pickle, "cards": load_dish_cards}
+    # Files the app can do without (the cards can be rebuilt from the df)
+    optional = {"cards"}
+
+    def __init__(self, folder, check_interval=5.0):
+        self.folder = folder
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._version = 0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._ready = threading.Event()
+        self.last_error = None
+
+    def path(self, name):
+        return os.path.join(self.folder, self.files[name])
+
+    def _mtimes(self):
+        mtimes = {}
+        for name in self.files:
+            if name in self.optional and not os.path.exists(self.path(name)):
+                continue
+            mtimes[name] = os.stat(self.path(name)).st_mtime_ns
+        return mtimes
+
+    def _load(self):
+        # Reading mtimes before and after means a file rewritten mid-load is never treated as current
+        before = self._mtimes()
+        loaded = {}
+        for name in before:
+            loaded[name] = self.loaders[name](self.path(name))
+        if self._mtimes() != before:
+            raise RuntimeError("Artifacts changed while loading, will retry")
+        # Cards older than the df are stale, so they get rebuilt from it instead
+        cards = loaded.get("cards") if before.get("cards", -1) >= before["df"] else None
+        self._version += 1
+        return Snapshot(loaded["neighbors"], loaded["df"], before, self._version, cards)
+
+    def _reload(self):
+        try:
+            snapshot = self._load()
+            # Single reference swap; requests holding the old snapshot finish with it
+            self._snapshot = snapshot
+            self.last_error = None
+            self._ready.set()
+        except Exception as error:
+            self.last_error = error
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def warm_up(self, background=False):
+        '''Loads the artifacts now, either blocking or in a background thread.'''
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+            self._last_check = time.monotonic()
+        if background:
+            threading.Thread(target=self._reload, daemon=True).start()
+        else:
+            self._reload()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def _check_for_changes(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            changed = self._mtimes() != self._snapshot.mtimes
+        except OSError:
+            # Mid-replace or missing, keep serving what we have
+            return
+        if changed:
+            self.warm_up(background=True)
+
+    def get(self, timeout=30):
+        '''Returns the current snapshot, waiting for the first load if it hasn't finished yet.'''
+
+        if not self._ready.is_set():
+            self.warm_up(background=True)
+            if not self._ready.wait(timeout):
+                raise RuntimeError(f'Similarity artifacts not loaded: {self.last_error}')
+        self._check_for_changes()
+        return self._snapshot
+
+    def status(self):
+        snapshot = self._snapshot
+        return {
+            "ready": self.is_ready(),
+            "version": snapshot.version if snapshot else None,
+            "tag": snapshot.tag if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloading": self._reloading,
+            "error": str(self.last_error) if self.last_error else None,
+        }
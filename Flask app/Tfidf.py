@@ -0,0 +1,346 @@
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from Neighbors import NeighborIndex, top_k_rows, build_neighbor_index
+from Corpus import Corpus
+from Artifacts import save_artifact
+from Similarity import build_dish_cards, save_dish_cards
+
+
+# TfidfVectorizer's default token pattern
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def analyze(document, stop_words=ENGLISH_STOP_WORDS):
+    '''Splits a document into terms the way TfidfVectorizer(stop_words='english') does: lowercased, tokens of two
+    or more word characters, stop words dropped.
+    '''
+
+    return [token for token in TOKEN_PATTERN.findall(document.lower()) if token not in stop_words]
+
+
+class IncrementalTfidf:
+    '''TF-IDF model of the dish corpus that takes new, changed and removed dishes without a refit.
+
+    Keeps the vocabulary, document frequencies and raw term counts as state, so weights are always the
+    ones TfidfVectorizer(stop_words='english') would give the current corpus (smooth idf, l2 normalized
+    rows). Alongside it keeps each dish's top-k neighbor lists; a change only rescores the dish itself
+    and the dishes whose lists it enters or leaves. Every other list was scored against slightly older
+    idf weights, so after rebuild_after * n changes all lists are rescored (rebuild()).
+
+    Arguments: int (optional), float (optional)
+    '''
+
+    def __init__(self, k=20, rebuild_after=0.05):
+        self.k = k
+        self.rebuild_after = rebuild_after
+        self.vocabulary = {}
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self.names = []
+        self.rows = {}
+        self.counts = []
+        self.neighbors = np.empty((0, 0), dtype=np.int32)
+        self.scores = np.empty((0, 0), dtype=np.float32)
+        self.changes_since_rebuild = 0
+        self._matrix = None
+
+    @classmethod
+    def fit(cls, names, documents, k=20, rebuild_after=0.05):
+        '''Takes dish names and their documents and returns a model of them with every neighbor list scored.
+        Raises ValueError if a name comes up more than once, since each name is one row.
+        '''
+
+        names = list(names)
+        repeated = sorted(name for name, count in Counter(names).items() if count > 1)
+        if repeated:
+            raise ValueError(f'Dish names must be unique, repeated: {", ".join(map(str, repeated[:10]))}')
+
+        model = cls(k, rebuild_after)
+        for name, document in zip(names, documents):
+            model.rows[name] = len(model.names)
+            model.names.append(name)
+            model.counts.append(model._term_counts(document))
+        model.rebuild()
+        return model
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_matrix"] = None
+        return state
+
+    def _term_counts(self, document):
+        '''Returns (columns, counts) for a document, adding any new terms to the vocabulary and counting
+        the document in the document frequencies.
+        '''
+
+        terms = {}
+        for term in analyze(document):
+            column = self.vocabulary.get(term)
+            if column is None:
+                column = self.vocabulary[term] = len(self.vocabulary)
+            terms[column] = terms.get(column, 0) + 1
+
+        if len(self.vocabulary) > len(self.document_frequency):
+            grown = np.zeros(max(len(self.vocabulary), 2 * len(self.document_frequency)), dtype=np.int64)
+            grown[:len(self.document_frequency)] = self.document_frequency
+            self.document_frequency = grown
+
+        columns = np.fromiter(terms.keys(), dtype=np.int32, count=len(terms))
+        self.document_frequency[columns] += 1
+        return columns, np.fromiter(terms.values(), dtype=np.float64, count=len(terms))
+
+    @property
+    def idf(self):
+        n = len(self.names)
+        document_frequency = self.document_frequency[:len(self.vocabulary)]
+        return np.log((1 + n) / (1 + document_frequency)) + 1.0
+
+    def matrix(self):
+        '''Returns the (dishes, terms) TF-IDF matrix of the current corpus as a CSR matrix.'''
+
+        if self._matrix is None:
+            lengths = [len(columns) for columns, _ in self.counts]
+            indptr = np.zeros(len(self.counts) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum(lengths)
+            indices = np.concatenate([columns for columns, _ in self.counts]) if self.counts else np.zeros(0, dtype=np.int32)
+            data = np.concatenate([counts for _, counts in self.counts]) if self.counts else np.zeros(0)
+            matrix = sp.csr_matrix((data * self.idf[indices], indices, indptr), shape=(len(self.counts), len(self.vocabulary)))
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            self._matrix = sp.csr_matrix(sp.diags(1.0 / norms) @ matrix)
+        return self._matrix
+
+    def vector(self, name):
+        return self.matrix()[self.rows[name]]
+
+    def corpus(self):
+        '''Returns the current TF-IDF matrix as a Corpus (terms no longer in any document stay as empty columns).'''
+
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        return Corpus(self.matrix(), terms, self.names)
+
+    @property
+    def width(self):
+        return max(0, min(self.k, len(self.names) - 1))
+
+    def rebuild(self):
+        '''Rescores every neighbor list against the current weights.'''
+
+        index = build_neighbor_index(self.matrix(), self.names, k=self.k)
+        self.neighbors, self.scores = index.neighbors, index.scores
+        self.changes_since_rebuild = 0
+
+    def _rescore(self, rows, block_size=512):
+        rows = np.asarray(sorted(rows), dtype=np.int64)
+        matrix = self.matrix()
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            sims = (matrix[block] @ matrix.T).toarray()
+            self.neighbors[block], self.scores[block] = top_k_rows(sims, self.width, rows=block)
+
+    def _entered(self, row):
+        '''Returns the rows whose neighbor lists the dish at row now belongs in.'''
+
+        if self.scores.shape[1] == 0:
+            return set()
+        sims = (self.matrix() @ self.matrix()[row].T).toarray().ravel()
+        sims[row] = -np.inf
+        return set(np.flatnonzero(sims > self.scores[:, -1]).tolist())
+
+    def _changed(self, affected):
+        self.changes_since_rebuild += 1
+        if self.neighbors.shape[1] != self.width or self.changes_since_rebuild > self.rebuild_after * len(self.names):
+            self.rebuild()
+        else:
+            self._rescore(affected)
+
+    def add(self, name, document):
+        '''Takes a dish name and its document and adds it to the corpus (or updates it, if already there).'''
+
+        if name in self.rows:
+            return self.update(name, document)
+
+        row = len(self.names)
+        self.rows[name] = row
+        self.names.append(name)
+        self.counts.append(self._term_counts(document))
+        self._matrix = None
+
+        self.neighbors = np.vstack([self.neighbors, np.zeros((1, self.neighbors.shape[1]), dtype=np.int32)])
+        self.scores = np.vstack([self.scores, np.full((1, self.scores.shape[1]), -np.inf, dtype=np.float32)])
+        if self.neighbors.shape[1] == self.width:
+            affected = self._entered(row) | {row}
+        else:
+            affected = set()
+        self._changed(affected)
+
+    def update(self, name, document):
+        '''Takes a dish name already in the corpus and replaces its document.'''
+
+        row = self.rows[name]
+        old_columns, _ = self.counts[row]
+        self.document_frequency[old_columns] -= 1
+        self.counts[row] = self._term_counts(document)
+        self._matrix = None
+
+        # Lists it was in (its score there has changed) and lists it now belongs in
+        affected = set(np.flatnonzero((self.neighbors == row).any(axis=1)).tolist()) | self._entered(row) | {row}
+        self._changed(affected)
+
+    def remove(self, name):
+        '''Takes a dish name and removes it from the corpus.'''
+
+        row = self.rows.pop(name)
+        old_columns, _ = self.counts.pop(row)
+        self.document_frequency[old_columns] -= 1
+        del self.names[row]
+        for later in self.names[row:]:
+            self.rows[later] -= 1
+        self._matrix = None
+
+        was_neighbor = (self.neighbors == row).any(axis=1)
+        self.neighbors = np.delete(self.neighbors, row, axis=0)
+        self.scores = np.delete(self.scores, row, axis=0)
+        self.neighbors[self.neighbors > row] -= 1
+        self._changed(set(np.flatnonzero(np.delete(was_neighbor, row)).tolist()))
+
+    def closest(self, name, n=None):
+        return self.neighbor_index().closest(name, n)
+
+    def neighbor_index(self):
+        return NeighborIndex(self.names, self.neighbors, self.scores)
+
+    def save(self, path):
+        temp_path = f'{path}.tmp'
+        with open(temp_path, "wb") as to_write:
+            pickle.dump(self, to_write)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as to_read:
+            return pickle.load(to_read)
+
+
+class TfidfService:
+    '''Adds, updates and removes dishes in the folder the app serves from without a full rebuild.
+
+    Owns the IncrementalTfidf state (tfidf.pickle) and the dish df (initial_df.pickle) and rewrites the
+    neighbor artifact (dishes.w2v) after a change. The app's ModelStore notices the new mtimes and
+    swaps the new artifacts in within its check_interval. The df and its result cards (dish_cards.pickle)
+    are written before the artifact, so the app never sees a neighbor that's missing from its df.
+
+    Each add_dish or remove_dish on its own writes everything out. Inside a batch() (or with add_dishes)
+    the changes are only made in memory and everything is written once, when the batch ends.
+
+    Arguments: string (folder)
+    '''
+
+    files = {"model": "tfidf.pickle", "df": "initial_df.pickle", "cards": "dish_cards.pickle", "neighbors": "dishes.w2v"}
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.model = IncrementalTfidf.load(self.path("model"))
+        with open(self.path("df"), "rb") as to_read:
+            self.df = pickle.load(to_read)
+        self.lock = threading.RLock()
+        self._batches = 0
+        self._pending = {}
+        self._dirty = False
+
+    def path(self, name):
+        return os.path.join(self.folder, self.files[name])
+
+    @classmethod
+    def create(cls, folder, df, documents_column="CORPUS", k=20):
+        '''Takes a folder and the dish df (with a Food column and a column of documents) and fits and saves
+        everything the service and the app need there.
+        '''
+
+        model = IncrementalTfidf.fit(list(df["Food"]), list(df[documents_column]), k=k)
+        model.save(os.path.join(folder, cls.files["model"]))
+        service = cls.__new__(cls)
+        service.folder, service.model, service.df = folder, model, df
+        service.lock, service._batches, service._pending, service._dirty = threading.RLock(), 0, {}, False
+        service._write()
+        return service
+
+    def _apply_pending(self):
+        '''Puts the rows added in the current batch into the df with one concat.'''
+
+        if self._pending:
+            self.df = pd.concat([self.df[~self.df["Food"].isin(self._pending)], pd.DataFrame(list(self._pending.values()))], ignore_index=True)
+            self._pending = {}
+
+    def _write(self):
+        self._apply_pending()
+        temp_path = f'{self.path("df")}.tmp'
+        with open(temp_path, "wb") as to_write:
+            pickle.dump(self.df, to_write)
+        os.replace(temp_path, self.path("df"))
+        save_dish_cards(self.path("cards"), build_dish_cards(self.df))
+        save_artifact(self.path("neighbors"), self.model.neighbor_index())
+        self.model.save(self.path("model"))
+        self._dirty = False
+
+    @contextmanager
+    def batch(self):
+        '''Holds the service for a run of add_dish and remove_dish calls and writes the df, cards, artifact
+        and model once at the end instead of after each one. Batches can nest; the outermost one writes.
+        '''
+
+        with self.lock:
+            self._batches += 1
+            try:
+                yield self
+            finally:
+                self._batches -= 1
+                if self._batches == 0 and self._dirty:
+                    self._write()
+
+    def add_dish(self, row, document):
+        '''Takes a dish's row for the df (a dict or Series with at least Food) and its document and adds
+        it, or replaces it if a dish with that name is already there.
+
+        Arguments: dict or Series, string
+        Returns: (none)
+        '''
+
+        with self.batch():
+            name = row["Food"]
+            self.model.add(name, document)
+            self._pending[name] = dict(row)
+            self._dirty = True
+
+    def add_dishes(self, rows, documents):
+        '''Takes dishes' rows for the df and their documents and adds them all, writing everything once.
+
+        Arguments: list of dicts or Series, list of strings
+        Returns: (none)
+        '''
+
+        with self.batch():
+            for row, document in zip(rows, documents):
+                self.add_dish(row, document)
+
+    def remove_dish(self, name):
+        with self.batch():
+            self.model.remove(name)
+            self._pending.pop(name, None)
+            self.df = self.df[self.df["Food"] != name].reset_index(drop=True)
+            self._dirty = True
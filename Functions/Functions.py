@@ -1,4 +1,3 @@
-import requests
 import pandas as pd
 import numpy as np
 import re
@@ -6,60 +5,44 @@ from bs4 import BeautifulSoup
 from tqdm import tqdm
 import pickle
 import unidecode
+import lxml.html
 
+from wiki_fetcher import get_default_fetcher
+from html_cleaner import RAW_HTML_CLEANER, CUISINE_LINKS_CLEANER, find_by_id, element_text, wikilink_elements, stream_wikilinks
 
-def get_cuisine_links(url, country, bottom_nav_check=False, text_only=False, raw_text=False, dict_with_places=None):
 
-    import requests
-    import re
-    from bs4 import BeautifulSoup
-    from tqdm import tqdm
-    import pickle
-    import unidecode
+def get_cuisine_links(url, country, bottom_nav_check=False, text_only=False, raw_text=False, dict_with_places=None):
 
-    response = requests.get(url)
+    response = get_default_fetcher().get(url)
     print(response.status_code)
     page = response.text
-    soup = BeautifulSoup(page)
+    root = lxml.html.document_fromstring(page)
 
     # Each page should include itself in its links, as others that link to it will share something with it
     self_link = url.split("https://en.wikipedia.org/wiki/")[1]
-    title = soup.find(id="firstHeading").text
-    bottom_nav_links = np.NaN
+    title = element_text(find_by_id(root, "firstHeading"))
+    bottom_nav_links = np.nan
     if bottom_nav_check==True:
-        for i, a in enumerate(soup.find_all("a", class_="mw-selflink selflink")):
-            if a.text == f'Cuisine of {country}' or a.text == title:
+        for i, a in enumerate(root.xpath('//a[@class="mw-selflink selflink"]')):
+            a_text = element_text(a)
+            if a_text == f'Cuisine of {country}' or a_text == title:
                 bottom_nav_links = []
-                print(a.text)
+                print(a_text)
                 try:
-                    for _ in soup.find(id="External_links").find_next("td", class_="navbox-list").find_all("a"):
-                        bottom_nav_links.append((_["href"].lstrip('/wiki/'), _.text))
-                except (AttributeError, KeyError) as error:
+                    nav_list = find_by_id(root, "External_links").xpath('following::td[contains(concat(" ", normalize-space(@class), " "), " navbox-list ")]')[0]
+                    for _ in nav_list.iter("a"):
+                        bottom_nav_links.append((_.attrib["href"].lstrip('/wiki/'), element_text(_)))
+                except (AttributeError, KeyError, IndexError) as error:
                     continue
                 bottom_nav_links = list(set(bottom_nav_links))
 
-    tags_to_extract = ['table', 'script', 'meta', 'style']
-    titles_to_extract = ['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), "Help:Category", re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)")]
-    texts_to_extract = ['edit', re.compile("(Jump to)"), 'cuisine']
-    classes_to_extract = ['reference']
-    ids_to_extract = ['mw-hidden-catlinks']
-
-    for t in tags_to_extract:
-        [s.extract() for s in soup(t)]
-    for t in ids_to_extract:
-        [s.extract() for s in soup(id=t)]
-    for t in titles_to_extract:
-        [s.extract() for s in soup("a", title=t)]
-    for t in texts_to_extract:
-        [s.extract() for s in soup("a", text=t)]
-    for t in classes_to_extract:
-        [s.extract() for s in soup("a", class_=t)]
+    # Tables, references, hidden categories and housekeeping links all go in one pass (see html_cleaner.py)
+    CUISINE_LINKS_CLEANER.clean(root)
 
-    main_body = soup.find('div', id='bodyContent')
     if text_only==False:
-        page_wikilinks = [(country, country), (self_link, title)] + list(set([(wikilink["href"].lstrip('/wiki/'), wikilink.text) for wikilink in main_body.find_all("a", href=re.compile("(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+        page_wikilinks = [(country, country), (self_link, title)] + list(set([(wikilink.get("href").lstrip('/wiki/'), text) for wikilink, text in wikilink_elements(root)]))
     else:
-        page_wikilinks = [(country, country), (self_link, title)] + list(set([unidecode.unidecode(wikilink.text) for wikilink in main_body.find_all("a", href=re.compile("(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+        page_wikilinks = [(country, country), (self_link, title)] + list(set([unidecode.unidecode(text) for wikilink, text in wikilink_elements(root)]))
 
     if dict_with_places:
         dictionary = dict_with_places[0]
@@ -79,26 +62,8 @@ def get_links_from_raw_html(raw_html, url_end, area, dict_with_places=None):
     as strings), returns the dictionary with the new area, included places and links appended.
     '''
 
-    soup = BeautifulSoup(raw_html)
-
-    tags_to_extract = ['table', 'script', 'meta', 'style']
-    titles_to_extract = ['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), "Help:Category", re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)")]
-    texts_to_extract = ['edit', re.compile("(Jump to)")]
-    classes_to_extract = ['reference']
-    ids_to_extract = ['mw-hidden-catlinks']
-
-    for t in tags_to_extract:
-        [s.extract() for s in soup(t)]
-    for t in ids_to_extract:
-        [s.extract() for s in soup(id=t)]
-    for t in titles_to_extract:
-        [s.extract() for s in soup("a", title=t)]
-    for t in texts_to_extract:
-        [s.extract() for s in soup("a", text=t)]
-    for t in classes_to_extract:
-        [s.extract() for s in soup("a", class_=t)]
-
-    links = [(url_end, area)] + list(set([(wikilink["href"].lstrip('/wiki/'), wikilink.text) for wikilink in soup.find_all("a", href=re.compile("(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+    # Links are picked up while the page is parsed, skipping tables, references, hidden categories and housekeeping links (see html_cleaner.py)
+    links = [(url_end, area)] + list(set([(href.lstrip('/wiki/'), text) for href, text in stream_wikilinks(raw_html, RAW_HTML_CLEANER, body_id=None)]))
 
     if dict_with_places:
         dictionary = dict_with_places[0]
@@ -113,6 +78,9 @@ def get_links_from_raw_html(raw_html, url_end, area, dict_with_places=None):
 def get_cuisine_dict(list_of_templates, kenya_links, zimbabwe_links, jersey_links, cook_islands_links, tonga_links, st_kitts_links, martinique_links, wallis_and_futuna_links):
  
     cuisine_dict = {}
+    # Template pages for every group are fetched in parallel up front
+    fetcher = get_default_fetcher()
+    template_pages = fetcher.iter_many([template[1] for group in list_of_templates for template in group])
     for group in list_of_templates:
         if group == list_of_templates[0]:
             continent = "Africa"
@@ -134,7 +102,7 @@ def get_cuisine_dict(list_of_templates, kenya_links, zimbabwe_links, jersey_link
             continent = "Caribbean"
         for template in group:
             country = " ".join(template[0].split(":")[1].split(" ")[:-1])
-            response = requests.get(f'{template[1]}')
+            response = next(template_pages)
             page = response.text
             soup = BeautifulSoup(page)
             if country == "Balearic Islands":
@@ -175,7 +143,7 @@ def get_cuisine_dict(list_of_templates, kenya_links, zimbabwe_links, jersey_link
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Kenya":
                 country_links = kenya_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Lesotho":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Cuisine_of_Lesotho'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -226,7 +194,7 @@ def get_cuisine_dict(list_of_templates, kenya_links, zimbabwe_links, jersey_link
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Zimbabwe":
                 country_links = zimbabwe_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Iraqi Kurdistan":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Kurdish_cuisine'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -241,7 +209,7 @@ def get_cuisine_dict(list_of_templates, kenya_links, zimbabwe_links, jersey_link
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Jersey":
                 country_links = jersey_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Liechtenstein":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Liechtenstein_cuisine'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -297,16 +265,16 @@ def get_cuisine_dict(list_of_templates, kenya_links, zimbabwe_links, jersey_link
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Saint Kitts and Nevis":
                 country_links = st_kitts_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Martinique":
                 country_links = martinique_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Turks and Caicos":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Cuisine_of_the_Turks_and_Caicos_Islands'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Wallis and Futuna":
                 country_links = wallis_and_futuna_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Rapa Nui":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Pascuense_cuisine'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -339,7 +307,7 @@ def get_cuisine_dict(list_of_templates, kenya_links, zimbabwe_links, jersey_link
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
 
             else:
-                country_links, bottom_links = np.NaN, np.NaN
+                country_links, bottom_links = np.nan, np.nan
                 for a in soup.find("div", class_="navbox").find_all("a"):
                     if a.text == "Cuisine":
                         cuisine_link = f'https://en.wikipedia.org{a["href"]}'
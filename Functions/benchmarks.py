@@ -0,0 +1,237 @@
+import glob
+import json
+import os
+import pickle
+import random
+import re
+import time
+from urllib.parse import quote
+
+import unidecode
+from bs4 import BeautifulSoup
+
+import wikipedia_functions
+from page_cache import PageCache
+from minhash import LinkSketches
+from html_cleaner import RAW_HTML_CLEANER, CUISINE_LINKS_CLEANER, WIKILINKS_CLEANER, wikilink_elements, stream_wikilinks
+
+
+# For loading pages saved by the page cache (or a folder of .html files) to benchmark on
+def load_saved_pages(folder, limit=None):
+    '''Takes a PageCache folder, or a folder of saved .html files, and returns a list of (url, html) tuples.
+
+    Arguments: string (folder), int (optional)
+    Returns: list
+    '''
+
+    pages = []
+    if os.path.isdir(os.path.join(folder, "urls")):
+        cache = PageCache(folder, ttl=None, offline=True)
+        for path in sorted(glob.glob(os.path.join(folder, "urls", "*", "*.json"))):
+            with open(path, "r", encoding="utf-8") as to_read:
+                entry = json.load(to_read)
+            pages.append((entry["url"], cache.read(entry).text))
+    else:
+        for path in sorted(glob.glob(os.path.join(folder, "*.html"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "r", encoding="utf-8") as to_read:
+                pages.append((f'https://en.wikipedia.org/wiki/{quote(name)}', to_read.read()))
+    return pages[:limit]
+
+
+def _extract_with_soup(soup, tags_to_extract, ids_to_extract, titles_to_extract, texts_to_extract, classes_to_extract):
+    for t in tags_to_extract:
+        [s.extract() for s in soup(t)]
+    for t in ids_to_extract:
+        [s.extract() for s in soup(id=t)]
+    for t in titles_to_extract:
+        [s.extract() for s in soup("a", title=t)]
+    for t in texts_to_extract:
+        [s.extract() for s in soup("a", text=t)]
+    for t in classes_to_extract:
+        [s.extract() for s in soup("a", class_=t)]
+
+
+def _rules(cleaner):
+    titles = sorted(cleaner.titles[0]) + ([cleaner.titles[1]] if cleaner.titles[1] else [])
+    texts = sorted(cleaner.texts[0]) + ([cleaner.texts[1]] if cleaner.texts[1] else [])
+    return sorted(cleaner.tags), sorted(cleaner.ids), titles, texts, sorted(cleaner.classes)
+
+
+# The link extraction as it was done before html_cleaner.py, kept as the baseline
+def soup_links(page, cleaner, body_id="bodyContent", unidecoded=False):
+    soup = BeautifulSoup(page, "lxml")
+    _extract_with_soup(soup, *_rules(cleaner))
+    body = soup.find('div', id=body_id) if body_id else soup
+    return set([(wikilink["href"].lstrip('/wiki/'), unidecode.unidecode(wikilink.text) if unidecoded else wikilink.text) for wikilink in body.find_all("a", href=re.compile(r"(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "])
+
+
+def cleaner_links(page, cleaner, body_id="bodyContent", unidecoded=False):
+    root = cleaner.parse(page)
+    return set([(wikilink.get("href").lstrip('/wiki/'), unidecode.unidecode(text) if unidecoded else text) for wikilink, text in wikilink_elements(root, body_id=body_id)])
+
+
+def stream_links(page, cleaner, body_id="bodyContent", unidecoded=False):
+    return set([(href.lstrip('/wiki/'), unidecode.unidecode(text) if unidecoded else text) for href, text in stream_wikilinks(page, cleaner, body_id=body_id)])
+
+
+# Links wrapping nodes the cleaners remove, where a link's own rules have to see it cleaned first (the
+# soup loops removed all the tags before looking at any link)
+_BODY = '<html><body><div id="bodyContent"><p>{}</p></div></body></html>'
+EDGE_CASE_PAGES = [
+    ("script", _BODY.format('<a href="/wiki/Sc"><script>x</script>edit</a> <a href="/wiki/Pho"><script>x</script>Pho</a>')),
+    ("style and comment", _BODY.format('<a href="/wiki/Tom_yum"><style>y</style>Tom<!--c--> yum</a>')),
+    ("table", '<html><body><div id="bodyContent"><div><a href="/wiki/Laksa"><table><tr><td>z</td></tr></table>Laksa</a></div></div></body></html>'),
+    ("meta", _BODY.format('<a href="/wiki/Nasi_lemak"><meta>Nasi lemak</a>')),
+    ("hidden categories", _BODY.format('<a href="/wiki/Mochi"><span id="mw-hidden-catlinks">h</span>Mochi</a>')),
+]
+
+
+def _time(function, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(page) for page in pages]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def benchmark_cleaner(pages, repeat=3):
+    '''Takes a list of (url, html) tuples and times link extraction with the old soup.extract() loops against
+    the single pass HtmlCleaner and the streaming LinkStream for each of the three rule sets, checking all
+    three give the same links, on the pages and on EDGE_CASE_PAGES. Prints a summary and returns it as a dict.
+
+    Arguments: list of tuples, int (optional)
+    Returns: dict
+    '''
+
+    htmls = [html for _, html in pages]
+    summary = {}
+    for name, cleaner, body_id, unidecoded in [("get_wikilinks", WIKILINKS_CLEANER, "bodyContent", True),
+                                               ("get_cuisine_links", CUISINE_LINKS_CLEANER, "bodyContent", False),
+                                               ("get_links_from_raw_html", RAW_HTML_CLEANER, None, False)]:
+        soup_time, soup_results = _time(lambda page: soup_links(page, cleaner, body_id, unidecoded), htmls, repeat)
+        cleaner_time, cleaner_results = _time(lambda page: cleaner_links(page, cleaner, body_id, unidecoded), htmls, repeat)
+        stream_time, stream_results = _time(lambda page: stream_links(page, cleaner, body_id, unidecoded), htmls, repeat)
+        mismatches = [url for (url, _), old, new, streamed in zip(pages, soup_results, cleaner_results, stream_results) if not old == new == streamed]
+        mismatches += [case for case, page in EDGE_CASE_PAGES
+                       if not soup_links(page, cleaner, body_id, unidecoded) == cleaner_links(page, cleaner, body_id, unidecoded) == stream_links(page, cleaner, body_id, unidecoded)]
+        summary[name] = {"pages": len(pages), "soup_seconds": soup_time, "cleaner_seconds": cleaner_time, "stream_seconds": stream_time,
+                         "speedup": soup_time / cleaner_time if cleaner_time else float("inf"),
+                         "stream_speedup": soup_time / stream_time if stream_time else float("inf"), "mismatches": mismatches}
+        print(f'{name:25} soup: {soup_time:.3f}s  cleaner: {cleaner_time:.3f}s ({summary[name]["speedup"]:.1f}x)  stream: {stream_time:.3f}s ({summary[name]["stream_speedup"]:.1f}x)  mismatched pages: {len(mismatches)}')
+
+    return summary
+
+
+# For benchmarking without scraped pages: families of pages sharing a core of links, each with its own extras
+def synthetic_link_lists(pages=5000, family_size=5, links=300, seed=0):
+    '''Returns a dictionary of page names to lists of links, in families of family_size pages that keep a
+    random 20-100% of a shared core of links and add their own, so pairs cover the whole Jaccard range.
+
+    Arguments: int (optional), int (optional), int (optional), int (optional)
+    Returns: dict
+    '''
+
+    rng = random.Random(seed)
+    link_lists = {}
+    for family in range(pages // family_size):
+        core = [f'Core_{family}_{i}' for i in range(links)]
+        for member in range(family_size):
+            kept = rng.sample(core, int(links * rng.uniform(0.2, 1.0)))
+            link_lists[f'Page_{family}_{member}'] = kept + [f'Own_{family}_{member}_{i}' for i in range(rng.randint(0, links // 2))]
+    return link_lists
+
+
+def _jaccard(links, other_links):
+    return len(links & other_links) / len(links | other_links) if links or other_links else 0.0
+
+
+def benchmark_minhash(link_lists, threshold=0.5, num_perm=128, queries=200, seed=0):
+    '''Takes a dictionary of page names to lists of links and, for queries random pages, finds the pages
+    above threshold Jaccard similarity exactly (comparing link sets with every page) and with LinkSketches.
+    Prints the time for each, the time to sketch and index everything, recall and precision of the sketch
+    results against the exact ones and the mean error of the estimates. Returns the numbers as a dict.
+
+    Arguments: dict, float (optional), int (optional), int (optional), int (optional)
+    Returns: dict
+    '''
+
+    sets = {name: set(links) for name, links in link_lists.items()}
+    names = random.Random(seed).sample(list(sets), min(queries, len(sets)))
+
+    start = time.perf_counter()
+    sketches = LinkSketches(threshold, num_perm)
+    for name, links in link_lists.items():
+        sketches.add(name, links)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact = {name: {other: _jaccard(sets[name], links) for other, links in sets.items() if other != name} for name in names}
+    exact_seconds = time.perf_counter() - start
+    exact = {name: {other: score for other, score in scores.items() if score >= threshold} for name, scores in exact.items()}
+
+    start = time.perf_counter()
+    approximate = {name: dict(sketches.similar(name)) for name in names}
+    sketch_seconds = time.perf_counter() - start
+
+    found = sum(len(exact[name].keys() & approximate[name].keys()) for name in names)
+    expected = sum(len(exact[name]) for name in names)
+    returned = sum(len(approximate[name]) for name in names)
+    errors = [abs(score - _jaccard(sets[name], sets[other])) for name in names for other, score in approximate[name].items()]
+    summary = {"pages": len(sets), "queries": len(names), "bands": sketches.bands, "rows": sketches.rows,
+               "build_seconds": build_seconds, "exact_ms": exact_seconds / len(names) * 1000,
+               "sketch_ms": sketch_seconds / len(names) * 1000, "recall": found / expected if expected else 1.0,
+               "precision": found / returned if returned else 1.0, "mean_error": sum(errors) / len(errors) if errors else 0.0}
+    print(f'{summary["pages"]} pages, Jaccard >= {threshold}, {num_perm} hashes in {sketches.bands} bands of {sketches.rows}: '
+          f'sketching took {build_seconds:.2f}s')
+    print(f'exact: {summary["exact_ms"]:.2f} ms/query  sketch: {summary["sketch_ms"]:.2f} ms/query ({summary["exact_ms"] / summary["sketch_ms"]:.0f}x)  '
+          f'recall: {summary["recall"]:.3f}  precision: {summary["precision"]:.3f}  mean estimate error: {summary["mean_error"]:.3f}')
+    return summary
+
+
+def _same(values, other_values):
+    # repr, so NaNs (no origin, no infobox) count as equal
+    return [repr(value) for value in values] == [repr(value) for value in other_values]
+
+
+# For checking that one dish can be added to an already processed df without reprocessing it
+def check_add_to_foods_df(df, url, store="Processed_foods_df.pickle", model=None):
+    '''Takes a foods df already processed into store (see process_full_df) and the URL of a dish page not in
+    it, adds the dish with add_to_foods_df(processed=store) and checks that the df grew by that one row,
+    that the stored rows' processed columns came back unchanged and that the new row was processed from
+    its own links, infobox and category. With model (a TfidfService, see Flask app/Tfidf.py) it also
+    checks the dish went into the app's folder and can be queried for its neighbors, and times the whole
+    add. Pages come from the default fetcher, so set one with a PageCache (see wiki_fetcher.py) to check
+    offline; wikipedia_functions needs its nlp set (wikipedia_functions.nlp = spacy.load(...)). Prints and returns the results.
+
+    Arguments: df, string (URL), string (optional), TfidfService (optional)
+    Returns: dict
+    '''
+
+    with open(store, "rb") as to_read:
+        before = pickle.load(to_read)
+    start = time.perf_counter()
+    updated = wikipedia_functions.add_to_foods_df(url, df, processed=store, model=model)
+    seconds = time.perf_counter() - start
+
+    new_row = updated.iloc[-1]
+    results = {"dish": new_row["Food"], "added_one_row": len(updated) == len(before) + 1,
+               "stored_rows_unchanged": all(_same(updated[column].iloc[:-1], before[column]) for column in wikipedia_functions.PROCESSED_COLUMNS),
+               "new_row_processed": isinstance(new_row["All together"], str) and new_row["Content hash"] not in set(before["Content hash"]),
+               "infobox_rows": 0 if isinstance(new_row["Infobox"], float) else len(new_row["Infobox"])}
+    if model is not None:
+        closest = model.model.closest(new_row["Food"], 5) if new_row["Food"] in model.model else []
+        results.update({"in_model": new_row["Food"] in model.model, "in_app_df": new_row["Food"] in set(model.df["Food"]),
+                        "closest": [name for name, _ in closest], "seconds": round(seconds, 3)})
+    print(", ".join(f'{name}: {value}' for name, value in results.items()))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "minhash":
+        benchmark_minhash(synthetic_link_lists(int(sys.argv[2]) if len(sys.argv) > 2 else 5000))
+    else:
+        benchmark_cleaner(load_saved_pages(sys.argv[1] if len(sys.argv) > 1 else "wiki_cache"))
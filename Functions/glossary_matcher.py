@@ -0,0 +1,100 @@
+import re
+from collections import deque
+
+import pandas as pd
+
+
+# Words are runs of word characters, so a term only matches whole words (the way \b works in a regex)
+WORD = re.compile(r"\w+")
+
+
+def words(text, lowercase=True):
+    return WORD.findall(text.lower() if lowercase else text)
+
+
+class GlossaryMatcher:
+    '''Finds every term of a set of glossaries in a text in one pass, with an Aho-Corasick automaton built
+    once over the words of all the terms. Terms match whole words only ("rice" doesn't match in
+    "licorice" or "riced"), terms of several words match those words in a row whatever separates them,
+    and overlapping terms all match ("soy", "soy sauce" and "sauce" in "soy sauce"). A term in more than one
+    glossary is reported under each of its categories.
+
+    Arguments: dict (category: iterable of terms), bool (optional)
+    '''
+
+    def __init__(self, glossaries, lowercase=True):
+        self.categories = list(glossaries)
+        self.lowercase = lowercase
+        # Node 0 is the root; each node has its word transitions, a fail link and the (term, category, length
+        # in words) of the terms ending there
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for category, terms in glossaries.items():
+            for term in terms:
+                term_words = words(term, lowercase)
+                if not term_words:
+                    continue
+                node = 0
+                for word in term_words:
+                    if word not in self.goto[node]:
+                        self.goto.append({})
+                        self.fail.append(0)
+                        self.output.append([])
+                        self.goto[node][word] = len(self.goto) - 1
+                    node = self.goto[node][word]
+                if (term, category, len(term_words)) not in self.output[node]:
+                    self.output[node].append((term, category, len(term_words)))
+
+        # Breadth first, so every node's fail link (the longest proper suffix also in the trie) is set before its children's
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        '''Takes a text and returns a list of (term, category, word position) tuples for every match, in the
+        order they end in the text.
+        '''
+
+        found = []
+        node = 0
+        for position, word in enumerate(words(text, self.lowercase)):
+            while node and word not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(word, 0)
+            for term, category, length in self.output[node]:
+                found.append((term, category, position - length + 1))
+        return found
+
+    def tag(self, text):
+        '''Takes a text and returns a dictionary of each category and the list of its terms found in the text,
+        each once, in order of first appearance.
+        '''
+
+        tags = {category: [] for category in self.categories}
+        seen = set()
+        for term, category, _ in self.find(text):
+            if (term, category) not in seen:
+                seen.add((term, category))
+                tags[category].append(term)
+        return tags
+
+    def tag_many(self, texts):
+        '''Takes a list or Series of texts (the whole corpus, say) and returns a df with a column of found
+        terms per category and a row per text (with the Series' index, if it is one).
+
+        Arguments: list or Series of strings
+        Returns: df
+        '''
+
+        index = texts.index if isinstance(texts, pd.Series) else None
+        rows = [self.tag(text) if isinstance(text, str) else {category: [] for category in self.categories} for text in texts]
+        return pd.DataFrame(rows, index=index, columns=self.categories)
@@ -0,0 +1,339 @@
+import re
+
+import lxml.html
+from lxml import etree
+
+
+WIKI_HREF = re.compile(r"(^\/wiki\/.+)")
+
+
+def _split_rules(rules):
+    '''Splits a list of strings (exact matches) and compiled patterns (searched) into a set and one fused regex.'''
+
+    exact = {rule for rule in rules if isinstance(rule, str)}
+    patterns = [rule.pattern for rule in rules if not isinstance(rule, str)]
+    fused = re.compile("|".join(f'(?:{pattern})' for pattern in patterns)) if patterns else None
+    return exact, fused
+
+
+def _matches(value, exact, fused):
+    if value is None:
+        return False
+    return value in exact or (fused is not None and fused.search(value) is not None)
+
+
+def node_string(element):
+    '''Returns what BeautifulSoup's .string would for an lxml element: the text of its only child, following
+    single-child elements down, or None if it has no children or more than one.
+    '''
+
+    while True:
+        children = list(element)
+        count = (1 if element.text else 0) + len(children) + sum(1 for child in children if child.tail)
+        if count != 1:
+            return None
+        if element.text:
+            return element.text
+        child = children[0]
+        if not isinstance(child.tag, str):
+            # A lone comment counts as the string
+            return child.text
+        element = child
+
+
+class HtmlCleaner:
+    '''Removes unwanted nodes from a parsed page in one traversal of the lxml tree.
+
+    Takes the same five rule lists the scraping functions used to loop over with soup.extract():
+    tag names, ids, link titles and link texts (strings match exactly, compiled patterns are searched)
+    and link classes. The rules are compiled once, so one cleaner can be reused for every page.
+
+    Arguments: list (tags), list (ids), list (titles), list (texts), list (classes)
+    '''
+
+    def __init__(self, tags=(), ids=(), titles=(), texts=(), classes=()):
+        self.tags = set(tags)
+        self.ids = set(ids)
+        self.titles = _split_rules(titles)
+        self.texts = _split_rules(texts)
+        self.classes = set(classes)
+
+    def matches(self, element):
+        if element.tag != "a":
+            return element.tag in self.tags or element.get("id") in self.ids
+        return self.link_matches(element.attrib, node_string(element))
+
+    def link_matches(self, attrib, string):
+        '''Takes the attributes of an <a> and its .string (see node_string()) and returns whether the link goes.'''
+
+        if "a" in self.tags or attrib.get("id") in self.ids:
+            return True
+        if _matches(attrib.get("title"), *self.titles):
+            return True
+        if self.classes and self.classes.intersection((attrib.get("class") or "").split()):
+            return True
+        return _matches(string, *self.texts)
+
+    def clean(self, root):
+        '''Takes an lxml.html tree and removes every matching node (and what's inside it) in place. Text
+        following a removed node is kept, as with soup.extract().
+        '''
+
+        to_remove = []
+        stack = [root]
+        while stack:
+            element = stack.pop()
+            if not isinstance(element.tag, str):
+                continue
+            if element is not root and element.tag == "a" and len(element):
+                # The soup loops removed tags and ids everywhere before looking at links, so a link's rules
+                # see it with its insides already cleaned ("<a><script/>edit</a>" has the string "edit")
+                self.clean(element)
+            if element is not root and self.matches(element):
+                # Everything inside goes with it, no need to look further down
+                to_remove.append(element)
+                continue
+            stack.extend(reversed(element))
+        for element in to_remove:
+            element.drop_tree()
+        return root
+
+    def parse(self, html):
+        '''Takes a page's HTML and returns its cleaned lxml.html tree.'''
+
+        return self.clean(lxml.html.document_fromstring(html))
+
+
+def find_by_id(root, element_id):
+    found = root.xpath("(//*[@id=$element_id])[1]", element_id=element_id)
+    return found[0] if found else None
+
+
+def element_text(element):
+    '''Returns the text inside an element like BeautifulSoup's .text, as a plain string (lxml's own text
+    results keep the whole tree alive). Like .text on a failed soup.find(), None raises AttributeError.
+    '''
+
+    if element is None:
+        raise AttributeError("'NoneType' object has no attribute 'text'")
+    return etree.tostring(element, method="text", encoding="unicode", with_tail=False)
+
+
+def wikilink_elements(root, body_id="bodyContent", href_pattern=WIKI_HREF):
+    '''Yields the <a> elements whose href matches href_pattern, inside the div with id body_id (or anywhere
+    when body_id is None), paired with their text. Empty and single space texts are skipped.
+    '''
+
+    if body_id is not None:
+        body = root.xpath("(//div[@id=$body_id])[1]", body_id=body_id)
+        if not body:
+            raise AttributeError(f'No div with id {body_id}')
+        root = body[0]
+    for a in root.iter("a"):
+        href = a.get("href")
+        if href is None or not href_pattern.search(href):
+            continue
+        text = element_text(a)
+        if text != "" and text != " ":
+            yield a, text
+
+
+RAW_HTML_CLEANER = HtmlCleaner(
+    tags=['table', 'script', 'meta', 'style'],
+    ids=['mw-hidden-catlinks'],
+    titles=['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), "Help:Category", re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)")],
+    texts=['edit', re.compile("(Jump to)")],
+    classes=['reference'],
+)
+
+CUISINE_LINKS_CLEANER = HtmlCleaner(
+    tags=['table', 'script', 'meta', 'style'],
+    ids=['mw-hidden-catlinks'],
+    titles=['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), "Help:Category", re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)")],
+    texts=['edit', re.compile("(Jump to)"), 'cuisine'],
+    classes=['reference'],
+)
+
+WIKILINKS_CLEANER = HtmlCleaner(
+    tags=['table', 'script', 'meta', 'style'],
+    ids=['mw-hidden-catlinks'],
+    titles=['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), re.compile("Help:"), re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)"), "Category:Harv and Sfn template errors", "Wayback Machine", "The World Factbook", "S2CID (identifier)", re.compile(r"(\(identifier\))"), "Capital city", "Curlie"],
+    texts=['edit', re.compile("(Jump to)"), 'cuisine', re.compile("(Help:)")],
+    classes=['reference'],
+)
+
+
+_END = None
+
+
+class _Comment(str):
+    pass
+
+
+def _build_link(attrib, events):
+    '''Builds the lxml element for an <a> from the events recorded inside it.'''
+
+    # Made by the HTML parser so they're lxml.html elements, which the cleaner's drop_tree() needs
+    builder = etree.TreeBuilder(parser=lxml.html.html_parser)
+    builder.start("a", attrib)
+    stack = ["a"]
+    for event in events:
+        if event is _END:
+            builder.end(stack.pop())
+        elif type(event) is tuple:
+            builder.start(*event)
+            stack.append(event[0])
+        elif type(event) is _Comment:
+            builder.comment(event)
+        else:
+            builder.data(event)
+    builder.end("a")
+    return builder.close()
+
+
+class LinkStream:
+    '''Collects wikilinks while lxml parses a page, without building the page's tree. Used as the target of an
+    lxml HTMLParser, it keeps track of where it is (inside the body div, inside a subtree the cleaner would
+    remove) from the start/end events and only builds a small tree for each candidate <a>, so the cleaner's
+    link rules (title, class, text) can be checked exactly as HtmlCleaner.clean() would.
+
+    Gives the same links as cleaner.parse() followed by wikilink_elements(), and can also pick up the text of
+    the element with id heading_id (e.g. "firstHeading") as it goes past.
+
+    Arguments: HtmlCleaner (optional), string (optional), compiled pattern (optional), string (optional)
+    '''
+
+    def __init__(self, cleaner=None, body_id="bodyContent", href_pattern=WIKI_HREF, heading_id=None):
+        self.cleaner = cleaner
+        self.body_id = body_id
+        self.href_pattern = href_pattern
+        self.heading_id = heading_id
+        self._reset()
+
+    def _reset(self):
+        self.heading = None
+        self.links = []
+        # 0: body not reached yet, 1: inside it, 2: past it
+        self._body_state = 0 if self.body_id is not None else 1
+        self._body_depth = 0
+        self._excluded_depth = 0
+        self._link = None
+        self._link_attrib = None
+        self._link_depth = 0
+        self._heading_parts = None
+        self._heading_depth = 0
+
+    def start(self, tag, attrib):
+        if self._heading_parts is not None:
+            self._heading_depth += 1
+        elif self.heading_id is not None and self.heading is None and attrib.get("id") == self.heading_id:
+            self._heading_parts = []
+            self._heading_depth = 1
+
+        if self._link is not None:
+            self._link_depth += 1
+            self._link.append((tag, attrib))
+            return
+        if self._excluded_depth:
+            self._excluded_depth += 1
+            return
+        if self.cleaner is not None and tag != "a" and (tag in self.cleaner.tags or attrib.get("id") in self.cleaner.ids):
+            self._excluded_depth = 1
+            return
+
+        if self._body_state == 1:
+            self._body_depth += 1
+        elif self._body_state == 0 and tag == "div" and attrib.get("id") == self.body_id:
+            self._body_state = 1
+            self._body_depth = 1
+
+        if tag == "a" and self._body_state == 1:
+            href = attrib.get("href")
+            if href is not None and self.href_pattern.search(href):
+                self._link_attrib = attrib
+                self._link = []
+                self._link_depth = 1
+
+    def end(self, tag):
+        if self._heading_parts is not None:
+            self._heading_depth -= 1
+            if not self._heading_depth:
+                self.heading = "".join(self._heading_parts)
+                self._heading_parts = None
+
+        if self._link is not None:
+            self._link_depth -= 1
+            if self._link_depth:
+                self._link.append(_END)
+                return
+            self._add_link(self._link_attrib, self._link)
+            self._link = None
+        elif self._excluded_depth:
+            self._excluded_depth -= 1
+            return
+
+        if self._body_state == 1 and self.body_id is not None:
+            self._body_depth -= 1
+            if not self._body_depth:
+                self._body_state = 2
+
+    def data(self, text):
+        if self._heading_parts is not None:
+            self._heading_parts.append(text)
+        if self._link is not None:
+            self._link.append(text)
+
+    def comment(self, text):
+        if self._link is not None:
+            self._link.append(_Comment(text))
+
+    def close(self):
+        return None
+
+    def _add_link(self, attrib, events):
+        if all(type(event) is str for event in events):
+            # Plain text links (nearly all of them) don't need a tree: the text is the .string
+            text = "".join(events)
+            if self.cleaner is not None and self.cleaner.link_matches(attrib, text or None):
+                return
+        else:
+            element = _build_link(attrib, events)
+            if self.cleaner is not None:
+                # Cleaned before its own rules are checked, as in HtmlCleaner.clean()
+                self.cleaner.clean(element)
+                if self.cleaner.matches(element):
+                    return
+            text = element_text(element)
+        if text != "" and text != " ":
+            self.links.append((attrib.get("href"), text))
+
+    def iter(self, html, chunk_size=1 << 16):
+        '''Takes a page's HTML and yields (href, text) tuples as they're parsed, feeding lxml chunk_size
+        characters at a time. Like wikilink_elements(), raises AttributeError at the end if there was no
+        body div. self.heading holds the heading text once the heading has been parsed.
+        '''
+
+        self._reset()
+        parser = etree.HTMLParser(target=self)
+        for position in range(0, len(html), chunk_size):
+            parser.feed(html[position:position + chunk_size])
+            yield from self._drain()
+        parser.close()
+        yield from self._drain()
+        if self._body_state == 0:
+            raise AttributeError(f'No div with id {self.body_id}')
+
+    def _drain(self):
+        links, self.links = self.links, []
+        return links
+
+
+def stream_wikilinks(html, cleaner=None, body_id="bodyContent", href_pattern=WIKI_HREF):
+    '''Takes a page's HTML and returns a list of (href, text) tuples for its wikilinks, cleaned with cleaner,
+    without building a tree for the whole page (see LinkStream).
+
+    Arguments: string (HTML), HtmlCleaner (optional), string (optional), compiled pattern (optional)
+    Returns: list of tuples
+    '''
+
+    return list(LinkStream(cleaner, body_id, href_pattern).iter(html))
@@ -0,0 +1,90 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+METRICS = ("count", "shared", "jaccard", "idf")
+
+
+class LinkOverlap:
+    '''Link overlap between every pair of places, all at once. Each distinct link (any hashable: a string
+    or a (link, text) tuple) is interned to an integer id and the places become a sparse place x link
+    matrix of link counts, so every pairwise overlap comes out of one sparse product instead of a list
+    membership test per link per pair.
+
+    Metrics (all of overlaps(), pair() and best_matches() take one):
+        count    the links of the first place found among the second's, duplicates included, exactly
+                 what compare_places counts (so not symmetric if a place lists a link twice)
+        shared   the number of distinct links they share
+        jaccard  shared divided by the number of distinct links in either
+        idf      shared, with each link weighted by log(places / places linking to it), so a link
+                 only two places share counts for more than one they all share
+
+    Arguments: list of strings (place names), list of lists (each place's links)
+    '''
+
+    def __init__(self, names, link_lists):
+        self.names = list(names)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+        self.link_ids = {}
+
+        rows, columns = [], []
+        for row, links in enumerate(link_lists):
+            for link in links:
+                column = self.link_ids.get(link)
+                if column is None:
+                    column = self.link_ids[link] = len(self.link_ids)
+                rows.append(row)
+                columns.append(column)
+
+        # Duplicate (row, column) entries are summed, which gives the counts
+        self.counts = sp.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, columns)), shape=(len(self.names), len(self.link_ids)))
+        self.counts.sum_duplicates()
+        self.present = self.counts.copy()
+        self.present.data[:] = 1
+        self._overlaps = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def overlaps(self, metric="count"):
+        '''Returns the (places, places) array of overlaps, row place against column place.'''
+
+        if metric not in METRICS:
+            raise ValueError(f'metric must be one of {", ".join(METRICS)}, not {metric}')
+        if metric not in self._overlaps:
+            if metric == "count":
+                result = (self.counts @ self.present.T).toarray()
+            elif metric == "shared":
+                result = (self.present @ self.present.T).toarray()
+            elif metric == "jaccard":
+                shared = self.overlaps("shared")
+                sizes = np.diag(shared)
+                union = sizes[:, None] + sizes[None, :] - shared
+                result = np.divide(shared, union, out=np.zeros(shared.shape), where=union > 0)
+            else:
+                places_with = np.asarray(self.present.sum(axis=0)).ravel()
+                idf = np.log(len(self.names) / np.maximum(places_with, 1))
+                result = (self.present @ sp.diags(idf) @ self.present.T).toarray()
+            self._overlaps[metric] = result
+        return self._overlaps[metric]
+
+    def pair(self, place, other_place, metric="count"):
+        score = self.overlaps(metric)[self.rows[place], self.rows[other_place]]
+        return int(score) if metric in ("count", "shared") else float(score)
+
+    def best_matches(self, metric="count"):
+        '''Returns a dictionary of each place's closest other place and their overlap, {place: (other place,
+        score)}. Same ties and blanks as city_compare: the first place in order with the highest score
+        wins, and a place that shares nothing with any other gets ('', 0).
+        '''
+
+        scores = self.overlaps(metric).astype(float)
+        np.fill_diagonal(scores, -np.inf)
+        best = {}
+        for row, name in enumerate(self.names):
+            column = int(np.argmax(scores[row])) if len(self.names) > 1 else 0
+            if len(self.names) > 1 and scores[row, column] > 0:
+                best[name] = (self.names[column], self.pair(name, self.names[column], metric))
+            else:
+                best[name] = ('', 0)
+        return best
@@ -0,0 +1,162 @@
+import hashlib
+import pickle
+
+import numpy as np
+
+
+# Universal hashing (a * x + b) % MERSENNE_PRIME, on 32 bit link hashes so a * x fits in 64 bits
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def link_hash(link):
+    '''Returns a stable 32 bit hash of a link (a string or a (link, text) tuple). Python's hash() changes
+    from one process to the next for strings, so it can't be used for sketches that get saved.
+    '''
+
+    return int.from_bytes(hashlib.blake2b(repr(link).encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHasher:
+    '''Makes MinHash signatures of link sets: for each of num_perm random hash functions, the smallest hash
+    of any link in the set. The share of positions where two signatures agree estimates the Jaccard
+    similarity of the two sets, with a standard error of about 1 / sqrt(num_perm). Hashers with the same
+    num_perm and seed give comparable signatures.
+
+    Arguments: int (optional), int (optional)
+    '''
+
+    def __init__(self, num_perm=128, seed=1):
+        self.num_perm = num_perm
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, links):
+        '''Takes a list of links and returns its signature, a uint32 array of num_perm hashes.'''
+
+        hashes = np.fromiter((link_hash(link) for link in set(links)), dtype=np.uint64)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        permuted = ((hashes[:, None] * self.a[None, :]) % MERSENNE_PRIME + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def estimate_jaccard(signature, other_signature):
+    return float(np.mean(signature == other_signature))
+
+
+def _collision_probability(similarity, bands, rows):
+    return 1 - (1 - similarity ** rows) ** bands
+
+
+def optimal_bands(threshold, num_perm, false_positive_weight=0.5, false_negative_weight=0.5):
+    '''Returns the (bands, rows) split of num_perm signature positions whose weighted chance of false
+    positives (pairs below threshold sharing a band) and false negatives (pairs above it sharing none)
+    is lowest. A pair with Jaccard s shares at least one band with probability 1 - (1 - s^rows)^bands.
+    '''
+
+    below, above = np.linspace(0, threshold, 201), np.linspace(threshold, 1, 201)
+    best, best_error = (1, num_perm), np.inf
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            # Areas under the curves, as means over evenly spaced similarities times the interval width
+            false_positives = _collision_probability(below, bands, rows).mean() * threshold
+            false_negatives = (1 - _collision_probability(above, bands, rows)).mean() * (1 - threshold)
+            error = false_positive_weight * false_positives + false_negative_weight * false_negatives
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class LinkSketches:
+    '''MinHash signatures of pages' link sets with an LSH banding index over them, for finding the pages
+    whose links have an estimated Jaccard similarity above threshold without comparing against every page.
+
+    Each signature is cut into bands of rows positions and pages go into a bucket per band; pages that
+    share any bucket are candidates, and only candidates get their Jaccard estimated. The split is picked
+    by optimal_bands for the threshold, so a query touches one bucket per band, not every page.
+
+    Arguments: float (optional), int (optional), int (optional)
+    '''
+
+    def __init__(self, threshold=0.5, num_perm=128, seed=1):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        self.signatures = {}
+        self.buckets = [{} for _ in range(self.bands)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __contains__(self, key):
+        return key in self.signatures
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, key, links):
+        '''Takes a page's key (its title, say) and its links, sketches them and indexes the sketch.
+        Returns the signature.
+        '''
+
+        return self.add_signature(key, self.hasher.signature(links))
+
+    def add_signature(self, key, signature):
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, set()).add(key)
+        return signature
+
+    def remove(self, key):
+        signature = self.signatures.pop(key)
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            buckets[band_key].discard(key)
+            if not buckets[band_key]:
+                del buckets[band_key]
+
+    def candidates(self, signature):
+        '''Returns the set of keys sharing at least one band bucket with signature.'''
+
+        found = set()
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            found.update(buckets.get(band_key, ()))
+        return found
+
+    def similar(self, page, threshold=None):
+        '''Takes a key already sketched, or the links themselves (a list, tuple, set or any other iterable),
+        and returns a list of (key, estimated Jaccard) tuples for the pages estimated above threshold (the
+        index's by default), highest first. A key's own page is left out.
+
+        Arguments: string or iterable, float (optional)
+        Returns: list of tuples
+        '''
+
+        threshold = self.threshold if threshold is None else threshold
+        # For links passed as a set, which can't be looked up as a key (unhashable), or a generator
+        if isinstance(page, str):
+            own_key = page if page in self.signatures else None
+        else:
+            own_key, page = None, list(page)
+        signature = self.signatures[own_key] if own_key is not None else self.hasher.signature(page)
+
+        matches = []
+        for key in self.candidates(signature):
+            if key != own_key:
+                estimate = estimate_jaccard(signature, self.signatures[key])
+                if estimate >= threshold:
+                    matches.append((key, estimate))
+        return sorted(matches, key=lambda match: (-match[1], str(match[0])))
+
+    def save(self, path):
+        with open(path, "wb") as to_write:
+            pickle.dump(self, to_write)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as to_read:
+            return pickle.load(to_read)
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import quote, unquote, urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+class OfflineCacheMiss(LookupError):
+    '''Raised in offline mode for a URL that has never been cached.'''
+
+
+def normalize_url(url):
+    '''Takes a URL and returns a canonical form of it for cache keys: lowercase scheme and host, no default
+    port, no fragment, sorted query and one consistent percent-encoding of the path (so /wiki/%27Ota_%27ika
+    and /wiki/'Ota_'ika are the same page).
+
+    Arguments: string (URL)
+    Returns: string
+    '''
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in [("http", 80), ("https", 443)]:
+        host = f'{host}:{parts.port}'
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=-._~")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path or "/", query, ""))
+
+
+class CachedResponse:
+    '''Stands in for a requests Response when a page is served from the cache.'''
+
+    from_cache = True
+
+    def __init__(self, entry, text):
+        self.status_code = entry["status"]
+        self.url = entry["final_url"]
+        self.headers = {key: value for key, value in [("ETag", entry["etag"]), ("Last-Modified", entry["last_modified"])] if value}
+        self.text = text
+        self.content = text.encode(entry["encoding"] or "utf-8")
+        self.entry = entry
+
+
+class PageCache:
+    '''On-disk cache of fetched pages. Each URL gets a small JSON record (keyed by a hash of its normalized
+    form) with the ETag, Last-Modified, fetch time and the hash of its body; bodies are stored gzipped once
+    per distinct content, so identical pages reached through different URLs share one file.
+
+        folder/urls/ab/<sha256 of normalized URL>.json
+        folder/objects/cd/<sha256 of body>.html.gz
+
+    Entries younger than ttl seconds (None for never stale) are served without touching the network,
+    older ones are revalidated with If-None-Match / If-Modified-Since. With offline=True only the cache
+    is used and a missing page raises OfflineCacheMiss.
+
+    Arguments: string (folder), float (optional), bool (optional)
+    '''
+
+    def __init__(self, folder="wiki_cache", ttl=7 * 24 * 3600, offline=False):
+        self.folder = folder
+        self.ttl = ttl
+        self.offline = offline
+
+    def _path(self, kind, digest, suffix):
+        return os.path.join(self.folder, kind, digest[:2], digest + suffix)
+
+    def _url_path(self, url):
+        return self._path("urls", hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest(), ".json")
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, "wb") as to_write:
+            to_write.write(data)
+        os.replace(temp_path, path)
+
+    def get(self, url):
+        '''Returns the cache record for url, or None if it has never been cached.'''
+
+        try:
+            with open(self._url_path(url), "r", encoding="utf-8") as to_read:
+                return json.load(to_read)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        return self.ttl is None or time.time() - entry["fetched_at"] < self.ttl
+
+    def read(self, entry):
+        '''Returns a CachedResponse with the body of a cache record.'''
+
+        with gzip.open(self._path("objects", entry["content"], ".html.gz"), "rb") as to_read:
+            return CachedResponse(entry, to_read.read().decode(entry["encoding"] or "utf-8", errors="replace"))
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url, response):
+        '''Stores a successful response for url and returns its cache record.'''
+
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._path("objects", digest, ".html.gz")
+        if not os.path.exists(object_path):
+            self._write(object_path, gzip.compress(body))
+
+        entry = {
+            "url": url,
+            "normalized": normalize_url(url),
+            "final_url": response.url or url,
+            "status": response.status_code,
+            "encoding": response.encoding,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "content": digest,
+        }
+        self._write(self._url_path(url), json.dumps(entry).encode("utf-8"))
+        return entry
+
+    def touch(self, url, entry, response=None):
+        '''Marks a record as freshly validated after a 304, picking up any new validators.'''
+
+        entry = dict(entry, fetched_at=time.time())
+        if response is not None:
+            entry["etag"] = response.headers.get("ETag") or entry["etag"]
+            entry["last_modified"] = response.headers.get("Last-Modified") or entry["last_modified"]
+        self._write(self._url_path(url), json.dumps(entry).encode("utf-8"))
+        return entry
@@ -0,0 +1,86 @@
+import re
+
+import unidecode
+
+
+# Every pattern the text cleaning uses, compiled once. Each gives exactly the output of the re.sub() call
+# it replaces; where steps are fused (a translate table instead of several re.sub passes) it is because
+# they can't interact, so the result is the same byte for byte.
+
+# Same as "(  )( *)": a run of two or more spaces
+SPACE_RUNS = re.compile(" {2,}")
+FOOTNOTES = re.compile(r"\[.*?\]+")
+POSSESSIVE = re.compile("('s$)")
+CATEGORY = re.compile("(Category:)")
+LIST_OF = re.compile("(List_of_)")
+ORIGIN_LABEL = re.compile("(Place of origin: )")
+ORIGIN_NOTES = re.compile(r"( ?)(\((.*)\)|\[(.*)\])")
+DISPUTED = re.compile("(Disputed:( ?))")
+INGREDIENTS_LABEL = re.compile("((.*)ingredients:( *)|(.*)Ingredients:( *))")
+TYPE_LABEL = re.compile("((.*)type:( *)|(.*)Type:( *))")
+
+# condense_list's five passes in one: spaces go, ; , . and = become spaces (no character is both removed
+# and produced, so the order they ran in doesn't matter)
+CONDENSE_TABLE = str.maketrans({" ": None, ";": " ", ",": " ", ".": " ", "=": " "})
+
+# The tidying of the lemmatized and lower case text. These do interact (each one can make spaces the
+# next one matches), so they stay separate passes, in this order
+TIDY_PATTERNS = [(SPACE_RUNS, " "), (re.compile("( / | ― )"), " "), (re.compile(r"( (\d+) )"), " "), (re.compile("( ([A-z]) )"), " ")]
+
+
+def ascii_fold(text):
+    '''unidecode.unidecode(), skipped for text that is already ASCII (which it would return unchanged).'''
+
+    return text if text.isascii() else unidecode.unidecode(text)
+
+
+def collapse_spaces(text):
+    return SPACE_RUNS.sub(" ", text)
+
+
+def tidy(text):
+    '''Takes lemmatized or lower case text and collapses double spaces and drops slashes, numbers, single
+    letters and periods, the same way process_full_df always has.
+    '''
+
+    for pattern, replacement in TIDY_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text.replace(".", " ")
+
+
+def condense_term(term):
+    '''Takes one term and returns it the way condense_list joins it: spaces removed, ; , . = turned into
+    spaces, runs of spaces collapsed, stripped and unidecoded.
+    '''
+
+    return ascii_fold(SPACE_RUNS.sub(" ", term.translate(CONDENSE_TABLE)).strip())
+
+
+def clean_place(place):
+    '''Takes a joined place name and turns periods into spaces, collapses runs of spaces and unidecodes it.'''
+
+    return unidecode.unidecode(SPACE_RUNS.sub(" ", place.replace(".", " ")))
+
+
+# The same, for a whole column at once
+def tidy_series(texts):
+    '''tidy() over a pandas Series of strings, with .str methods.'''
+
+    for pattern, replacement in TIDY_PATTERNS:
+        texts = texts.str.replace(pattern, replacement, regex=True)
+    return texts.str.replace(".", " ", regex=False)
+
+
+def condense_series(terms):
+    '''condense_term() over a pandas Series of strings, with .str methods.'''
+
+    condensed = terms.str.translate(CONDENSE_TABLE).str.replace(SPACE_RUNS, " ", regex=True).str.strip()
+    return condensed.map(ascii_fold)
+
+
+def clean_origin_series(origins):
+    '''Takes a Series of lower case "Place of origin" values and makes the ORIGIN_NOTES then DISPUTED
+    substitutions process_full_df does on each, with .str methods. NaN (no origin) stays NaN.
+    '''
+
+    return origins.str.replace(ORIGIN_NOTES, "", regex=True).str.replace(DISPUTED, "", regex=True)
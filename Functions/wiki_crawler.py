@@ -0,0 +1,121 @@
+import os
+import pickle
+from collections import deque
+from urllib.parse import unquote, urlsplit
+
+from tqdm import tqdm
+
+from wiki_fetcher import WIKI_BASE, get_default_fetcher
+
+
+# Namespaced pages (files, categories, help pages...) are collected as links but never crawled
+SKIPPED_NAMESPACES = ("File:", "Category:", "Help:", "Special:", "Template:", "Template_talk:", "Wikipedia:", "Portal:", "Talk:")
+
+
+def canonical_title(url):
+    '''Takes a Wikipedia URL or /wiki/ href and returns the page title the way Wikipedia normalizes it:
+    decoded, underscores as spaces, no fragment and a capitalized first letter.
+
+    Arguments: string
+    Returns: string
+    '''
+
+    path = urlsplit(url).path
+    title = unquote(path.split("/wiki/", 1)[-1]).replace("_", " ").strip()
+    return title[:1].upper() + title[1:]
+
+
+def wiki_url(href):
+    return f'{WIKI_BASE}/wiki/{href.split("#")[0]}'
+
+
+class Crawler:
+    '''Breadth-first crawler over Wikipedia links.
+
+    Pages are fetched a batch at a time in parallel through the shared fetcher and parsed with
+    parse_page(html, url), which returns (title, links) where links is a list of (href, text) tuples.
+    Pages are deduplicated by canonical title both before fetching (by URL) and after (by the
+    page's own heading), so redirects to a page already crawled are dropped. The crawl stops at
+    max_depth link hops from the start page or after max_pages pages. With a checkpoint path, the
+    frontier and results are saved every checkpoint_every pages and a rerun resumes from there.
+
+    Arguments: function, int (optional), int (optional), string (optional), int (optional), Fetcher (optional)
+    '''
+
+    def __init__(self, parse_page, max_depth=1, max_pages=None, checkpoint=None, checkpoint_every=25, fetcher=None):
+        self.parse_page = parse_page
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.fetcher = fetcher or get_default_fetcher()
+
+    def _load_checkpoint(self, start_url):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint, "rb") as to_read:
+                state = pickle.load(to_read)
+            if state["start_url"] == start_url:
+                return state
+        return {"start_url": start_url, "frontier": deque([(start_url, 0)]), "seen": {canonical_title(start_url)}, "results": {}}
+
+    def _save_checkpoint(self, state):
+        if self.checkpoint:
+            temp_path = f'{self.checkpoint}.tmp'
+            with open(temp_path, "wb") as to_write:
+                pickle.dump(state, to_write)
+            os.replace(temp_path, self.checkpoint)
+
+    def _follow(self, links):
+        for href, _ in links:
+            if not href or href.startswith(SKIPPED_NAMESPACES):
+                continue
+            yield wiki_url(href)
+
+    def crawl(self, start_url):
+        '''Takes a start URL and returns a dictionary of {title: (html, links)} for every page crawled, in
+        crawl order, the start page included.
+        '''
+
+        state = self._load_checkpoint(start_url)
+        frontier, seen, results = state["frontier"], state["seen"], state["results"]
+        batch_size = self.fetcher.max_workers * 4
+        since_checkpoint = 0
+        progress = tqdm(initial=len(results), total=self.max_pages)
+
+        while frontier and (self.max_pages is None or len(results) < self.max_pages):
+            batch = [frontier.popleft() for _ in range(min(batch_size, len(frontier)))]
+            responses = self.fetcher.iter_many([url for url, _ in batch])
+            for i, ((url, depth), response) in enumerate(zip(batch, responses)):
+                if self.max_pages is not None and len(results) >= self.max_pages:
+                    # Unvisited pages go back on the frontier so a resumed crawl with a higher limit gets them
+                    frontier.extendleft(reversed(batch[i:]))
+                    break
+                if response.status_code != 200:
+                    continue
+                try:
+                    title, links = self.parse_page(response.text, url)
+                except AttributeError:
+                    # Not an article (no heading or body), nothing to keep
+                    continue
+                if title in results:
+                    continue
+                seen.add(title)
+                results[title] = (response.text, links)
+                progress.update(1)
+                since_checkpoint += 1
+
+                if depth < self.max_depth:
+                    for child in self._follow(links[1:]):
+                        child_title = canonical_title(child)
+                        if child_title not in seen:
+                            seen.add(child_title)
+                            frontier.append((child, depth + 1))
+
+            # Only saved between batches, when frontier and results agree with each other
+            if since_checkpoint >= self.checkpoint_every:
+                self._save_checkpoint(state)
+                since_checkpoint = 0
+
+        progress.close()
+        self._save_checkpoint(state)
+        return results
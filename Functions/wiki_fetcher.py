@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from page_cache import PageCache, OfflineCacheMiss
+
+
+WIKI_BASE = "https://en.wikipedia.org"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    '''Spaces out requests to each host so no host sees more than requests_per_second.
+    Thread safe: each caller reserves the next free slot for its host under a lock and sleeps outside it.
+    '''
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def retry_after_seconds(response):
+    '''Returns the wait a 429/503 response asks for in its Retry-After header, or None.'''
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class Fetcher:
+    '''Shared HTTP layer for the Wikipedia scraping functions: one pooled keep-alive session, a thread pool
+    for fanning out batches of URLs, per-host rate limiting, per-request timeouts and retries with
+    exponential backoff on 429/5xx responses and connection errors.
+
+    base_url redirects every https://en.wikipedia.org URL to another server, e.g. a local stand-in
+    serving saved HTML (python -m http.server in a folder laid out like /wiki/Page_name).
+
+    With a PageCache, fresh pages are served from disk, stale ones are revalidated with a conditional
+    request and every successful fetch is stored (see page_cache.py).
+
+    Arguments: int (optional), float (optional), float or tuple (optional), int (optional), float (optional), string (optional), PageCache (optional)
+    '''
+
+    def __init__(self, max_workers=8, requests_per_second=10.0, timeout=(5, 30), retries=4, backoff=0.5, base_url=None,
+                 user_agent="wiki2vec scraper (https://github.com/ian-livingston/project-5)", cache=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wiki-fetch")
+
+    def resolve(self, url):
+        if self.base_url and url.startswith(WIKI_BASE):
+            return self.base_url + url[len(WIKI_BASE):]
+        return url
+
+    def get(self, url, headers=None):
+        '''Takes a URL and returns the requests Response (or a CachedResponse), going through the cache if
+        there is one.
+        '''
+
+        if self.cache is None:
+            return self.fetch(url, headers)
+
+        entry = self.cache.get(url)
+        if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+            return self.cache.read(entry)
+        if self.cache.offline:
+            raise OfflineCacheMiss(f'{url} is not in the cache and the cache is offline')
+
+        conditional = self.cache.conditional_headers(entry) if entry else {}
+        response = self.fetch(url, dict(headers or {}, **conditional))
+        if response.status_code == 304 and entry is not None:
+            return self.cache.read(self.cache.touch(url, entry, response))
+        if response.status_code == 200:
+            self.cache.put(url, response)
+        return response
+
+    def fetch(self, url, headers=None):
+        '''Takes a URL and returns the requests Response, retrying transient failures. If every attempt comes
+        back 429/5xx the last response is returned; if every attempt fails to connect the last error is raised.
+        '''
+
+        url = self.resolve(url)
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait(host)
+            wait = self.backoff * 2 ** attempt
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                wait = max(wait, retry_after_seconds(response) or 0.0)
+            time.sleep(wait)
+
+    def iter_many(self, urls, headers=None):
+        '''Takes an iterable of URLs and yields their responses in the same order, fetching up to max_workers
+        ahead. Stopping early (e.g. after enough results) leaves at most max_workers requests wasted.
+        '''
+
+        pending = deque()
+        for url in urls:
+            pending.append(self.executor.submit(self.get, url, headers))
+            if len(pending) >= self.max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def get_many(self, urls, headers=None):
+        '''Takes a list of URLs and returns a list of responses, fetched in parallel.'''
+
+        return list(self.iter_many(urls, headers))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_default_fetcher():
+    '''Returns the Fetcher the scraping functions use, creating it on first use with default settings and
+    a PageCache in ./wiki_cache.
+    '''
+
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher(cache=PageCache())
+        return _default_fetcher
+
+
+def set_default_fetcher(fetcher):
+    '''Replaces the Fetcher the scraping functions use, e.g. with different concurrency or a local base_url.'''
+
+    global _default_fetcher
+    with _default_lock:
+        _default_fetcher = fetcher
@@ -1,12 +1,24 @@
-    import requests
-    import re
-    from bs4 import BeautifulSoup
-    from tqdm import tqdm
-    import pickle
-    import unidecode
-    import pandas as pd
-    import matplotlib.pyplot as plt
-    from random import randint
+import re
+import os
+import hashlib
+from bs4 import BeautifulSoup
+from tqdm import tqdm
+import pickle
+import unidecode
+import lxml.html
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from random import randint
+
+from wiki_fetcher import get_default_fetcher
+from wiki_crawler import Crawler, canonical_title
+from link_overlap import LinkOverlap
+from glossary_matcher import GlossaryMatcher
+from text_normalize import (FOOTNOTES, POSSESSIVE, CATEGORY, LIST_OF, ORIGIN_LABEL, ORIGIN_NOTES, DISPUTED, INGREDIENTS_LABEL,
+                            TYPE_LABEL, ascii_fold, collapse_spaces, condense_term, clean_place, tidy_series, condense_series,
+                            clean_origin_series)
+from html_cleaner import RAW_HTML_CLEANER, CUISINE_LINKS_CLEANER, WIKILINKS_CLEANER, LinkStream, find_by_id, element_text, wikilink_elements, stream_wikilinks
 
 
 def get_links_from_raw_html(raw_html, url_end, area, dict_with_places=None):
@@ -18,26 +30,8 @@ def get_links_from_raw_html(raw_html, url_end, area, dict_with_places=None):
     Retuns: list or dictionary
     '''
 
-    soup = BeautifulSoup(raw_html)
-
-    tags_to_extract = ['table', 'script', 'meta', 'style']
-    titles_to_extract = ['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), "Help:Category", re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)")]
-    texts_to_extract = ['edit', re.compile("(Jump to)")]
-    classes_to_extract = ['reference']
-    ids_to_extract = ['mw-hidden-catlinks']
-
-    for t in tags_to_extract:
-        [s.extract() for s in soup(t)]
-    for t in ids_to_extract:
-        [s.extract() for s in soup(id=t)]
-    for t in titles_to_extract:
-        [s.extract() for s in soup("a", title=t)]
-    for t in texts_to_extract:
-        [s.extract() for s in soup("a", text=t)]
-    for t in classes_to_extract:
-        [s.extract() for s in soup("a", class_=t)]
-
-    links = [(url_end, area)] + list(set([(wikilink["href"].lstrip('/wiki/'), wikilink.text) for wikilink in soup.find_all("a", href=re.compile("(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+    # Links are picked up while the page is parsed, skipping tables, references, hidden categories and housekeeping links (see html_cleaner.py)
+    links = [(url_end, area)] + list(set([(href.lstrip('/wiki/'), text) for href, text in stream_wikilinks(raw_html, RAW_HTML_CLEANER, body_id=None)]))
 
     if dict_with_places:
         dictionary = dict_with_places[0]
@@ -48,105 +42,100 @@ def get_links_from_raw_html(raw_html, url_end, area, dict_with_places=None):
         return links
 
 
-def get_all_soups(url):
-    '''Takes a single URL and returns a dictionary of Wikipedia backlinks.
+def get_all_soups(url, max_depth=1, max_pages=None, checkpoint=None):
+    '''Takes a single URL, crawls the Wikipedia pages it links to (breadth first, up to max_depth links
+    away and max_pages pages) and returns a dictionary of Wikipedia backlinks for each of them. With a
+    checkpoint path, an interrupted crawl picks up where it left off when rerun.
 
-    Arguments: string (URL)
-    Returns:
+    Arguments: string (URL), int (optional), int (optional), string (optional)
+    Returns: dict of {title: (html, links)}
     '''
 
-    full_dict = {}
+    crawler = Crawler(parse_wikilinks, max_depth=max_depth, max_pages=max_pages, checkpoint=checkpoint)
+    full_dict = crawler.crawl(url)
 
-    response = requests.get(url)
-    print(response.status_code)
-    page = response.text
-    soup = BeautifulSoup(page)
+    # The start page itself isn't one of its backlinks. It's found by its URL (each page's first link is
+    # itself), since its heading can differ from the URL's title and it may not have been fetched at all
+    start_title = canonical_title(url)
+    for title, (_, links) in list(full_dict.items()):
+        if title == start_title or (links and canonical_title(links[0][0]) == start_title):
+            del full_dict[title]
 
-    page_wikilinks = list(set([f'https://en.wikipedia.org/wiki/{wikilink.text}' for wikilink in soup.find("div", id="bodyContent").find_all("a", href=re.compile("(\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+    return full_dict
 
-    for wikilink in tqdm(page_wikilinks):
-        response = requests.get(url)
-        page = response.text
-        soup = BeautifulSoup(page)
 
-        try:
-            title = soup.find(id="firstHeading").text
-        except AttributeError:
-            title = wikilink.split("/wiki/")[-1]
-            continue
-        
-        links = get_wikilinks([wikilink], no_dict=True)
-        full_dict[title] = (str(soup), links)
-    
-    return full_dict
+# For getting the title and backlinks out of one page's HTML
+def parse_wikilinks(page, url):
+    '''Takes the HTML of a Wikipedia page and its URL and returns the page title and a list of 
+    link (raw)-link (lean) tuples, starting with the page itself.
+
+    Arguments: string (HTML), string (URL)
+    Returns: string, list
+    '''
+
+    # Each page should include itself in its links, as others that link to it will share something with it
+    self_link = url.split("https://en.wikipedia.org/wiki/")[1]
+
+    # Links (and the title) are picked up while the page is parsed, skipping tables, references, hidden categories and housekeeping links (see html_cleaner.py)
+    stream = LinkStream(WIKILINKS_CLEANER, heading_id="firstHeading")
+    links = set([(href.lstrip('/wiki/'), unidecode.unidecode(text)) for href, text in stream.iter(page)])
+
+    title = stream.heading
+    if title is None:
+        raise AttributeError(f'No firstHeading in {url}')
+
+    page_wikilinks = [(self_link, title)] + list(links)
+
+    return title, page_wikilinks
 
 
 # For getting backlinks for a list of Wikipedia URLs
-def get_wikilinks(url_list, no_dict=False):
+def get_wikilinks(url_list, no_dict=False, sketches=None):
     '''Takes a list of URLs, scraped Wikipedia backlinks for each page and returns a 
-    a dictionary with link (raw)-link (lean) tuples for each URL.
+    a dictionary with link (raw)-link (lean) tuples for each URL. If sketches (a LinkSketches,
+    see minhash.py) is passed, each page's links are also sketched into it under the page title.
     
-    Arguments: list of strings (URLs) bool (optional)
+    Arguments: list of strings (URLs) bool (optional), LinkSketches (optional)
     Returns: dict
     '''
 
     dict_of_links = {}
 
-    for url in tqdm(url_list):
-        
-        if url != "?":
-            # First collect the HTML for the page
-            response = requests.get(url)
-            print(response.status_code)
-            page = response.text
-            soup = BeautifulSoup(page)
+    # Pages are fetched in parallel ahead of the parsing below
+    url_list = [url for url in url_list if url != "?"]
+    if no_dict:
+        url_list = url_list[:1]
+    responses = get_default_fetcher().iter_many(url_list)
 
-            # Each page should include itself in its links, as others that link to it will share something with it
-            self_link = url.split("https://en.wikipedia.org/wiki/")[1]
-
-            title = soup.find(id="firstHeading").text
-            tags_to_extract = ['table', 'script', 'meta', 'style']
-            titles_to_extract = ['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), re.compile("Help:"), re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)"), "Category:Harv and Sfn template errors", "Wayback Machine", "The World Factbook", "S2CID (identifier)", re.compile("(\(identifier\))"), "Capital city", "Curlie"]
-            texts_to_extract = ['edit', re.compile("(Jump to)"), 'cuisine', re.compile("(Help:)")]
-            classes_to_extract = ['reference']
-            ids_to_extract = ['mw-hidden-catlinks']
-
-            for t in tags_to_extract:
-                [s.extract() for s in soup(t)]
-            for t in ids_to_extract:
-                [s.extract() for s in soup(id=t)]
-            for t in titles_to_extract:
-                [s.extract() for s in soup("a", title=t)]
-            for t in texts_to_extract:
-                [s.extract() for s in soup("a", text=t)]
-            for t in classes_to_extract:
-                [s.extract() for s in soup("a", class_=t)]
-
-            main_body = soup.find('div', id='bodyContent')
-            page_wikilinks = [(self_link, title)] + list(set([(wikilink["href"].lstrip('/wiki/'), unidecode.unidecode(wikilink.text)) for wikilink in main_body.find_all("a", href=re.compile("(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+    for url, response in tqdm(zip(url_list, responses), total=len(url_list)):
         
-            dict_of_links[title] = page_wikilinks
+        print(response.status_code)
+        title, page_wikilinks = parse_wikilinks(response.text, url)
+    
+        dict_of_links[title] = page_wikilinks
+        if sketches is not None:
+            sketches.add(title, page_wikilinks)
 
-            if no_dict:
-                return page_wikilinks
+        if no_dict:
+            return page_wikilinks
 
     return dict_of_links
 
 
 # For getting all the text from a Wikipedia page
-def get_page_text(url, with_ner=False):
+def get_page_text(url, with_ner=False, soup=None):
     '''Takes a URL and returns all the page text and optionally named entities
-    in a df.
+    in a df. If soup is passed (the page already fetched and parsed), the page isn't fetched again.
     
-    Arguments: string (URL)
+    Arguments: string (URL), bool (optional), BeautifulSoup (optional)
     Returns: df
 
     '''
 
-    response = requests.get(url)
-    print(response.status_code)
-    page = response.text
-    soup = BeautifulSoup(page, 'lxml')
+    if soup is None:
+        response = get_default_fetcher().get(url)
+        print(response.status_code)
+        soup = BeautifulSoup(response.text, 'lxml')
     title = soup.find(id="firstHeading").text
 
     # Extract the plain text content from paragraphs
@@ -161,7 +150,7 @@ def get_page_text(url, with_ner=False):
     text = ' '.join(page_text)
 
     # Drop footnote superscripts in brackets
-    text = re.sub(r"\[.*?\]+", '', text)
+    text = FOOTNOTES.sub('', text)
 
     # Replace '\n' (a new line) with '' and end the string at $1000.
     text = text.replace('\n', '')
@@ -177,15 +166,74 @@ def get_page_text(url, with_ner=False):
         return title, text
 
 
-def add_to_foods_df(url, df=foods_df, pickle=False):
+# For the label: value rows of a page's infobox, the way the Infobox column holds them
+def parse_infobox(soup):
+    '''Takes a Wikipedia page parsed with BeautifulSoup and returns its infobox as a list of "label: value"
+    strings (e.g. "Place of origin: Italy"), or NaN if it has no infobox.
+
+    Arguments: BeautifulSoup
+    Returns: list of strings
+    '''
+
+    infobox = soup.find("table", class_="infobox")
+    if infobox is None:
+        return np.nan
 
-    title, text, entities, images = get_page_text(url, with_ner=True)
-    links = get_wikilinks([url], no_dict=True)
-    df = df.append({"Food": title, "Places": entities, "Text": text, "Wikilinks": links, "Image links": images, "URL": url}, ignore_index=True)
+    rows = []
+    for row in infobox.find_all("tr"):
+        label, data = row.find("th", recursive=False), row.find("td", recursive=False)
+        if label is not None and data is not None:
+            label, data = [collapse_spaces(FOOTNOTES.sub("", cell.text).replace("\n", " ")).strip() for cell in (label, data)]
+            rows.append(f'{label}: {data}')
+    return rows
+
+
+def save_df(df, path):
+    with open(path, "wb") as to_write:
+        pickle.dump(df, to_write)
+
+
+def load_df(path):
+    with open(path, "rb") as to_read:
+        return pickle.load(to_read)
+
+
+def add_to_foods_df(url, df=None, pickle=False, processed=None, model=None, category=None):
+    '''Takes a URL and a df (the one pickled to foods_df.pickle if not passed) and returns the df with the
+    page's dish appended, its raw wikilinks, infobox and category (what the dish is, e.g. "soups", as the
+    list it came from would say) included. If processed is passed as the path of the processed df pickle
+    (and the df has the columns process_full_df needs), the processed df is brought up to date and
+    returned instead, with only the new row going through spaCy. If model is also passed as a TfidfService
+    (Flask app/Tfidf.py), the dish is added to the app's model too, without a refit.
+
+    Arguments: string (URL), df (optional), bool (optional), string (optional), TfidfService (optional), string (optional)
+    Returns: df
+    '''
+
+    if df is None:
+        if not os.path.exists("foods_df.pickle"):
+            raise ValueError("add_to_foods_df needs the foods df: pass it as df, or pickle it to foods_df.pickle first")
+        df = load_df("foods_df.pickle")
+
+    # One fetch and one parse, for the text, links and infobox alike
+    response = get_default_fetcher().get(url)
+    print(response.status_code)
+    soup = BeautifulSoup(response.text, 'lxml')
+    title, text, entities, images = get_page_text(url, with_ner=True, soup=soup)
+    _, links = parse_wikilinks(response.text, url)
+    row = {"Food": title, "Places": entities, "Text": text, "Wikilinks": links, "Image links": images, "URL": url,
+           "Wikilinks raw": [raw for raw, _ in links], "Infobox": parse_infobox(soup), "Category": category}
+    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
 
     if pickle:
-        with open("foods_df.pickle", "wb") as to_write:
-            pickle.dump(foods_df, to_write)
+        save_df(df, "foods_df.pickle")
+
+    if processed:
+        df = update_processed_df(df, store=processed)
+        if model is not None:
+            row = df.iloc[-1]
+            app_row = {"Food": row["Food"], "Text": row["Text"], "Origin": row["Origin"], "WORKING URLs": row["Image links"], "URL": row["URL"]}
+            model.add_dish(app_row, condense_list(row["All together"].split(" ")))
 
     return df
 
@@ -193,17 +241,39 @@ def add_to_foods_df(url, df=foods_df, pickle=False):
 # For actual measurement calculations
 # For getting the most similar item based on cosine distance
 # Inspiration and some code from Will Koehrsen (https://github.com/WillKoehrsen)
-def find_similar(name, weights, index_name='country', n=10, least=False, return_dist=False, plot=False):
+def partial_argsort(values, k):
+    '''Takes an array and returns the indexes of its k smallest values followed by its k largest, each
+    ascending. For k small next to len(values) that is the two ends of np.argsort(values), found with
+    argpartition in O(len(values)) instead of sorting everything.
+
+    Arguments: array, int
+    Returns: array
+    '''
+
+    if 2 * k >= len(values):
+        return np.argsort(values)
+    ends = np.argpartition(values, [k - 1, len(values) - k])
+    lowest, highest = ends[:k], ends[-k:]
+    return np.concatenate([lowest[np.argsort(values[lowest])], highest[np.argsort(values[highest])]])
+
+
+def find_similar(name, weights, index_name='country', n=10, least=False, return_dist=False, plot=False, ann=None):
     '''Takes a country name as a string, an array of weights extracted from a neural network 
     and returns the n most similar items (or least) to name based on embeddings. Option to also 
-    plot the results.
+    plot the results. weights can also be an EmbeddingStore (Flask app/Embeddings.py), whose own
+    names are used instead of the index globals and whose scores are cosine similarities. ann is an
+    optional index from Ann.py (LshIndex or IvfIndex) built on weights, to find the most similar
+    without scoring every item; plot and least still score them all.
     
-    Arguments: string, array, int (optional), bool (optional), bool (optional), bool (optional)
+    Arguments: string, array or EmbeddingStore, int (optional), bool (optional), bool (optional), bool (optional), index (optional)
     Returns: (none), list (optional), string (optional)
     '''
     
     # Select index and reverse index
-    if index_name == 'country':
+    if hasattr(weights, "similarities"):
+        index = weights.index
+        rindex = weights.rindex
+    elif index_name == 'country':
         index = country_index
         rindex = index_country
     elif index_name == 'page':
@@ -212,21 +282,32 @@ def find_similar(name, weights, index_name='country', n=10, least=False, return_
     
     # Check to make sure `name` is in index
     try:
+        if ann is not None and not (plot or least):
+            rows, scores = ann.query_row(index[name], n)
         # Calculate dot product between book and all others
-        dists = np.dot(weights, weights[index[name]])
+        elif hasattr(weights, "similarities"):
+            dists = weights.similarities(index[name])
+        else:
+            dists = np.dot(weights, weights[index[name]])
     except KeyError:
         print(f'{name} not found')
         return
     
-    # Sort distance indexes from smallest to largest
-    sorted_dists = np.argsort(dists)
+    # Only the n candidates the index found have distances
+    if ann is not None and not (plot or least):
+        dists = np.full(len(weights), np.nan)
+        dists[rows] = scores
+        sorted_dists = rows[::-1]
+    # Distance indexes from smallest to largest, but only the n + 1 at each end (all anything below uses)
+    else:
+        sorted_dists = partial_argsort(dists, n + 1)
     
     # Plot results if specified
     if plot:
         
         # Find furthest and closest items
         furthest = sorted_dists[:(n // 2)]
-        closest = sorted_dists[-n-1: len(dists) - 1]
+        closest = sorted_dists[-n-1:-1]
         items = [rindex[c] for c in furthest]
         items.extend(rindex[c] for c in closest)
         
@@ -294,6 +375,9 @@ def get_cuisine_dict(list_of_templates):
     '''
  
     cuisine_dict = {}
+    # Template pages for every group are fetched in parallel up front
+    fetcher = get_default_fetcher()
+    template_pages = fetcher.iter_many([template[1] for group in list_of_templates for template in group])
     for group in list_of_templates:
         if group == africa_templates:
             continent = "Africa"
@@ -315,7 +399,7 @@ def get_cuisine_dict(list_of_templates):
             continent = "Caribbean"
         for template in group:
             country = " ".join(template[0].split(":")[1].split(" ")[:-1])
-            response = requests.get(f'{template[1]}')
+            response = next(template_pages)
             page = response.text
             soup = BeautifulSoup(page)
             if country == "Balearic Islands":
@@ -356,7 +440,7 @@ def get_cuisine_dict(list_of_templates):
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Kenya":
                 country_links = kenya_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Lesotho":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Cuisine_of_Lesotho'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -407,7 +491,7 @@ def get_cuisine_dict(list_of_templates):
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Zimbabwe":
                 country_links = zimbabwe_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Iraqi Kurdistan":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Kurdish_cuisine'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -422,7 +506,7 @@ def get_cuisine_dict(list_of_templates):
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Jersey":
                 country_links = jersey_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Liechtenstein":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Liechtenstein_cuisine'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -478,16 +562,16 @@ def get_cuisine_dict(list_of_templates):
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Saint Kitts and Nevis":
                 country_links = st_kitts_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Martinique":
                 country_links = martinique_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Turks and Caicos":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Cuisine_of_the_Turks_and_Caicos_Islands'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
             elif country == "Wallis and Futuna":
                 country_links = wallis_and_futuna_links
-                bottom_links = np.NaN
+                bottom_links = np.nan
             elif country == "Rapa Nui":
                 cuisine_link = 'https://en.wikipedia.org/wiki/Pascuense_cuisine'
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
@@ -520,7 +604,7 @@ def get_cuisine_dict(list_of_templates):
                 country_links, bottom_links = get_cuisine_links(cuisine_link, country, bottom_nav_check=True)
 
             else:
-                country_links, bottom_links = np.NaN, np.NaN
+                country_links, bottom_links = np.nan, np.nan
                 for a in soup.find("div", class_="navbox").find_all("a"):
                     if a.text == "Cuisine":
                         cuisine_link = f'https://en.wikipedia.org{a["href"]}'
@@ -532,57 +616,47 @@ def get_cuisine_dict(list_of_templates):
 
 
 # For getting Wikipedia backlinks from any Wikipedia page returned as a list plus more
-def get_cuisine_links(url, country, bottom_nav_check=False, text_only=False, raw_text=False, dict_with_places=None):
+def get_cuisine_links(url, country, bottom_nav_check=False, text_only=False, raw_text=False, dict_with_places=None, sketches=None):
     '''Takes a URL, a country name as string, three optional bools, and one optional 
-    dictionary and returns a list or a dictionary.
+    dictionary and returns a list or a dictionary. If sketches (a LinkSketches, see 
+    minhash.py) is passed, the page's links are also sketched into it under the country.
     
-    Arguments: string,string, bool (optional), bool (optional), bool (optional), dict (optional)
+    Arguments: string,string, bool (optional), bool (optional), bool (optional), dict (optional), LinkSketches (optional)
     Returns: list, list (optional), dictionary (optional)
     '''
 
-    response = requests.get(url)
+    response = get_default_fetcher().get(url)
     print(response.status_code)
     page = response.text
-    soup = BeautifulSoup(page)
+    root = lxml.html.document_fromstring(page)
 
     # Each page should include itself in its links, as others that link to it will share something with it
     self_link = url.split("https://en.wikipedia.org/wiki/")[1]
-    title = soup.find(id="firstHeading").text
-    bottom_nav_links = np.NaN
+    title = element_text(find_by_id(root, "firstHeading"))
+    bottom_nav_links = np.nan
     if bottom_nav_check==True:
-        for i, a in enumerate(soup.find_all("a", class_="mw-selflink selflink")):
-            if a.text == f'Cuisine of {country}' or a.text == title:
+        for i, a in enumerate(root.xpath('//a[@class="mw-selflink selflink"]')):
+            a_text = element_text(a)
+            if a_text == f'Cuisine of {country}' or a_text == title:
                 bottom_nav_links = []
-                print(a.text)
+                print(a_text)
                 try:
-                    for _ in soup.find(id="External_links").find_next("td", class_="navbox-list").find_all("a"):
-                        bottom_nav_links.append((_["href"].lstrip('/wiki/'), _.text))
-                except (AttributeError, KeyError) as error:
+                    nav_list = find_by_id(root, "External_links").xpath('following::td[contains(concat(" ", normalize-space(@class), " "), " navbox-list ")]')[0]
+                    for _ in nav_list.iter("a"):
+                        bottom_nav_links.append((_.attrib["href"].lstrip('/wiki/'), element_text(_)))
+                except (AttributeError, KeyError, IndexError) as error:
                     continue
                 bottom_nav_links = list(set(bottom_nav_links))
 
-    tags_to_extract = ['table', 'script', 'meta', 'style']
-    titles_to_extract = ['Jump up', 'Enlarge', re.compile("(Wikipedia:)"), "Help:Category", re.compile("(Category:Wiki.*)"), re.compile("(Category:Comm.*)"), re.compile("(Category:Articles.*)"), re.compile("(Category:All )"), 'ISBN (identifier)', re.compile("(Special:)"), re.compile("(Category:CS1)")]
-    texts_to_extract = ['edit', re.compile("(Jump to)"), 'cuisine']
-    classes_to_extract = ['reference']
-    ids_to_extract = ['mw-hidden-catlinks']
-
-    for t in tags_to_extract:
-        [s.extract() for s in soup(t)]
-    for t in ids_to_extract:
-        [s.extract() for s in soup(id=t)]
-    for t in titles_to_extract:
-        [s.extract() for s in soup("a", title=t)]
-    for t in texts_to_extract:
-        [s.extract() for s in soup("a", text=t)]
-    for t in classes_to_extract:
-        [s.extract() for s in soup("a", class_=t)]
-
-    main_body = soup.find('div', id='bodyContent')
+    # Tables, references, hidden categories and housekeeping links all go in one pass (see html_cleaner.py)
+    CUISINE_LINKS_CLEANER.clean(root)
+
     if text_only==False:
-        page_wikilinks = [(country, country), (self_link, title)] + list(set([(wikilink["href"].lstrip('/wiki/'), wikilink.text) for wikilink in main_body.find_all("a", href=re.compile("(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+        page_wikilinks = [(country, country), (self_link, title)] + list(set([(wikilink.get("href").lstrip('/wiki/'), text) for wikilink, text in wikilink_elements(root)]))
     else:
-        page_wikilinks = [(country, country), (self_link, title)] + list(set([unidecode.unidecode(wikilink.text) for wikilink in main_body.find_all("a", href=re.compile("(^\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+        page_wikilinks = [(country, country), (self_link, title)] + list(set([unidecode.unidecode(text) for wikilink, text in wikilink_elements(root)]))
+    if sketches is not None:
+        sketches.add(country, page_wikilinks)
 
     if dict_with_places:
         dictionary = dict_with_places[0]
@@ -597,34 +671,27 @@ def get_cuisine_links(url, country, bottom_nav_check=False, text_only=False, raw
 
 
 # For comparing two places/Wikipedia pages based on overlapping Wikipedia backlinks
-def city_compare(names, soups, print_all=True):
+def city_compare(names, soups, print_all=True, metric="count"):
     '''Takes a list of place names (strings), scrapes corresponding page soups 
     and returns a dictionary with place names as keys and the number of backlinks 
-    shared with each other place as values.
+    shared with each other place as values. All the overlaps are scored at once 
+    (see link_overlap.py); metric can also be "shared", "jaccard" or "idf".
 
-    Arguments: list of strings, list of strings, bool (optional)
+    Arguments: list of strings, list of strings, bool (optional), string (optional)
     Returns: dict
     '''
     
     main_dict = dict(zip(names, soups))
-    best_matches = {}
+    overlap = LinkOverlap(main_dict.keys(), main_dict.values())
+    best_matches = overlap.best_matches(metric)
 
-    for city, links in main_dict.items():
-        if print_all==True:
+    if print_all==True:
+        for city in main_dict.keys():
             print(f'\n{city}\n***********\n')
-        best_score = 0
-        closest_city = ''
-        for other_city in main_dict.keys():
-            if other_city != city:
-                score = compare_places(main_dict[city], main_dict[other_city])
-                if print_all==True:
-                    print(f'{city} x {other_city}: {score}')
-                if score > best_score:
-                    best_score = score
-                    closest_city = other_city
-        if print_all==True:
-            print(f'* CLOSEST MATCH, {city.upper()}: {closest_city.upper()} *')
-        best_matches[city] = (closest_city, best_score)
+            for other_city in main_dict.keys():
+                if other_city != city:
+                    print(f'{city} x {other_city}: {overlap.pair(city, other_city, metric)}')
+            print(f'* CLOSEST MATCH, {city.upper()}: {best_matches[city][0].upper()} *')
 
     return best_matches
 
@@ -638,15 +705,16 @@ def get_wiki_page(url, wikilinks=False):
     Returns: list of strings OR parsed HTML as string
     '''
 
-    response = requests.get(url)
+    response = get_default_fetcher().get(url)
     print(response.status_code)
     page = response.text
-    soup = BeautifulSoup(page)
 
     if wikilinks==True:
-        page_wikilinks = list(set([wikilink.text for wikilink in soup.find("div", id="bodyContent").find_all("a", href=re.compile("(\/wiki\/.+)")) if wikilink.text != "" and wikilink.text != " "]))
+        # No need for the soup, the links are picked up while the page is parsed
+        page_wikilinks = list(set([text for _, text in stream_wikilinks(page, href_pattern=re.compile("(\/wiki\/.+)"))]))
         return page_wikilinks
     else:
+        soup = BeautifulSoup(page)
         return soup
 
     
@@ -658,145 +726,209 @@ def compare_places(place1_links, place2_links):
     Returns: int
     '''
 
+    # A set makes each membership test O(1) instead of a scan of place2_links
+    place2_set = set(place2_links)
     counter = 0
     for link in place1_links:
-        if link in place2_links:
+        if link in place2_set:
             counter += 1
 
     return counter
 
 
-# For pulling several different documents (as options) for each dish in the df
-def process_full_df(df):
-    '''Takes a full df with specific columns and returns a new df with several new columns including 
-    cleaned lemmatized text.
-    
-    Arguments: df
-    Returns: df
+# Parts of speech kept in the lemmatized and lower case text
+KEPT_POS = {"PROPN", "VERB", "NOUN", "ADJ"}
+
+
+# For getting the places, lemmatized text and lower case text out of a spaCy doc in one pass over its tokens
+def _process_doc(doc):
+    entities = [X.text.lower() for X in doc.ents if X.label_ == "GPE" or X.label_ == "LOC" if "the" in X.text or X.text[0] != X.text[0].lower()]
+    entities = [" ".join(entity.split(" ")[1:]).strip() if entity.split(" ")[0].strip() == "the" else entity for entity in entities]
+
+    lemmas = []
+    words = []
+    for token in doc:
+        if token.pos_ in KEPT_POS and token.is_stop == False and token.lemma_ != " ":
+            lemmas.append(token.lemma_)
+            words.append(ascii_fold(token.text.lower()))
+
+    # Tidied for all the rows at once afterwards (see _process_rows)
+    return entities, " ".join(lemmas).lower(), " ".join(words).lower()
+
+
+def _process_rows(df, batch_size, n_process, disable):
+    '''Does the work for process_full_df on every row of df and returns the new columns as a dict of lists.
+
+    The per row part (spaCy, and picking the categories, origin, ingredients and type out of the links and
+    infobox) runs in one loop; the cleaning of the text, origin and category columns then runs over the
+    whole columns at once with the Series versions in text_normalize.py.
     '''
 
     named_entities = []
-    lemmatized_text = []
-    unidecoded_lemmatized = []
+    raw_lemmatized = []
+    raw_lower_case = []
     categories = []
-    place_of_origin = []
+    raw_origins = []
     ingredients = []
     all_food_types = []
-    just_lowercase = []
-    all_together = []
 
-    for i in tqdm(range(df.shape[0])):
-        see_also_removed = big_foods_df.iloc[i]["Text"].split("See also")[0].strip()
-        cleaned = re.sub("(  )( *)", " ", see_also_removed)
-        cleaned = re.sub("(--)", "", see_also_removed)
-        doc = nlp(cleaned)
-
-        entities = [X.text.lower() for X in doc.ents if X.label_ == "GPE" or X.label_ == "LOC" if "the" in X.text or X.text[0] != X.text[0].lower()]
-        if len(entities) > 0:
-            new_entities = []
-            for entity in entities:
-                if entity.split(" ")[0].strip() == "the":
-                    new_entity = " ".join(entity.split(" ")[1:]).strip()
-                    new_entities.append(new_entity)
-                else:
-                    new_entities.append(entity)
-            entities = new_entities
-
-        lemmatized = " ".join([token.lemma_ for token in doc if token.pos_ in ["PROPN", "VERB", "NOUN", "ADJ"] and token.is_stop == False and token.lemma_ != " "]).lower()
-        lemmatized = re.sub("(  )( *)", " ", lemmatized)
-        lemmatized = re.sub("( / | ― )", " ", lemmatized)
-        lemmatized = re.sub("( (\d+) )", " ", lemmatized)
-        lemmatized = re.sub("( ([A-z]) )", " ", lemmatized)
-        lemmatized = re.sub("(\.)", " ", lemmatized)
-        lemmatized_text.append(lemmatized)
-        unidecoded = unidecode.unidecode(lemmatized)
-        unidecoded_lemmatized.append(unidecoded)
-
-        lower_case = " ".join([unidecode.unidecode(token.text.lower()) for token in doc if token.pos_ in ["PROPN", "VERB", "NOUN", "ADJ"] and token.is_stop == False and token.lemma_ != " "]).lower()
-        lower_case = re.sub("(  )( *)", " ", lower_case)
-        lower_case = re.sub("( / | ― )", " ", lower_case)
-        lower_case = re.sub("( (\d+) )", " ", lower_case)
-        lower_case = re.sub("( ([A-z]) )", " ", lower_case)
-        lower_case = re.sub("(\.)", " ", lower_case)
-        just_lowercase.append(lower_case)
-        lower_case = [lower_case]
-    
-        links = big_foods_df.iloc[i]["Wikilinks raw"]
+    texts = (text.split("See also")[0].strip().replace("--", "") for text in df["Text"])
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=[name for name in disable if name in nlp.pipe_names])
+    rows = zip(docs, df["Wikilinks raw"], df["Infobox"])
+
+    for i, (doc, links, infobox) in enumerate(tqdm(rows, total=df.shape[0])):
+        entities, lemmatized, lower_case = _process_doc(doc)
+        raw_lemmatized.append(lemmatized)
+        raw_lower_case.append(lower_case)
+
         cats = []
+        # Rows added since the full scrape can be missing the source columns (NaN)
+        links = [] if type(links) == float else links
         for item in links:
             try:
-                if re.match("(Category:)", item):
-                    cat = item.split(":")[1].lower()
-                    cat = re.sub("(_)", " ", cat)
-                    cats.append(cat)
-                    lower_case.append(cat)
-                if re.match("(List_of_)", item):
-                    cat = item.split("List_of_")[1].lower()
-                    cat = re.sub("(_)", " ", cat)
-                    cats.append(cat)
-                    lower_case.append(cat)
+                if CATEGORY.match(item):
+                    cats.append(item.split(":")[1].lower().replace("_", " "))
+                if LIST_OF.match(item):
+                    cats.append(item.split("List_of_")[1].lower().replace("_", " "))
             except TypeError:
                 print(f'TypeError at iloc {i}')
                 break
 
-        if type(big_foods_df.iloc[i]["Infobox"]) != float:
-            origin = np.NaN
-            ingreds = np.NaN
-            food_type = np.NaN
-            for item in big_foods_df.iloc[i]["Infobox"]:
-                if re.match("(Place of origin: )", item):
-                    origin = re.sub("Place of origin:", "", item)
-                    origin = origin.lower().strip()
-                    origin = re.sub("( ?)(\((.*)\)|\[(.*)\])", "", origin)
-                    origin = re.sub("(Disputed:( ?))", "", origin)
-                    entities.append(origin)
+        origin = np.nan
+        ingreds = np.nan
+        food_type = np.nan
+        if type(infobox) != float:
+            for item in infobox:
+                if ORIGIN_LABEL.match(item):
+                    origin = item.replace("Place of origin:", "").lower().strip()
                     break
-            place_of_origin.append(origin)
-            for item in big_foods_df.iloc[i]["Infobox"]:
-                if re.match("((.*)ingredients:( *)|(.*)Ingredients:( *))", item):
-                    ingreds = re.sub("((.*)ingredients:( *)|(.*)Ingredients:( *))", "", item)
-                    ingreds = ingreds.lower().strip()
-                    lower_case.append(ingreds)
+            for item in infobox:
+                if INGREDIENTS_LABEL.match(item):
+                    ingreds = INGREDIENTS_LABEL.sub("", item).lower().strip()
                     break
-            ingredients.append(ingreds)
-            for item in big_foods_df.iloc[i]["Infobox"]:
-                if re.match("((.*)type:( *)|(.*)Type:( *))", item):
-                    food_type = re.sub("((.*)type:( *)|(.*)Type:( *))", "", item)
-                    food_type = food_type.lower().strip()
-                    lower_case.append(food_type)
+            for item in infobox:
+                if TYPE_LABEL.match(item):
+                    food_type = TYPE_LABEL.sub("", item).lower().strip()
                     break
-            all_food_types.append(food_type)
-        else:
-            place_of_origin.append(np.NaN)
-            ingredients.append(np.NaN)
-            all_food_types.append(np.NaN)
-        
-        true_cat = big_foods_df.iloc[i]["Category"].lower()
-        cats.append(true_cat)
-        categories.append(cats)
-        lower_case.append(true_cat)
+        raw_origins.append(origin)
+        ingredients.append(ingreds)
+        all_food_types.append(food_type)
 
+        categories.append(cats)
         named_entities.append(entities)
-        lower_case.extend(entities)
-        
-        all_together.append(" ".join(lower_case))
-    
-    df["All together"] = all_together
-    df["Text: lower case"] = just_lowercase
-    df["Text: lemmatized"] = lemmatized_text
-    df["Text: lemmatized and unidecoded"] = unidecoded_lemmatized
-    df["All places"] = named_entities
-    df["Origin"] = place_of_origin
-    df["Wiki categories"] = categories
-    df["Main ingredients"] = ingredients
-    df["Type"] = all_food_types
-
-    with open("Processed_foods_df.pickle", "wb") as to_write:
-        pickle.dump(df, to_write)
+
+    lemmatized_text = tidy_series(pd.Series(raw_lemmatized, dtype=object))
+    just_lowercase = tidy_series(pd.Series(raw_lower_case, dtype=object)).tolist()
+    place_of_origin = clean_origin_series(pd.Series(raw_origins, dtype=object)).tolist()
+    # A dish added without a category has None (or NaN) there, which .str leaves as it is
+    true_categories = pd.Series(list(df["Category"]), dtype=object).str.lower().tolist()
+
+    all_together = []
+    for lower_case, cats, origin, ingreds, food_type, true_cat, entities in zip(just_lowercase, categories, place_of_origin, ingredients, all_food_types, true_categories, named_entities):
+        if type(origin) != float:
+            entities.append(origin)
+        # Same order the words have always gone in: text, link categories, ingredients, type, category, places
+        words = [lower_case] + cats + [value for value in (ingreds, food_type) if type(value) != float]
+        if isinstance(true_cat, str):
+            cats.append(true_cat)
+            words.append(true_cat)
+        all_together.append(" ".join(words + entities))
+
+    return {
+        "All together": all_together,
+        "Text: lower case": just_lowercase,
+        "Text: lemmatized": lemmatized_text.tolist(),
+        "Text: lemmatized and unidecoded": lemmatized_text.map(ascii_fold).tolist(),
+        "All places": named_entities,
+        "Origin": place_of_origin,
+        "Wiki categories": categories,
+        "Main ingredients": ingredients,
+        "Type": all_food_types,
+    }
+
+
+# Columns process_full_df works from, and the ones it adds
+SOURCE_COLUMNS = ["Text", "Wikilinks raw", "Infobox", "Category"]
+PROCESSED_COLUMNS = ["All together", "Text: lower case", "Text: lemmatized", "Text: lemmatized and unidecoded", "All places", "Origin", "Wiki categories", "Main ingredients", "Type"]
+
+
+# For telling which rows have changed since they were last processed
+def content_hashes(df):
+    '''Takes a df with the SOURCE_COLUMNS and returns a list with a hash of each row's content in them.
+
+    Arguments: df
+    Returns: list of strings
+    '''
+
+    hashes = []
+    for row in zip(*[df[column] for column in SOURCE_COLUMNS]):
+        digest = hashlib.sha1()
+        for value in row:
+            digest.update(repr(value).encode("utf-8"))
+            digest.update(b"\0")
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+# For pulling several different documents (as options) for each dish in the df
+def process_full_df(df, batch_size=64, n_process=1, disable=("parser",), store="Processed_foods_df.pickle"):
+    '''Takes a full df with specific columns and returns a new df with several new columns including 
+    cleaned lemmatized text. The text goes through spaCy in batches with nlp.pipe, over n_process
+    processes, with the pipeline components in disable switched off. Each row's content hash is kept
+    with it so update_processed_df can skip rows that haven't changed.
+    
+    Arguments: df, int (optional), int (optional), tuple of strings (optional), string (optional)
+    Returns: df
+    '''
+
+    for column, values in _process_rows(df, batch_size, n_process, disable).items():
+        df[column] = values
+    df["Content hash"] = content_hashes(df)
+
+    save_df(df, store)
     
     return df
 
 
+# For processing only the rows that are new or have changed since the last run
+def update_processed_df(df, store="Processed_foods_df.pickle", batch_size=64, n_process=1, disable=("parser",)):
+    '''Takes a full df with specific columns and the path of the processed df pickle and returns the df with
+    the same new columns process_full_df adds. Rows whose Text, Wikilinks raw, Infobox and Category are
+    unchanged since they were stored are copied from the store; only new or changed rows go through
+    spaCy. The store is rewritten with the result (rows no longer in df are dropped from it).
+
+    Arguments: df, string (optional), int (optional), int (optional), tuple of strings (optional)
+    Returns: df
+    '''
+
+    if not os.path.exists(store):
+        return process_full_df(df, batch_size, n_process, disable, store)
+
+    with open(store, "rb") as to_read:
+        processed = pickle.load(to_read)
+
+    stored_hashes = processed["Content hash"] if "Content hash" in processed.columns else content_hashes(processed)
+    stored = {}
+    for position, row_hash in enumerate(stored_hashes):
+        stored.setdefault(row_hash, position)
+
+    hashes = content_hashes(df)
+    to_process = [position for position, row_hash in enumerate(hashes) if row_hash not in stored]
+    print(f'{len(to_process)} of {len(hashes)} rows new or changed')
+
+    new_columns = _process_rows(df.iloc[to_process], batch_size, n_process, disable) if to_process else {column: [] for column in PROCESSED_COLUMNS}
+
+    for column in PROCESSED_COLUMNS:
+        stored_values = processed[column].tolist()
+        new_values = iter(new_columns[column])
+        df[column] = [stored_values[stored[row_hash]] if row_hash in stored else next(new_values) for row_hash in hashes]
+    df["Content hash"] = hashes
+
+    save_df(df, store)
+
+    return df
+
+
 # For collecting geography/regional/cultural terms only
 def places_clean(input_list):
     '''Takes a list of places and returns a summed, cleaned list of places in that list.
@@ -813,13 +945,11 @@ def places_clean(input_list):
             new_place = ""
             for item in doc:
                 new_item = item.lemma_
-                new_item = re.sub("('s$)", "", new_item)
+                new_item = POSSESSIVE.sub("", new_item)
                 if new_item != "-PRON-":
                     new_place += " " + new_item
             if new_place.strip() != "":
-                new_place = re.sub("(\.)", " ", new_place)
-                new_place = re.sub("(  )( *)", " ", new_place)
-                new_place = unidecode.unidecode(new_place)
+                new_place = clean_place(new_place)
                 new_places.append(new_place.strip())
     
     return list(set(new_places))
@@ -847,7 +977,7 @@ def ingredients_clean(text):
             for word in new_item.split(" "):
                 if word.strip() in stopwords or word.strip() == "usually" or word.strip() == "often":
                     new_item = " ".join(new_item.split(word)).strip()
-                    new_item = re.sub("(  )( *)", " ", new_item)
+                    new_item = collapse_spaces(new_item)
             ingredients_list.append(new_item)
 
     # for item in text.split(","):
@@ -878,6 +1008,39 @@ def get_random_dish_page():
     return x, processed_foods_df.iloc[x]["All together"]
 
 
+# The glossaries compiled into one matcher, kept until one of them changes
+_glossary_matcher = None
+_glossary_key = None
+
+
+def glossary_matcher():
+    '''Takes no argument and returns a GlossaryMatcher (see glossary_matcher.py) of the food, geographical, 
+    flavor and type glossaries, compiled on first use and again only if a glossary is replaced or resized.
+    
+    Arguments: (none)
+    Returns: GlossaryMatcher
+    '''
+
+    global _glossary_matcher, _glossary_key
+    glossaries = {"food": combined_glossary, "geographical": geographical_glossary, "flavor": flavor_glossary, "type": type_glossary}
+    key = tuple((id(glossary), len(glossary)) for glossary in glossaries.values())
+    if key != _glossary_key:
+        _glossary_matcher, _glossary_key = GlossaryMatcher(glossaries), key
+    return _glossary_matcher
+
+
+# For tagging every document with the glossary terms it contains
+def tag_glossaries(df, column="All together"):
+    '''Takes a df and the name of its text column and returns a df with the food, geographical, flavor 
+    and type glossary terms found in each row's text, one column of lists per glossary.
+    
+    Arguments: df, string (optional)
+    Returns: df
+    '''
+
+    return glossary_matcher().tag_many(df[column])
+
+
 # For looking at the kinds of words included in each document
 def get_random_keywords():
     '''Takes no argument and returns categorized words from a randomly generated dish.
@@ -887,31 +1050,16 @@ def get_random_keywords():
     '''
 
     x, text = get_random_dish_page()
-    food_keywords = []
-    geographical_keywords = []
-    flavor_keywords = []
-    type_keywords = []
-    for term in combined_glossary:
-        if term in text:
-            food_keywords.append(term)
-    for term in geographical_glossary:    
-        if term in text:
-            geographical_keywords.append(term)
+    # Every glossary term in the text, whole words only, in one pass
+    tags = glossary_matcher().tag(text)
+    geographical_keywords = tags["geographical"]
     if type(processed_foods_df.iloc[x]["Origin"]) != float:
         geographical_keywords.append(processed_foods_df.iloc[x]["Origin"])
-    for term in flavor_glossary:
-        if term in text:
-            flavor_keywords.append(term)
-    for term in type_glossary:
-        if term in text:
-            type_keywords.append(term)
+    flavor_keywords = tags["flavor"]
+    type_keywords = tags["type"]
 
     print("\n\n==========\nFOOD:\n==========\n")
-    checker = []
-    for word in get_grams(text, 4):
-        if word in set(food_keywords):
-            checker.append(word)
-    for word in set(checker):
+    for word in set(tags["food"]):
         print(word)
     print("\n\n==========\nGEOGRAPHICAL:\n==========\n")
     for word in set(geographical_keywords):
@@ -933,8 +1081,8 @@ def get_image_urls(input_list):
     '''
     
     real_image_urls =[]
-    for item in input_list:
-        response = requests.get(item)
+    # Fetched a few pages ahead in parallel, stopping once three real images are found
+    for response in get_default_fetcher().iter_many(input_list):
         if response.status_code == 200:  
             page = response.text
             soup = BeautifulSoup(page)
@@ -956,16 +1104,25 @@ def condense_list(term_list):
     Returns: string
     '''
 
-    new_corpus = []
-    for term in term_list:
-        term_no_spaces = re.sub("( )", "", term)
-        term_no_spaces = re.sub("(;)", " ", term_no_spaces)
-        term_no_spaces = re.sub("(,)", " ", term_no_spaces)
-        term_no_spaces = re.sub("(\.)", " ", term_no_spaces)
-        term_no_spaces = re.sub("(=)", " ", term_no_spaces)
-        term_no_spaces = re.sub("(  )( *)", " ", term_no_spaces)
-        new_corpus.append(unidecode.unidecode(term_no_spaces.strip()))
-    
-    new_corpus = " ".join(new_corpus)
+    # One translate and one regex per term (see text_normalize.py)
+    new_corpus = " ".join([condense_term(term) for term in term_list])
+
+    return new_corpus
+
+
+# For trimming a whole column of term lists at once
+def condense_lists(term_lists):
+    '''Takes a column (or list) of lists of words/terms and returns a list of what condense_list returns for
+    each, with the terms of every list cleaned in one go by condense_series.
+
+    Arguments: Series or list of lists
+    Returns: list of strings
+    '''
+
+    lists = pd.Series(list(term_lists), dtype=object)
+    # One term per row, indexed by the list it came from; empty lists explode to a NaN
+    terms = lists.explode()
+    terms = terms[terms.notna()]
+    joined = condense_series(terms).groupby(level=0).agg(" ".join)
 
-    return new_corpus
\ No newline at end of file
+    return joined.reindex(lists.index, fill_value="").tolist()
\ No newline at end of file
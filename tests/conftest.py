@@ -0,0 +1,127 @@
+import os
+import sys
+
+import pytest
+import spacy
+from spacy.language import Language
+
+# The modules import each other by bare name, the way the app and the notebooks run them
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("Functions", "Flask app"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
+
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+class SavedResponse:
+    '''Enough of a requests Response for PageCache.put.'''
+
+    def __init__(self, url, text, status_code=200, headers=None):
+        self.url = url
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.status_code = status_code
+        self.encoding = "utf-8"
+        self.headers = headers or {}
+
+
+def saved_page(name):
+    with open(os.path.join(PAGES, f'{name}.html'), encoding="utf-8") as to_read:
+        return to_read.read()
+
+
+@pytest.fixture
+def offline_pages(tmp_path):
+    '''Makes the default fetcher serve the pages in tests/pages from an offline PageCache, as
+    https://en.wikipedia.org/wiki/<file name>, and returns the cache.
+    '''
+
+    from page_cache import PageCache
+    from wiki_fetcher import Fetcher, get_default_fetcher, set_default_fetcher
+
+    cache = PageCache(str(tmp_path / "wiki_cache"), ttl=None)
+    for file_name in os.listdir(PAGES):
+        name = file_name[:-len(".html")]
+        cache.put(WIKI + name, SavedResponse(WIKI + name, saved_page(name)))
+    cache.offline = True
+
+    previous = get_default_fetcher()
+    fetcher = Fetcher(cache=cache)
+    set_default_fetcher(fetcher)
+    yield cache
+    set_default_fetcher(previous)
+    fetcher.close()
+
+
+# No trained spaCy pipeline is needed: capitalized words are PROPN, the rest NOUN, a trailing s is
+# dropped for the lemma, and a few place names are GPE entities
+@Language.component("rough_tagger")
+def rough_tagger(doc):
+    for token in doc:
+        if token.is_alpha:
+            token.pos_ = "PROPN" if token.text[0].isupper() else "NOUN"
+            token.lemma_ = token.text[:-1] if token.text.endswith("s") and len(token.text) > 3 else token.text
+    return doc
+
+
+@pytest.fixture
+def rough_nlp(monkeypatch):
+    '''Sets wikipedia_functions' nlp (which the notebooks set to a loaded spaCy model) to a rough rule
+    based pipeline and returns it.
+    '''
+
+    import wikipedia_functions
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("rough_tagger")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "GPE", "pattern": place} for place in
+                                               ["Vietnam", "France", "Japan", "Italy", "Sicily", "the Netherlands", "Ho Chi Minh"]])
+    monkeypatch.setattr(wikipedia_functions, "nlp", nlp, raising=False)
+    return nlp
+
+
+DISHES = {
+    "Pho": ("vietnam noodle soup beef broth rice noodles herbs", "Vietnam"),
+    "Bun bo Hue": ("vietnam noodle soup beef lemongrass spicy", "Vietnam"),
+    "Ramen": ("japan noodle soup pork broth wheat noodles", "Japan"),
+    "Udon": ("japan noodle wheat thick broth", "Japan"),
+    "Ratatouille": ("france stewed vegetable eggplant zucchini tomato", "France"),
+    "Caponata": ("italy sicily eggplant celery capers sweet sour", "Italy"),
+    "Paella": ("spain rice saffron seafood chicken", "Spain"),
+    "Crème brûlée": ("france custard caramel sugar dessert", "France"),
+}
+
+
+@pytest.fixture
+def app_folder(tmp_path):
+    '''Fits a TF-IDF model of a handful of dishes and writes the artifacts the app serves from (neighbors,
+    df and cards) to a folder, and returns the folder.
+    '''
+
+    import pandas as pd
+    from Tfidf import TfidfService
+
+    names = list(DISHES)
+    df = pd.DataFrame({"Food": names, "Text": [f'{name} is a dish.' for name in names], "Origin": [DISHES[name][1] for name in names],
+                       "WORKING URLs": [[f'{name}.jpg'] for name in names], "URL": [WIKI + name.replace(" ", "_") for name in names],
+                       "CORPUS": [DISHES[name][0] for name in names]})
+    folder = tmp_path / "app"
+    folder.mkdir()
+    TfidfService.create(str(folder), df, k=4)
+    return str(folder)
+
+
+@pytest.fixture
+def client(app_folder, monkeypatch):
+    '''A Flask test client of the app serving app_folder, with an empty cache.'''
+
+    import App
+    from Cache import ResponseCache
+    from Store import ModelStore
+
+    store = ModelStore(app_folder)
+    store.warm_up()
+    monkeypatch.setattr(App, "store", store)
+    monkeypatch.setattr(App, "cache", ResponseCache(App.app.config['CACHE_MAX_BYTES']))
+    return App.app.test_client()
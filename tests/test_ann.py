@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from Ann import LshIndex, IvfIndex, exact_top_k, benchmark_ann, clustered_vectors
+
+
+def recall(index, vectors, rows, k=10, probes=None):
+    found = sum(len(np.intersect1d(index.query_row(row, k, probes)[0], truth)) for row, truth in zip(rows, exact_top_k(vectors, rows, k)))
+    return found / (len(rows) * k)
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return clustered_vectors(3000, 32, clusters=100, spread=0.35)
+
+
+ROWS = list(range(0, 3000, 30))
+
+
+def test_exact_top_k_matches_sorting_every_score(vectors):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for row, top in zip(ROWS[:10], exact_top_k(vectors, ROWS[:10], 5)):
+        assert top[0] == row
+        assert np.array_equal(top, np.argsort(-(normalized @ normalized[row]), kind="stable")[:5])
+
+
+@pytest.mark.parametrize("index, minimum", [(LshIndex(n_tables=8, n_bits=10, probes=2), 0.9), (IvfIndex(n_lists=40, probes=6), 0.95)])
+def test_recall_against_exact_top_k(vectors, index, minimum):
+    index.build(vectors)
+
+    assert recall(index, vectors, ROWS) >= minimum
+    rows, scores = index.query_row(ROWS[0], 10)
+    assert rows[0] == ROWS[0] and scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_more_probes_never_lower_recall(vectors):
+    lsh = LshIndex(n_tables=4, n_bits=12, probes=0).build(vectors)
+    ivf = IvfIndex(n_lists=60, probes=1).build(vectors)
+
+    assert recall(lsh, vectors, ROWS, probes=0) <= recall(lsh, vectors, ROWS, probes=4)
+    assert recall(ivf, vectors, ROWS, probes=1) <= recall(ivf, vectors, ROWS, probes=8)
+    # Probing every cluster is brute force
+    assert recall(ivf, vectors, ROWS, probes=60) == 1.0
+
+
+def test_ivf_on_sparse_tfidf_rows():
+    rng = np.random.default_rng(1)
+    dense = rng.random((600, 200)) * (rng.random((600, 200)) < 0.05)
+    dense[:, 0] += 0.01
+    tfidf = sp.csr_matrix(dense)
+
+    index = IvfIndex(n_lists=16, probes=16).build(tfidf)
+
+    assert recall(index, tfidf, ROWS[:20]) == 1.0
+    assert recall(index, tfidf, ROWS[:20], k=5) == 1.0
+
+
+@pytest.mark.parametrize("cls, options", [(LshIndex, {"n_tables": 6, "n_bits": 10}), (IvfIndex, {"n_lists": 30})])
+def test_save_and_load_give_the_same_results(vectors, tmp_path, cls, options):
+    built = cls(**options).build(vectors)
+    built.save(str(tmp_path / "index.npz"))
+
+    loaded = cls.load(str(tmp_path / "index.npz"), vectors)
+
+    for row in ROWS[:10]:
+        assert np.array_equal(built.query_row(row, 10)[0], loaded.query_row(row, 10)[0])
+    with pytest.raises(ValueError):
+        cls.load(str(tmp_path / "index.npz"), vectors[:10])
+
+
+def test_benchmark_ann_reports_recall(vectors, capsys):
+    results = benchmark_ann(vectors, [IvfIndex(n_lists=30, probes=30)], k=5, queries=20)
+
+    assert results[0]["recall"] == 1.0 and "recall@5" in capsys.readouterr().out
@@ -0,0 +1,79 @@
+def test_closest_renders_an_exact_match(client):
+    response = client.post("/closest", data={"food-search": "creme brulee"})
+
+    assert response.status_code == 200
+    assert "Crème brûlée" in response.get_data(as_text=True)
+
+
+def test_closest_offers_suggestions_for_a_typo(client):
+    for path in ("/closest", "/closest2"):
+        response = client.post(path, data={"food-search": "ratatuille"})
+
+        page = response.get_data(as_text=True)
+        assert response.status_code == 404
+        assert response.mimetype == "text/html"
+        assert "No dish called ratatuille" in page
+        assert f'<form action="{path}" method="POST">' in page
+        assert 'value="Ratatouille"' in page
+
+
+def test_api_keeps_json_for_names_not_found(client):
+    response = client.get("/api/v1/similar/ratatuille")
+
+    assert response.status_code == 404
+    assert response.get_json()["dish"] is None
+    assert "Ratatouille" in response.get_json()["suggestions"]
+
+    results = client.get("/api/v1/similar?dish=Pho&dish=ratatuille&k=2").get_json()["results"]
+    assert results[0]["dish"] == "Pho" and results[0]["similar"][0] == "Bun bo Hue"
+    assert results[1]["dish"] is None and "Ratatouille" in results[1]["suggestions"]
+
+
+def test_api_etag_and_revalidation(client):
+    response = client.get("/api/v1/similar/Ramen?k=2")
+
+    assert response.status_code == 200 and response.get_json()["results"]["similar"][0] == "Udon"
+    assert response.headers["ETag"] and "max-age=300" in response.headers["Cache-Control"]
+    revalidated = client.get("/api/v1/similar/Ramen?k=2", headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304 and revalidated.get_data() == b""
+    # Another question is another ETag
+    other = client.get("/api/v1/similar/Ramen?k=3", headers={"If-None-Match": response.headers["ETag"]})
+    assert other.status_code == 200 and other.headers["ETag"] != response.headers["ETag"]
+    # POST answers aren't cacheable
+    posted = client.post("/api/v1/similar", json={"dishes": ["Ramen"], "k": 2})
+    assert "ETag" not in posted.headers and posted.get_json()["results"] == [dict(response.get_json()["results"], query="Ramen")]
+
+
+def test_api_validation(client, monkeypatch):
+    import App
+
+    for query, message in [("", "at least one dish"), ("dish=Pho&k=0", "between 1 and 4"), ("dish=Pho&k=5", "between 1 and 4"),
+                           ("dish=Pho&k=two", "whole number"), ("dish=Pho&continent=Asia", "no continent")]:
+        response = client.get(f'/api/v1/similar?{query}')
+        assert response.status_code == 400 and message in response.get_json()["error"], query
+    assert client.post("/api/v1/similar", json=["Pho"]).status_code == 400
+    assert client.post("/api/v1/similar", json={"dishes": ["Pho", 3]}).status_code == 400
+    assert client.post("/api/v1/similar", json={"dish": "Pho", "origin": 3}).get_json()["error"] == "origin must be a string"
+
+    monkeypatch.setitem(App.app.config, "API_MAX_BATCH", 2)
+    assert client.post("/api/v1/similar", json={"dishes": ["Pho", "Ramen", "Udon"]}).status_code == 400
+    assert client.post("/api/v1/similar", json={"dishes": ["Pho", "Ramen"]}).status_code == 200
+
+
+def test_api_filters_and_scores(client):
+    results = client.get("/api/v1/similar?dish=Pho&dish=Ratatouille&k=4&origin=japan&scores=true").get_json()["results"]
+
+    assert [item["dish"] for item in results[0]["similar"]] == ["Ramen", "Udon"]
+    assert 1 > results[0]["similar"][0]["score"] > results[0]["similar"][1]["score"] > 0
+    # Only the neighbors kept for each dish are searched, so a filter can leave fewer than k
+    assert [item["dish"] for item in results[1]["similar"]] == ["Udon"]
+    # Accents and case don't matter
+    assert client.get("/api/v1/similar/Ratatouille?k=4&origin=FRÂNCE").get_json()["results"]["similar"] == ["Crème brûlée"]
+
+
+def test_suggest_and_ready(client):
+    assert client.get("/suggest?term=ra").get_json()[:2] == ["Ramen", "Ratatouille"]
+    assert sorted(client.get("/suggest?q=p").get_json()[:2]) == ["Paella", "Pho"]
+    assert len(client.get("/suggest?q=p&n=1").get_json()) == 1
+    ready = client.get("/ready")
+    assert ready.status_code == 200 and ready.get_json()["ready"]
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from Artifacts import ArtifactWriter, HEADER_SIZE, ALIGN, write_artifact, save_artifact, open_artifact
+from Neighbors import NeighborIndex
+
+NAMES = ["Pho", "Crème brûlée", "Bún bò Huế", "Ramen"]
+
+
+def arrays(n=4, k=2, dim=3, seed=0):
+    rng = np.random.default_rng(seed)
+    neighbors = rng.integers(0, n, (n, k)).astype(np.int32)
+    scores = rng.random((n, k)).astype(np.float32)
+    vectors = rng.random((n, dim)).astype(np.float32)
+    return neighbors, scores, vectors
+
+
+def test_write_and_open_round_trip(tmp_path):
+    path = str(tmp_path / "dishes.w2v")
+    neighbors, scores, vectors = arrays()
+
+    write_artifact(path, NAMES, neighbors, scores, vectors)
+    artifact = open_artifact(path)
+
+    assert artifact.names == NAMES
+    assert np.array_equal(artifact.neighbors, neighbors) and np.array_equal(artifact.scores, scores)
+    assert np.array_equal(artifact.vectors, vectors)
+    assert isinstance(artifact.neighbors, np.memmap)
+    assert artifact.index["Bún bò Huế"] == 2 and artifact.rindex[1] == "Crème brûlée"
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_sections_are_aligned(tmp_path):
+    path = str(tmp_path / "dishes.w2v")
+    neighbors, scores, vectors = arrays(n=5, k=3, dim=7)
+    write_artifact(path, NAMES + ["Udon"], neighbors, scores, vectors)
+
+    artifact = open_artifact(path)
+    for section in (artifact.vectors, artifact.neighbors, artifact.scores):
+        assert section.offset % ALIGN == 0 and section.offset >= HEADER_SIZE
+
+
+def test_save_artifact_of_a_neighbor_index_without_vectors(tmp_path):
+    path = str(tmp_path / "dishes.w2v")
+    neighbors, scores, _ = arrays()
+
+    save_artifact(path, NeighborIndex(NAMES, neighbors, scores))
+    artifact = open_artifact(path)
+
+    assert artifact.vectors.shape == (4, 0)
+    assert artifact.closest("Pho") == NeighborIndex(NAMES, neighbors, scores).closest("Pho")
+
+
+def test_writer_fills_blocks_in_any_order(tmp_path):
+    path = str(tmp_path / "dishes.w2v")
+    neighbors, scores, vectors = arrays(n=4, k=2, dim=3)
+
+    with ArtifactWriter(path, NAMES, 2, dim=3) as writer:
+        writer.write(2, neighbors[2:], scores[2:], vectors[2:])
+        writer.write(0, neighbors[:2], scores[:2], vectors[:2])
+    artifact = open_artifact(path)
+
+    assert np.array_equal(artifact.neighbors, neighbors) and np.array_equal(artifact.vectors, vectors)
+
+
+def test_writer_removes_the_partial_file_on_error(tmp_path):
+    path = str(tmp_path / "dishes.w2v")
+
+    with pytest.raises(RuntimeError):
+        with ArtifactWriter(path, NAMES, 2):
+            raise RuntimeError("failed")
+
+    assert not os.path.exists(path) and not os.path.exists(path + ".tmp")
+
+
+def test_bad_files_are_rejected(tmp_path):
+    neighbors, scores, _ = arrays()
+    with pytest.raises(ValueError):
+        write_artifact(str(tmp_path / "x.w2v"), NAMES[:3], neighbors, scores)
+
+    short = tmp_path / "short.w2v"
+    short.write_bytes(b"WIKI2VEC")
+    with pytest.raises(ValueError, match="too short"):
+        open_artifact(str(short))
+
+    other = tmp_path / "other.w2v"
+    other.write_bytes(b"\0" * 256)
+    with pytest.raises(ValueError, match="not an artifact"):
+        open_artifact(str(other))
+
+    newer = tmp_path / "newer.w2v"
+    write_artifact(str(newer), NAMES, neighbors, scores)
+    data = bytearray(newer.read_bytes())
+    data[8:10] = (99).to_bytes(2, "little")
+    newer.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="version 99"):
+        open_artifact(str(newer))
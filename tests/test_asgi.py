@@ -0,0 +1,176 @@
+import asyncio
+import threading
+
+import pytest
+
+from Asgi import AsgiApp, wsgi_environ, call_wsgi
+
+
+def scope(path="/", method="GET", headers=(), query_string=b""):
+    return {"type": "http", "method": method, "path": path, "query_string": query_string, "headers": list(headers),
+            "http_version": "1.1", "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 5000), "root_path": ""}
+
+
+def body_messages(*chunks):
+    '''Returns an ASGI receive() that gives the request body in the given chunks.'''
+
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)] or [{"type": "http.request"}]
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    return receive
+
+
+async def request(asgi, http_scope, receive=None):
+    '''Runs one request through asgi and returns (status, headers, body).'''
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi(http_scope, receive or body_messages(), send)
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(message.get("body", b"") for message in sent[1:])
+
+
+def echo(environ, start_response):
+    body = environ["wsgi.input"].read(int(environ.get("CONTENT_LENGTH") or 0))
+    start_response("200 OK", [("Content-Type", "text/plain"), ("X-Path", environ["PATH_INFO"])])
+    return [body]
+
+
+def blocking(release):
+    def wsgi_app(environ, start_response):
+        release.wait(5)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"done"]
+    return wsgi_app
+
+
+def test_wsgi_environ():
+    environ = wsgi_environ(scope("/wiki/Phở", "POST", [(b"x-dish", b"Pho"), (b"x-dish", b"Ramen"), (b"content-type", b"text/plain"),
+                                                       (b"transfer-encoding", b"chunked")], b"k=2"), b"hello")
+
+    assert environ["PATH_INFO"].encode("latin-1").decode("utf-8") == "/wiki/Phở"
+    assert environ["QUERY_STRING"] == "k=2" and environ["HTTP_X_DISH"] == "Pho,Ramen"
+    assert environ["CONTENT_TYPE"] == "text/plain" and environ["CONTENT_LENGTH"] == "5"
+    assert "HTTP_TRANSFER_ENCODING" not in environ and environ["wsgi.input"].read() == b"hello"
+
+
+def test_call_wsgi_closes_the_result():
+    closed = []
+
+    class Result(list):
+        def close(self):
+            closed.append(True)
+
+    def wsgi_app(environ, start_response):
+        start_response("201 Created", [("X-One", "1")])
+        return Result([b"a", b"b"])
+
+    assert call_wsgi(wsgi_app, wsgi_environ(scope(), b"")) == (201, [(b"x-one", b"1")], [b"a", b"b"]) and closed
+
+
+def test_chunked_body_reaches_the_app():
+    asgi = AsgiApp(echo, workers=1)
+
+    status, headers, body = asyncio.run(request(asgi, scope("/echo/Phở", "POST"), body_messages(b"food-", b"search=", b"Pho")))
+
+    assert status == 200 and body == b"food-search=Pho" and headers[b"x-path"] == "/echo/Phở".encode("utf-8")
+    assert asgi.stats()["served"] == 1
+
+
+def test_chunked_form_post_to_the_flask_app(client):
+    import App
+
+    asgi = AsgiApp(App.app, workers=1)
+    form_scope = scope("/closest2", "POST", [(b"content-type", b"application/x-www-form-urlencoded"), (b"transfer-encoding", b"chunked")])
+
+    status, _, body = asyncio.run(request(asgi, form_scope, body_messages(b"food-search=", b"Ph", b"o")))
+
+    assert status == 200 and b"Bun bo Hue" in body
+
+
+def test_body_over_max_body_is_413():
+    asgi = AsgiApp(echo, workers=1, max_body=8)
+
+    status, headers, _ = asyncio.run(request(asgi, scope("/", "POST"), body_messages(b"12345", b"67890")))
+
+    assert status == 413 and headers[b"retry-after"] == b"1"
+    assert asyncio.run(request(asgi, scope("/", "POST"), body_messages(b"12345678")))[0] == 200
+
+
+def test_requests_over_the_queue_are_503():
+    release = threading.Event()
+    asgi = AsgiApp(blocking(release), workers=1, queue_size=1)
+
+    async def main():
+        admitted = [asyncio.create_task(request(asgi, scope())) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        rejected = await request(asgi, scope())
+        release.set()
+        return rejected, await asyncio.gather(*admitted)
+
+    rejected, admitted = asyncio.run(main())
+
+    assert rejected[0] == 503 and rejected[2] == b"Too busy, try again shortly"
+    assert [status for status, _, _ in admitted] == [200, 200]
+    assert asgi.stats()["rejected"] == 1 and asgi.stats()["in_flight"] == 0
+
+
+def test_shutdown_lets_admitted_requests_finish():
+    release = threading.Event()
+    asgi = AsgiApp(blocking(release), workers=1, shutdown_timeout=5)
+
+    async def main():
+        lifespan = asyncio.Queue()
+        sent = []
+
+        async def send(message):
+            sent.append(message["type"])
+
+        server = asyncio.create_task(asgi({"type": "lifespan"}, lifespan.get, send))
+        await lifespan.put({"type": "lifespan.startup"})
+        admitted = asyncio.create_task(request(asgi, scope()))
+        await asyncio.sleep(0.05)
+        await lifespan.put({"type": "lifespan.shutdown"})
+        await asyncio.sleep(0.05)
+        late = await request(asgi, scope())
+        # Still waiting for the admitted request
+        assert "lifespan.shutdown.complete" not in sent
+        release.set()
+        await server
+        return sent, await admitted, late
+
+    sent, admitted, late = asyncio.run(main())
+
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert admitted[0] == 200 and admitted[2] == b"done"
+    assert late[0] == 503 and late[1][b"connection"] == b"close"
+
+
+def test_shutdown_gives_up_after_the_timeout():
+    release = threading.Event()
+    asgi = AsgiApp(blocking(release), workers=1, shutdown_timeout=0.1)
+
+    async def main():
+        asgi._idle = asyncio.Event()
+        admitted = asyncio.create_task(request(asgi, scope()))
+        await asyncio.sleep(0.05)
+        await asgi.shutdown()
+        # Returned with the request still running
+        still_running = not admitted.done()
+        release.set()
+        return still_running, await admitted
+
+    still_running, admitted = asyncio.run(main())
+
+    assert still_running and admitted[0] == 200 and asgi.shutting_down
+
+
+def test_application_reports_to_metrics(client):
+    import Asgi
+    import App
+
+    assert App.app.extensions["asgi"] is Asgi.application
+    assert client.get("/metrics").get_json()["server"]["workers"] == App.app.config['SERVER_WORKERS']
@@ -0,0 +1,74 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from Artifacts import open_artifact, write_artifact
+from Builder import build_neighbor_file, verify_neighbor_file, block_size_for
+from Corpus import Corpus
+
+
+def corpus(n, terms=30, seed=0):
+    rng = np.random.default_rng(seed)
+    dense = rng.random((n, terms)) * (rng.random((n, terms)) < 0.3)
+    return Corpus(normalize(sp.csr_matrix(dense)), [f'term {i}' for i in range(terms)], [f'dish {i}' for i in range(n)])
+
+
+def test_built_file_matches_exact_cosine(tmp_path):
+    dishes = corpus(40)
+    path = str(tmp_path / "dishes.w2v")
+
+    stats = build_neighbor_file(dishes, path, k=5, block_size=6, processes=1)
+
+    assert stats["dishes"] == 40 and stats["k"] == 5
+    assert verify_neighbor_file(dishes, path) == []
+    assert open_artifact(path).names == dishes.dishes
+
+
+def test_processes_build_the_same_file(tmp_path):
+    dishes = corpus(30)
+    build_neighbor_file(dishes, str(tmp_path / "one.w2v"), k=4, block_size=4, processes=1)
+    build_neighbor_file(dishes, str(tmp_path / "two.w2v"), k=4, block_size=4, processes=2)
+
+    one, two = open_artifact(str(tmp_path / "one.w2v")), open_artifact(str(tmp_path / "two.w2v"))
+    assert np.array_equal(np.asarray(one.neighbors), np.asarray(two.neighbors))
+    assert np.array_equal(np.asarray(one.scores), np.asarray(two.scores))
+
+
+def test_single_dish_builds_an_empty_file(tmp_path):
+    path = str(tmp_path / "dishes.w2v")
+
+    build_neighbor_file(corpus(1), path, k=5, processes=1)
+
+    artifact = open_artifact(path)
+    assert artifact.k == 0 and artifact.closest("dish 0") == []
+
+
+def test_block_size_for():
+    assert block_size_for(12 * 1000 * 100, 1000, 1) == 100
+    assert block_size_for(12 * 1000 * 100, 1000, 4) == 25
+    assert block_size_for(1, 1000, 4) == 1
+
+
+def test_block_size_does_not_change_the_file(tmp_path):
+    dishes = corpus(23)
+    for block_size in (1, 5, 64):
+        build_neighbor_file(dishes, str(tmp_path / f'{block_size}.w2v'), k=3, block_size=block_size, processes=1)
+
+    one, five, whole = (open_artifact(str(tmp_path / f'{block_size}.w2v')) for block_size in (1, 5, 64))
+    assert np.allclose(np.asarray(one.scores), np.asarray(five.scores)) and np.allclose(np.asarray(one.scores), np.asarray(whole.scores))
+    assert verify_neighbor_file(dishes, str(tmp_path / "5.w2v"), block_size=4) == []
+
+
+def test_verify_finds_wrong_lists(tmp_path):
+    dishes = corpus(12)
+    path = str(tmp_path / "dishes.w2v")
+    build_neighbor_file(dishes, path, k=3, processes=1)
+
+    artifact = open_artifact(path)
+    neighbors, scores = np.array(artifact.neighbors), np.array(artifact.scores)
+    del artifact
+    neighbors[4] = neighbors[4][::-1]
+    scores[7] += 0.01
+    write_artifact(path, dishes.dishes, neighbors, scores)
+
+    assert verify_neighbor_file(dishes, path) == ["dish 4", "dish 7"]
@@ -0,0 +1,96 @@
+import threading
+
+from Cache import ResponseCache, size_of
+from Store import ModelStore
+from Tfidf import TfidfService
+from test_store import wait_for
+
+
+def test_size_of():
+    assert size_of("crème") == 6 and size_of(b"abc") == 3
+    assert size_of(["Pho"] * 100) > size_of(["Pho"])
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = ResponseCache(max_bytes=30)
+    cache.put("a", "x" * 10, 1)
+    cache.put("b", "y" * 10, 1)
+    assert cache.get("a", 1) == "x" * 10
+
+    cache.put("c", "z" * 15, 1)
+
+    # b was used least recently, and dropping it is enough
+    assert cache.get("b", 1) is None and cache.get("a", 1) and cache.get("c", 1)
+    assert cache.bytes == 25 and cache.evictions == 1
+    cache.put("a", "w" * 5, 1)
+    assert cache.bytes == 20 and len(cache) == 2
+
+
+def test_too_large_values_are_not_cached():
+    cache = ResponseCache(max_bytes=10)
+
+    assert cache.put("big", "x" * 11, 1) == "x" * 11
+    assert cache.get("big", 1) is None and cache.stats()["too_large"] == 1 and cache.bytes == 0
+
+
+def test_newer_version_empties_the_cache_and_older_ones_miss():
+    cache = ResponseCache()
+    cache.put("Pho", "old page", 1)
+
+    assert cache.get("Pho", 2) is None and len(cache) == 0 and cache.stats()["invalidations"] == 1
+    cache.put("Pho", "new page", 2)
+    # A request still on the old snapshot neither sees nor stores anything
+    assert cache.get("Pho", 1) is None
+    assert cache.put("Pho", "stale page", 1) == "stale page" and cache.get("Pho", 2) == "new page"
+
+
+def test_cached_computes_once_per_version():
+    cache = ResponseCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return f'page {len(calls)}'
+
+    assert [cache.cached("Pho", 1, compute) for _ in range(3)] == ["page 1"] * 3
+    assert cache.cached("Pho", 2, compute) == "page 2"
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["hit_ratio"] == 0.5
+
+
+def test_threads_keep_the_byte_count_right():
+    cache = ResponseCache(max_bytes=500)
+
+    def work(thread):
+        for i in range(300):
+            cache.cached(f'{thread}-{i % 40}', 1, lambda: "x" * (i % 17 + 1))
+
+    threads = [threading.Thread(target=work, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.bytes == sum(size for _, size in cache.entries.values()) <= 500
+
+
+def test_app_pages_are_cached_until_the_model_changes(client, app_folder, monkeypatch):
+    import App
+
+    store = ModelStore(app_folder, check_interval=0)
+    store.warm_up()
+    monkeypatch.setattr(App, "store", store)
+
+    first = client.post("/closest2", data={"food-search": "Pho"}).get_data(as_text=True)
+    assert "Bun bo Hue" in first
+    assert client.post("/closest2", data={"food-search": "pho"}).get_data(as_text=True) == first
+    assert client.get("/metrics").get_json()["cache"]["hits"] == 1
+
+    TfidfService(app_folder).add_dish({"Food": "Bun cha", "Text": "Bun cha is a dish.", "Origin": "Vietnam", "WORKING URLs": [], "URL": ""},
+                                      "vietnam noodle soup beef broth rice noodles herbs")
+    wait_for(lambda: store.get().version > 1)
+
+    assert "Bun cha" in client.post("/closest2", data={"food-search": "Pho"}).get_data(as_text=True)
+    metrics = client.get("/metrics").get_json()
+    assert metrics["cache"]["invalidations"] == 1 and metrics["cache"]["version"] == store.get().version
+    assert metrics["model"]["ready"]
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from Corpus import Corpus
+
+DOCUMENTS = {
+    "Pho": "vietnam noodle soup beef broth rice noodles",
+    "Ramen": "japan noodle soup pork broth",
+    "Ratatouille": "france stewed vegetable eggplant",
+    "Crème brûlée": "france custard caramel",
+}
+
+
+@pytest.fixture
+def fitted():
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform(DOCUMENTS.values())
+    return Corpus.from_vectorizer(vectorizer, matrix, list(DOCUMENTS)), vectorizer, matrix.toarray()
+
+
+def test_lookups_match_the_dense_matrix(fitted):
+    corpus, vectorizer, dense = fitted
+    terms = vectorizer.get_feature_names_out().tolist()
+
+    assert corpus.shape == dense.shape and len(corpus) == 4 and "Ramen" in corpus and "Udon" not in corpus
+    assert corpus.weight("Ramen", "pork") == pytest.approx(dense[1, terms.index("pork")])
+    assert corpus.weight("Ramen", "eggplant") == 0.0
+    assert corpus.terms_of("Pho").is_monotonic_decreasing and len(corpus.terms_of("Pho")) == 7
+    assert sorted(corpus.dishes_with("france").index) == ["Crème brûlée", "Ratatouille"]
+    assert [term for term, _ in corpus.top_terms("Ramen", 5)] == corpus.terms_of("Ramen").index[:5].tolist()
+    assert corpus.similarity("Pho", "Ramen") == pytest.approx(float(dense[0] @ dense[1]))
+    frame = corpus.to_frame(["Ramen", "Pho"])
+    np.testing.assert_allclose(frame.to_numpy(), dense[[1, 0]])
+    assert frame.columns.tolist() == terms
+    with pytest.raises(KeyError):
+        corpus.row("Udon")
+
+
+def test_save_and_load_round_trip(fitted, tmp_path):
+    corpus, _, _ = fitted
+
+    corpus.save(str(tmp_path / "corpus.npz"))
+    loaded = Corpus.load(str(tmp_path / "corpus.npz"))
+
+    assert loaded.dishes == corpus.dishes and loaded.terms == corpus.terms
+    assert (loaded.matrix != corpus.matrix).nnz == 0
+    assert loaded.top_terms("Crème brûlée") == corpus.top_terms("Crème brûlée")
+
+
+def test_shape_must_match_the_labels(fitted):
+    corpus, _, _ = fitted
+
+    with pytest.raises(ValueError):
+        Corpus(corpus.matrix, corpus.terms[:-1], corpus.dishes)
+    with pytest.raises(ValueError):
+        Corpus(corpus.matrix, corpus.terms, corpus.dishes + ["Udon"])
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from Embeddings import EmbeddingStore
+from Similarity import find_similar, find_similar_batch
+
+NAMES = [f'country {i}' for i in range(120)]
+
+
+@pytest.fixture
+def weights():
+    rng = np.random.default_rng(0)
+    # Unnormalized, with very different lengths, and one all zero row
+    weights = rng.standard_normal((len(NAMES), 24)) * rng.uniform(0.1, 50, (len(NAMES), 1))
+    weights[7] = 0
+    return weights
+
+
+def exact_cosines(weights):
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    normalized = weights / norms
+    return normalized @ normalized.T
+
+
+@pytest.mark.parametrize("dtype, tolerance, nbytes", [("float32", 1e-6, 4), ("float16", 2e-3, 2), ("int8", 2e-2, 1)])
+def test_dot_products_are_cosines(weights, dtype, tolerance, nbytes):
+    store = EmbeddingStore(weights, NAMES, dtype, block_size=50)
+
+    sims = store.similarities(np.arange(len(NAMES)))
+
+    assert sims.dtype == np.float32 and store.codes.dtype == np.dtype(dtype)
+    assert np.abs(sims - exact_cosines(weights)).max() < tolerance
+    assert np.allclose(store.similarities(3), sims[3])
+    assert store.nbytes <= weights.size * nbytes + 4 * len(NAMES)
+    assert not sims[7].any()
+
+
+def test_vectors_are_unit_length(weights):
+    store = EmbeddingStore(weights, NAMES)
+
+    lengths = np.linalg.norm(store.vectors(), axis=1)
+    assert np.allclose(np.delete(lengths, 7), 1.0, atol=1e-6) and lengths[7] == 0
+    assert np.array_equal(store.vector("country 5"), store.vectors(5))
+    assert np.asarray(store).dtype == np.float32 and "country 5" in store and len(store) == len(NAMES)
+    with pytest.raises(KeyError):
+        store.vector("nowhere")
+
+
+def test_top_neighbors_are_kept_when_quantized(weights):
+    exact = find_similar_batch(NAMES, EmbeddingStore(weights, NAMES), n=5)
+    for dtype in ("float16", "int8"):
+        quantized = find_similar_batch(NAMES, EmbeddingStore(weights, NAMES, dtype), n=5)
+        same_first = (quantized["row"][:, 0] == exact["row"][:, 0]).mean()
+        assert same_first >= 0.95, dtype
+
+
+def test_find_similar_takes_a_store(weights):
+    store = EmbeddingStore(weights, NAMES)
+
+    dists, closest = find_similar("country 2", store, n=4, return_dist=True)
+
+    assert closest[-1] == 2 and np.allclose(dists, exact_cosines(weights)[2], atol=1e-6)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_save_and_load(weights, tmp_path, dtype):
+    store = EmbeddingStore.from_index(weights, {name: i for i, name in enumerate(NAMES)}, dtype)
+    store.save(str(tmp_path / "store.npz"))
+
+    loaded = EmbeddingStore.load(str(tmp_path / "store.npz"))
+
+    assert loaded.rindex == NAMES and loaded.dtype == dtype
+    assert np.array_equal(loaded.similarities(4), store.similarities(4))
+
+
+def test_bad_arguments(weights):
+    with pytest.raises(ValueError):
+        EmbeddingStore(weights, NAMES, "float64")
+    with pytest.raises(ValueError):
+        EmbeddingStore(weights, NAMES[:-1])
@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from glossary_matcher import GlossaryMatcher, words
+
+GLOSSARIES = {
+    "ingredient": ["rice", "rice noodles", "soy", "soy sauce", "fish sauce", "beef", "Coconut milk", "lime"],
+    "technique": ["stir fry", "fry", "braise", "slow cooked"],
+    "flavor": ["sauce", "sour", "sweet and sour", "lime"],
+}
+
+
+def naive_find(glossaries, text):
+    '''Every term at every word position, by comparing word slices.'''
+
+    text_words = words(text)
+    found = set()
+    for category, terms in glossaries.items():
+        for term in terms:
+            term_words = words(term)
+            for start in range(len(text_words) - len(term_words) + 1):
+                if text_words[start:start + len(term_words)] == term_words:
+                    found.add((term, category, start))
+    return found
+
+
+def test_find_matches_a_naive_search_on_random_texts():
+    matcher = GlossaryMatcher(GLOSSARIES)
+    vocabulary = [word for terms in GLOSSARIES.values() for term in terms for word in words(term)] + ["licorice", "riced", "and", "the", "noodle"]
+    rng = random.Random(0)
+
+    for _ in range(200):
+        text = rng.choice([" ", ", ", "-", "  "]).join(rng.choices(vocabulary, k=rng.randint(0, 25)))
+        found = matcher.find(text)
+        assert set(found) == naive_find(GLOSSARIES, text) and len(found) == len(set(found))
+        # In the order they end in the text
+        ends = [start + len(words(term)) for term, _, start in found]
+        assert ends == sorted(ends)
+
+
+def test_whole_words_overlaps_and_categories():
+    matcher = GlossaryMatcher(GLOSSARIES)
+
+    assert matcher.find("Licorice and riced cauliflower") == []
+    assert matcher.tag("Stir-fried? No: stir fry the beef in soy sauce, then lime. Sweet and sour, with soy sauce.") == {
+        "ingredient": ["beef", "soy", "soy sauce", "lime"],
+        "technique": ["stir fry", "fry"],
+        # Ending at the same word, the longer term comes first
+        "flavor": ["sauce", "lime", "sweet and sour", "sour"],
+    }
+    assert matcher.tag("COCONUT MILK")["ingredient"] == ["Coconut milk"]
+    assert GlossaryMatcher(GLOSSARIES, lowercase=False).tag("COCONUT MILK and Coconut milk")["ingredient"] == ["Coconut milk"]
+
+
+def test_tag_many_keeps_the_index_and_skips_missing_texts():
+    texts = pd.Series(["Beef braised slow cooked", np.nan, "rice noodles with fish sauce"], index=["Stew", "Nothing", "Pho"])
+
+    tagged = GlossaryMatcher(GLOSSARIES).tag_many(texts)
+
+    assert tagged.index.tolist() == ["Stew", "Nothing", "Pho"] and tagged.columns.tolist() == list(GLOSSARIES)
+    assert tagged.loc["Stew", "technique"] == ["slow cooked"] and tagged.loc["Stew", "ingredient"] == ["beef"]
+    assert tagged.loc["Nothing"].tolist() == [[], [], []]
+    assert tagged.loc["Pho", "ingredient"] == ["rice", "rice noodles", "fish sauce"] and tagged.loc["Pho", "flavor"] == ["sauce"]
+    assert GlossaryMatcher(GLOSSARIES).tag_many(["beef"]).index.tolist() == [0]
@@ -0,0 +1,78 @@
+import pytest
+
+import benchmarks
+from conftest import PAGES, saved_page
+from html_cleaner import RAW_HTML_CLEANER, CUISINE_LINKS_CLEANER, WIKILINKS_CLEANER, LinkStream, HtmlCleaner, stream_wikilinks
+from wikipedia_functions import parse_wikilinks
+
+CLEANERS = [(WIKILINKS_CLEANER, "bodyContent", True), (CUISINE_LINKS_CLEANER, "bodyContent", False), (RAW_HTML_CLEANER, None, False)]
+
+
+def test_benchmark_cleaner_finds_no_mismatches_on_saved_pages():
+    pages = benchmarks.load_saved_pages(PAGES)
+
+    summary = benchmarks.benchmark_cleaner(pages, repeat=1)
+
+    assert len(pages) >= 2
+    for name, results in summary.items():
+        assert results["mismatches"] == [], name
+
+
+@pytest.mark.parametrize("cleaner, body_id, unidecoded", CLEANERS)
+@pytest.mark.parametrize("case", [case for case, _ in benchmarks.EDGE_CASE_PAGES])
+def test_edge_cases_match_beautifulsoup(case, cleaner, body_id, unidecoded):
+    page = dict(benchmarks.EDGE_CASE_PAGES)[case]
+    expected = benchmarks.soup_links(page, cleaner, body_id, unidecoded)
+
+    assert benchmarks.cleaner_links(page, cleaner, body_id, unidecoded) == expected
+    assert benchmarks.stream_links(page, cleaner, body_id, unidecoded) == expected
+
+
+def test_wikilinks_on_a_messy_page():
+    page = saved_page("Laksa")
+
+    links = benchmarks.stream_links(page, WIKILINKS_CLEANER, unidecoded=True)
+
+    assert {("Noodle_soup", "noodle soup"), ("Peranakans", "Peranakan people"), ("Ph%E1%BB%9F", "pho"), ("Kh%C3%B4_g%C3%A0", "kho  ga"),
+            ("Coconut_milk", "coconut milk"), ("Curry_laksa", "Curry laksa"), ("Category:Noodle_soups", "Noodle soups")} <= links
+    hrefs = {href for href, _ in links}
+    # Links in tables, hidden categories, housekeeping titles, references, a "cuisine" text, image only
+    # and blank texts, and anything outside the body
+    for dropped in ["Malaysia", "Malaysian_cuisine", "Peranakan_cuisine", "Help:IPA/Malay", "Tamarind", "ISBN_(identifier)", "Wayback_Machine",
+                    "Category:Articles_with_short_description", "Category:All_articles_with_unsourced_statements", "Curry_mee", "Space",
+                    "Main_Page", "Wikipedia:About", "Edit_link"]:
+        assert dropped not in hrefs
+
+
+def test_small_chunks_give_the_same_links_and_heading():
+    page = saved_page("Laksa")
+    whole = LinkStream(WIKILINKS_CLEANER, heading_id="firstHeading")
+    chunked = LinkStream(WIKILINKS_CLEANER, heading_id="firstHeading")
+
+    assert list(whole.iter(page)) == list(chunked.iter(page, chunk_size=7))
+    assert whole.heading == chunked.heading == "Laksa"
+
+
+def test_missing_body_raises_attribute_error():
+    page = "<html><body><p><a href='/wiki/Pho'>Pho</a></p></body></html>"
+
+    with pytest.raises(AttributeError):
+        stream_wikilinks(page, WIKILINKS_CLEANER)
+    with pytest.raises(AttributeError):
+        benchmarks.cleaner_links(page, WIKILINKS_CLEANER)
+    assert stream_wikilinks(page, body_id=None) == [("/wiki/Pho", "Pho")]
+
+
+def test_text_following_a_removed_node_is_kept():
+    root = HtmlCleaner(tags=["sup"]).parse("<html><body><p>Laksa<sup>[1]</sup> is spicy</p></body></html>")
+
+    assert root.text_content() == "Laksa is spicy"
+
+
+def test_parse_wikilinks_starts_with_the_page_itself():
+    page = saved_page("Laksa")
+
+    title, links = parse_wikilinks(page, "https://en.wikipedia.org/wiki/Laksa")
+
+    assert title == "Laksa" and links[0] == ("Laksa", "Laksa")
+    assert set(links[1:]) == benchmarks.soup_links(page, WIKILINKS_CLEANER, unidecoded=True)
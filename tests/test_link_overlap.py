@@ -0,0 +1,76 @@
+import math
+import random
+
+import pytest
+
+from link_overlap import LinkOverlap
+from wikipedia_functions import city_compare, compare_places
+
+
+def old_city_compare(names, soups):
+    '''city_compare as it was before link_overlap.py: a compare_places call per pair.'''
+
+    main_dict = dict(zip(names, soups))
+    best_matches = {}
+    for city in main_dict:
+        best_score, closest_city = 0, ''
+        for other_city in main_dict:
+            if other_city != city:
+                score = compare_places(main_dict[city], main_dict[other_city])
+                if score > best_score:
+                    best_score, closest_city = score, other_city
+        best_matches[city] = (closest_city, best_score)
+    return best_matches
+
+
+def places(n=40, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f'Link_{i}' for i in range(150)] + [(f'Link_{i}', f'text {i}') for i in range(20)]
+    names = [f'City {i}' for i in range(n)]
+    # Duplicated links, places sharing nothing, and an empty one
+    link_lists = [rng.choices(vocabulary, k=rng.randint(0, 30)) for _ in names]
+    link_lists[5] = []
+    link_lists[6] = ["Only_here", "Only_here"]
+    return names, link_lists
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_best_matches_match_the_old_city_compare(seed):
+    names, link_lists = places(seed=seed)
+
+    assert LinkOverlap(names, link_lists).best_matches() == old_city_compare(names, link_lists)
+    assert city_compare(names, link_lists, print_all=False) == old_city_compare(names, link_lists)
+
+
+def test_pair_counts_match_compare_places():
+    names, link_lists = places()
+    overlap = LinkOverlap(names, link_lists)
+
+    for i in range(0, len(names), 3):
+        for j in range(len(names)):
+            assert overlap.pair(names[i], names[j]) == compare_places(link_lists[i], link_lists[j])
+    assert overlap.best_matches()["City 5"] == ('', 0) and overlap.best_matches()["City 6"] == ('', 0)
+
+
+def test_other_metrics():
+    names, link_lists = places(12)
+    overlap = LinkOverlap(names, link_lists)
+    sets = [set(links) for links in link_lists]
+    linking = {link: sum(link in links for links in sets) for links in sets for link in links}
+
+    for i in range(len(names)):
+        for j in range(len(names)):
+            shared = sets[i] & sets[j]
+            assert overlap.pair(names[i], names[j], "shared") == len(shared)
+            union = sets[i] | sets[j]
+            assert overlap.pair(names[i], names[j], "jaccard") == pytest.approx(len(shared) / len(union) if union else 0.0)
+            assert overlap.pair(names[i], names[j], "idf") == pytest.approx(sum(math.log(len(names) / linking[link]) for link in shared))
+    with pytest.raises(ValueError):
+        overlap.overlaps("cosine")
+
+
+def test_ties_go_to_the_first_place_and_one_place_has_no_match():
+    overlap = LinkOverlap(["Hanoi", "Hue", "Saigon"], [["Pho", "Rice"], ["Pho"], ["Rice"]])
+
+    assert overlap.best_matches() == {"Hanoi": ("Hue", 1), "Hue": ("Hanoi", 1), "Saigon": ("Hanoi", 1)}
+    assert LinkOverlap(["Hanoi"], [["Pho"]]).best_matches() == {"Hanoi": ('', 0)}
@@ -0,0 +1,99 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+import benchmarks
+from minhash import LinkSketches, MinHasher, estimate_jaccard, link_hash, optimal_bands
+
+
+def jaccard(links, other_links):
+    links, other_links = set(links), set(other_links)
+    return len(links & other_links) / len(links | other_links)
+
+
+@pytest.fixture(scope="module")
+def link_lists():
+    return benchmarks.synthetic_link_lists(pages=600, links=120, seed=3)
+
+
+@pytest.fixture(scope="module")
+def sketches(link_lists):
+    sketches = LinkSketches(threshold=0.5)
+    for name, links in link_lists.items():
+        sketches.add(name, links)
+    return sketches
+
+
+def test_estimates_are_close_to_exact_jaccard(link_lists):
+    hasher = MinHasher(num_perm=256)
+    names = list(link_lists)[:30]
+    signatures = {name: hasher.signature(link_lists[name]) for name in names}
+
+    errors = [abs(estimate_jaccard(signatures[name], signatures[other]) - jaccard(link_lists[name], link_lists[other]))
+              for name in names for other in names if name < other]
+    # The standard error is about 1 / sqrt(256)
+    assert np.mean(errors) < 0.03 and max(errors) < 0.15
+    assert estimate_jaccard(hasher.signature(["a", "b"]), hasher.signature(["b", "a", "a"])) == 1.0
+
+
+def test_similar_finds_the_pages_above_the_threshold(link_lists, sketches):
+    sets = {name: set(links) for name, links in link_lists.items()}
+    missed, wrong, expected_total = 0, 0, 0
+    for name in sets:
+        found = dict(sketches.similar(name))
+        assert name not in found
+        assert list(found.values()) == sorted(found.values(), reverse=True)
+        # Within the estimates' error of the threshold either way is right
+        exact = {other: len(sets[name] & links) / len(sets[name] | links) for other, links in sets.items() if other != name}
+        expected = {other for other, score in exact.items() if score >= 0.6}
+        expected_total += len(expected)
+        missed += len(expected - found.keys())
+        wrong += sum(exact[other] < 0.4 for other in found)
+    assert expected_total > 40 and missed / expected_total < 0.05 and wrong / expected_total < 0.01
+
+
+def test_benchmark_minhash_recall_and_precision(link_lists):
+    summary = benchmarks.benchmark_minhash(link_lists, threshold=0.5, queries=600)
+
+    # Pairs close to the threshold fall either side of it, so neither is near 1 (see the test above)
+    assert summary["recall"] >= 0.8 and summary["precision"] >= 0.7 and summary["mean_error"] < 0.06
+
+
+def test_links_can_be_any_iterable(link_lists, sketches):
+    name = list(link_lists)[0]
+    links = link_lists[name]
+
+    as_list = sketches.similar(links)
+    assert sketches.similar(set(links)) == sketches.similar(tuple(links)) == sketches.similar(link for link in links) == as_list
+    # Passed as links, the page itself is a match
+    assert as_list[0] == (name, 1.0)
+
+
+def test_add_again_and_remove(link_lists, tmp_path):
+    sketches = LinkSketches(threshold=0.5)
+    names = list(link_lists)[:10]
+    for name in names:
+        sketches.add(name, link_lists[name])
+
+    sketches.add(names[0], ["Somewhere_else"])
+    assert len(sketches) == 10 and names[0] not in dict(sketches.similar(names[1], 0.0))
+    sketches.remove(names[0])
+    assert names[0] not in sketches and all(names[0] not in keys for buckets in sketches.buckets for keys in buckets.values())
+
+    sketches.save(str(tmp_path / "sketches.pickle"))
+    loaded = LinkSketches.load(str(tmp_path / "sketches.pickle"))
+    assert loaded.similar(names[1]) == sketches.similar(names[1])
+
+
+def test_link_hash_is_stable():
+    assert link_hash("Pho") == link_hash("Pho") != link_hash(("Pho", "Pho"))
+    assert link_hash("Pho") == int.from_bytes(hashlib.blake2b(b"'Pho'", digest_size=4).digest(), "little")
+
+
+def test_optimal_bands_fit_in_the_signature():
+    for threshold in (0.3, 0.5, 0.8):
+        bands, rows = optimal_bands(threshold, 128)
+        assert bands * rows <= 128
+    # A higher threshold wants longer bands
+    assert optimal_bands(0.8, 128)[1] > optimal_bands(0.3, 128)[1]
@@ -0,0 +1,50 @@
+from Names import NameResolver, fold
+
+NAMES = ["Crème brûlée", "Pho", "Phở bò", "Ratatouille", "Ramen", "Shoyu ramen", "Pad thai", "Paella", "Caponata"]
+
+
+def test_fold():
+    assert fold("  Crème   Brûlée ") == fold("creme brulee") == fold("CREME BRULEE") == "creme brulee"
+
+
+def test_exact_ignores_case_accents_and_spacing():
+    names = NameResolver(NAMES)
+
+    assert names.exact("creme  BRULEE") == "Crème brûlée"
+    assert names.exact("pho bo") == "Phở bò"
+    assert names.exact("pho b") is None
+    assert "RAMEN" in names and "Ramn" not in names
+
+
+def test_prefix_puts_name_starts_before_word_starts():
+    names = NameResolver(NAMES)
+
+    assert names.prefix("ra") == ["Ramen", "Ratatouille", "Shoyu ramen"]
+    assert names.prefix("pa") == ["Paella", "Pad thai"]
+    assert names.prefix("") == [] and names.prefix("zz") == []
+
+
+def test_fuzzy_ranks_by_shared_trigrams():
+    names = NameResolver(NAMES)
+
+    best, score = names.fuzzy("ratatuille", 1)[0]
+    assert best == "Ratatouille" and 0 < score < 1
+    assert names.fuzzy("Ratatouille", 1) == [("Ratatouille", 1.0)]
+    assert all(score > 0.4 for _, score in names.fuzzy("caponatta", cutoff=0.4))
+
+
+def test_resolve_is_exact_only():
+    names = NameResolver(NAMES)
+
+    assert names.resolve("shoyu RAMEN") == "Shoyu ramen"
+    # A typo isn't taken for the dish it looks like, it's only offered
+    assert names.resolve("ratatuille") is None
+    assert "Ratatouille" in names.suggest("ratatuille", 5)
+
+
+def test_suggest_tops_up_prefix_matches_with_fuzzy_ones():
+    names = NameResolver(NAMES)
+
+    assert names.suggest("ra", 3) == ["Ramen", "Ratatouille", "Shoyu ramen"]
+    assert names.suggest("paela", 5)[0] == "Paella"
+    assert names.suggest("qqqq", 5) == []
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from Neighbors import NeighborIndex, top_k_rows, build_neighbor_index
+
+
+def random_matrix(n, terms=40, seed=0):
+    rng = np.random.default_rng(seed)
+    dense = rng.random((n, terms)) * (rng.random((n, terms)) < 0.3)
+    return normalize(sp.csr_matrix(dense))
+
+
+def test_top_k_rows_matches_a_full_sort():
+    sims = np.random.default_rng(1).random((6, 10)).astype(np.float32)
+
+    neighbors, scores = top_k_rows(sims.copy(), 3, offset=2)
+
+    expected = sims.copy()
+    expected[np.arange(6), np.arange(6) + 2] = -np.inf
+    assert np.array_equal(neighbors, np.argsort(-expected, axis=1)[:, :3])
+    assert np.allclose(scores, -np.sort(-expected, axis=1)[:, :3])
+    assert not (neighbors == (np.arange(6) + 2)[:, None]).any()
+
+
+def test_top_k_rows_with_k_0_is_empty():
+    neighbors, scores = top_k_rows(np.ones((3, 1)), 0)
+
+    assert neighbors.shape == scores.shape == (3, 0)
+    assert neighbors.dtype == np.int32 and scores.dtype == np.float32
+
+
+def test_build_neighbor_index_matches_exact_cosine():
+    matrix = random_matrix(50)
+    names = [f'dish {i}' for i in range(50)]
+
+    index = build_neighbor_index(matrix, names, k=5, block_size=7)
+
+    exact = cosine_similarity(matrix)
+    np.fill_diagonal(exact, -np.inf)
+    assert np.allclose(index.scores, -np.sort(-exact, axis=1)[:, :5], atol=1e-6)
+    assert np.allclose(np.take_along_axis(exact, index.neighbors.astype(np.intp), axis=1), index.scores, atol=1e-6)
+
+
+def test_single_dish_has_no_neighbors():
+    index = build_neighbor_index(random_matrix(1), ["Pho"], k=5)
+
+    assert index.k == 0
+    assert index.closest("Pho") == []
+
+
+def test_closest_and_closest_many():
+    names = ["a", "b", "c", "d"]
+    neighbors = np.array([[1, 2], [0, 3], [3, 0], [2, 1]], dtype=np.int32)
+    scores = np.array([[0.9, 0.5], [0.9, 0.4], [0.8, 0.5], [0.8, 0.4]], dtype=np.float32)
+    index = NeighborIndex(names, neighbors, scores)
+
+    assert index.closest("a") == [("b", pytest.approx(0.9)), ("c", pytest.approx(0.5))]
+    assert index.closest("a", 1) == [("b", pytest.approx(0.9))]
+    with pytest.raises(KeyError):
+        index.closest("z")
+
+    rows, _, counts = index.closest_many([0, 2], 2, allowed=np.array([True, False, True, True]))
+    assert rows[0, :counts[0]].tolist() == [2] and rows[1, :counts[1]].tolist() == [3, 0]
+
+
+def test_save_and_load(tmp_path):
+    index = build_neighbor_index(random_matrix(10), [f'dish {i}' for i in range(10)], k=3)
+
+    index.save(str(tmp_path / "index.npz"))
+    loaded = NeighborIndex.load(str(tmp_path / "index.npz"))
+
+    assert loaded.names == index.names
+    assert np.array_equal(loaded.neighbors, index.neighbors) and np.array_equal(loaded.scores, index.scores)
@@ -0,0 +1,122 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from page_cache import PageCache, OfflineCacheMiss, normalize_url
+from wiki_fetcher import Fetcher
+
+
+class Revalidating(BaseHTTPRequestHandler):
+    '''Serves one page per path with an ETag, answering 304 to a matching If-None-Match.'''
+
+    bodies = {}
+    seen = []
+
+    def do_GET(self):
+        body = self.bodies[self.path].encode("utf-8")
+        etag = f'"{len(body)}-{self.path}"'
+        self.seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Wed, 21 Oct 2015 07:28:00 GMT")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Revalidating.bodies = {"/wiki/Pho": "<p>Phở</p>", "/wiki/Ph%E1%BB%9F": "<p>Phở</p>", "/wiki/Ramen": "<p>Ramen</p>"}
+    Revalidating.seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Revalidating)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def cached_fetcher(base_url, cache):
+    return Fetcher(base_url=base_url, requests_per_second=None, backoff=0.0, cache=cache)
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://En.Wikipedia.org:443/wiki/%27Ota_%27ika#History") == "https://en.wikipedia.org/wiki/'Ota_'ika"
+    assert normalize_url("https://en.wikipedia.org/wiki/'Ota_'ika") == "https://en.wikipedia.org/wiki/'Ota_'ika"
+    assert normalize_url("http://localhost:8080/w/index.php?title=Pho&action=raw") == "http://localhost:8080/w/index.php?action=raw&title=Pho"
+    assert normalize_url("https://en.wikipedia.org/wiki/Ph%E1%BB%9F") == normalize_url("https://en.wikipedia.org/wiki/Phở")
+
+
+def test_fresh_entries_are_served_from_disk(server, tmp_path):
+    fetcher = cached_fetcher(server, PageCache(str(tmp_path)))
+
+    first = fetcher.get("https://en.wikipedia.org/wiki/Pho")
+    second = fetcher.get("https://en.wikipedia.org/wiki/Pho#Etymology")
+
+    assert first.text == second.text == "<p>Phở</p>"
+    assert getattr(second, "from_cache", False) and not getattr(first, "from_cache", False)
+    assert Revalidating.seen == [("/wiki/Pho", None)]
+    assert second.headers["ETag"] == first.headers["ETag"]
+    fetcher.close()
+
+
+def test_stale_entries_are_revalidated(server, tmp_path):
+    cache = PageCache(str(tmp_path), ttl=0)
+    fetcher = cached_fetcher(server, cache)
+    url = "https://en.wikipedia.org/wiki/Ramen"
+
+    fetcher.get(url)
+    fetched_at = cache.get(url)["fetched_at"]
+    assert not cache.is_fresh(cache.get(url))
+    revalidated = fetcher.get(url)
+
+    etag = '"12-/wiki/Ramen"'
+    assert Revalidating.seen == [("/wiki/Ramen", None), ("/wiki/Ramen", etag)]
+    # The 304 is answered from the cache, with the record touched
+    assert revalidated.from_cache and revalidated.status_code == 200 and revalidated.text == "<p>Ramen</p>"
+    assert cache.get(url)["fetched_at"] >= fetched_at
+    assert cache.conditional_headers(cache.get(url)) == {"If-None-Match": etag, "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    fetcher.close()
+
+
+def test_ttl_none_is_never_stale(tmp_path):
+    assert PageCache(str(tmp_path), ttl=None).is_fresh({"fetched_at": 0})
+    assert not PageCache(str(tmp_path), ttl=60).is_fresh({"fetched_at": 0})
+
+
+def test_identical_bodies_share_one_object(server, tmp_path):
+    cache = PageCache(str(tmp_path))
+    fetcher = cached_fetcher(server, cache)
+
+    fetcher.get("https://en.wikipedia.org/wiki/Pho")
+    fetcher.get("https://en.wikipedia.org/wiki/Ph%E1%BB%9F")
+    fetcher.get("https://en.wikipedia.org/wiki/Ramen")
+
+    objects = [name for _, _, names in os.walk(tmp_path / "objects") for name in names]
+    urls = [name for _, _, names in os.walk(tmp_path / "urls") for name in names]
+    # Three URLs, two of them with the same body
+    assert len(urls) == 3 and len(objects) == 2
+    fetcher.close()
+
+
+def test_offline_serves_stale_entries_and_raises_on_a_miss(server, tmp_path):
+    fetcher = cached_fetcher(server, PageCache(str(tmp_path), ttl=0))
+    fetcher.get("https://en.wikipedia.org/wiki/Pho")
+    fetcher.close()
+
+    offline = cached_fetcher(server, PageCache(str(tmp_path), ttl=0, offline=True))
+    assert offline.get("https://en.wikipedia.org/wiki/Pho").text == "<p>Phở</p>"
+    with pytest.raises(OfflineCacheMiss):
+        offline.get("https://en.wikipedia.org/wiki/Ramen")
+    assert len(Revalidating.seen) == 1
+    offline.close()
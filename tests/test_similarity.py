@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from Ann import IvfIndex
+from Corpus import Corpus
+from Neighbors import NeighborIndex
+from Similarity import (DishCard, find_similar, find_similar_batch, top_n, dish_card, build_dish_cards, save_dish_cards, load_dish_cards,
+                        get_closest, benchmark_get_closest)
+
+NAMES = [f'dish {i}' for i in range(50)]
+INDEX = {name: i for i, name in enumerate(NAMES)}
+
+
+@pytest.fixture
+def weights():
+    return normalize(np.random.default_rng(0).standard_normal((len(NAMES), 16)))
+
+
+def test_top_n_matches_argsort():
+    dists = np.random.default_rng(1).random(200)
+
+    for n in (1, 7, 199, 200, 500):
+        assert np.array_equal(top_n(dists, n), np.argsort(dists)[-n:])
+
+
+def test_find_similar_returns_the_argsort_tail(weights, capsys):
+    dists, closest = find_similar("dish 3", weights, INDEX, NAMES, n=5, return_dist=True)
+
+    assert np.array_equal(closest, np.argsort(weights @ weights[3])[-5:])
+    assert closest[-1] == 3 and np.allclose(dists, weights @ weights[3])
+    find_similar("dish 3", weights, INDEX, NAMES, n=3)
+    assert capsys.readouterr().out.splitlines()[0].startswith("Country: dish 3")
+    assert find_similar("no such dish", weights, INDEX, NAMES) is None
+
+
+@pytest.mark.parametrize("least", [False, True])
+def test_batch_matches_find_similar_one_at_a_time(weights, least):
+    results = find_similar_batch(NAMES, weights, INDEX, NAMES, n=6, least=least, exclude_self=False, block_size=7)
+
+    assert results.shape == (len(NAMES), 6)
+    for name, row in zip(NAMES, results):
+        dists, closest = find_similar(name, weights, INDEX, NAMES, n=6, least=least, return_dist=True)
+        expected = closest[::-1] if not least else np.argsort(dists)[:6]
+        assert row["row"].tolist() == expected.tolist()
+        assert np.allclose(row["similarity"], dists[expected])
+        assert set(row["query"]) == {name} and row["name"].tolist() == [NAMES[i] for i in expected]
+
+
+def test_batch_leaves_out_the_query_and_unknown_names(weights, capsys):
+    results = find_similar_batch(["dish 1", "nope", "dish 2"], weights, INDEX, NAMES, n=100)
+
+    assert "nope not found" in capsys.readouterr().out
+    assert results.shape == (2, len(NAMES) - 1)
+    assert "dish 1" not in results[0]["name"] and "dish 2" not in results[1]["name"]
+
+
+def test_batch_on_a_corpus_matches_dense_weights(weights):
+    corpus = Corpus(sp.csr_matrix(np.clip(weights, 0, None)), [f'term {i}' for i in range(16)], NAMES)
+    dense = np.clip(weights, 0, None)
+
+    from_corpus = find_similar_batch(NAMES[:10], corpus, n=4)
+    from_dense = find_similar_batch(NAMES[:10], dense, INDEX, NAMES, n=4)
+
+    assert np.array_equal(from_corpus["row"], from_dense["row"])
+    assert np.allclose(from_corpus["similarity"], from_dense["similarity"])
+
+
+def test_find_similar_with_an_ann_index(weights):
+    ann = IvfIndex(n_lists=4, probes=4).build(weights)
+
+    dists, closest = find_similar("dish 9", weights, INDEX, NAMES, n=5, return_dist=True, ann=ann)
+    _, exact = find_similar("dish 9", weights, INDEX, NAMES, n=5, return_dist=True)
+
+    assert closest.tolist() == exact.tolist()
+    assert np.isnan(dists).sum() == len(NAMES) - 5
+
+
+def foods_df():
+    return pd.DataFrame({
+        "Food": ["Pho", "Bun cha", "Caponata", "Pho", "Stroopwafel"],
+        "Text": ["Pho is a soup.  See also Bun bo Hue", "Bun  cha   is grilled pork. " + "x" * 1200, "Caponata is a dish.", "A second Pho row", "Waffles."],
+        "Origin": ["vietnam", "the republic of vietnam", "sicily and italy", "nowhere", np.nan],
+        "WORKING URLs": [["a.jpg", "pho.jpg"], ["bun.jpg"], ["a.jpg", "caponata.jpg", "b.jpg"], [], np.nan],
+        "URL": [f'https://en.wikipedia.org/wiki/{name}' for name in ["Pho", "Bun_cha", "Caponata", "Pho_2", "Stroopwafel"]],
+    })
+
+
+def test_dish_card():
+    pho, bun_cha, caponata, _, stroopwafel = [dish_card(row) for row in foods_df().to_dict("records")]
+
+    assert pho == DishCard("Pho is a soup. ", "Vietnam", "pho.jpg", "https://en.wikipedia.org/wiki/Pho")
+    assert bun_cha.text.startswith("Bun cha is grilled pork. xx") and bun_cha.text.endswith("...") and bun_cha.image_link == ""
+    # Each title cased word keeps a trailing space before they are joined on spaces, as the app always did
+    assert bun_cha.origin == "the  Republic  of  Vietnam"
+    assert caponata.origin == "Sicily  and  Italy" and caponata.image_link == "caponata.jpg"
+    assert stroopwafel.origin == "" and stroopwafel.image_link == ""
+
+
+def test_get_closest_is_the_same_with_and_without_cards(tmp_path):
+    df = foods_df().drop_duplicates("Food")
+    names = ["Pho", "Bun cha", "Caponata", "Stroopwafel"]
+    neighbor_index = NeighborIndex(names, np.array([[2, 1], [3, 0], [0, 1], [1, 2]]), np.array([[0.9, 0.5], [0.8, 0.7], [0.9, 0.1], [0.3, 0.2]]))
+    cards = build_dish_cards(df)
+    save_dish_cards(str(tmp_path / "cards.pickle"), cards)
+
+    for name in names:
+        with_cards = get_closest(name, neighbor_index, None, cards)
+        assert with_cards == get_closest(name, neighbor_index, df) == get_closest(name, neighbor_index, df.set_index("Food"))
+        assert with_cards == get_closest(name, neighbor_index, None, load_dish_cards(str(tmp_path / "cards.pickle")))
+    assert get_closest("Bun cha", neighbor_index, None, cards)[:2] == ("Stroopwafel", "Waffles.")
+    # A name in the df twice gets the card of its first row
+    assert build_dish_cards(foods_df())["Pho"].page_link.endswith("/Pho")
+
+
+def test_benchmark_get_closest_checks_the_results(capsys):
+    df = foods_df().drop_duplicates("Food")
+    neighbor_index = NeighborIndex(df["Food"].tolist(), np.array([[1], [2], [3], [0]]), np.ones((4, 1)))
+
+    timings = benchmark_get_closest(neighbor_index, df, queries=20)
+
+    assert set(timings) == {"df per call", "indexed df", "cards"}
+    assert "same results: True" in capsys.readouterr().out
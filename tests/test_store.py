@@ -0,0 +1,66 @@
+import os
+import time
+
+import pytest
+
+from Similarity import save_dish_cards
+from Store import ModelStore
+from Tfidf import TfidfService
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_loads_once_and_shares_the_snapshot(app_folder):
+    store = ModelStore(app_folder)
+    store.warm_up()
+
+    snapshot = store.get()
+    assert store.is_ready() and store.status()["ready"]
+    assert store.get() is snapshot
+    assert snapshot.names.resolve("pho") == "Pho"
+    assert snapshot.cards["Pho"] is not None
+    assert snapshot.neighbors.closest("Pho", 1)[0][0] == "Bun bo Hue"
+
+
+def test_swaps_in_changed_artifacts(app_folder):
+    store = ModelStore(app_folder, check_interval=0)
+    old = store.get()
+
+    service = TfidfService(app_folder)
+    service.add_dish({"Food": "Bun cha", "Text": "", "Origin": "Vietnam", "WORKING URLs": [], "URL": ""}, "vietnam pork noodles herbs")
+
+    wait_for(lambda: store.get().version > old.version)
+    new = store.get()
+    assert "Bun cha" in new.names and "Bun cha" not in old.names
+    assert new.tag != old.tag
+    # Requests still holding the old snapshot keep a consistent view
+    assert old.neighbors.closest("Pho", 1)[0][0] == "Bun bo Hue"
+
+
+def test_cards_older_than_the_df_are_rebuilt(app_folder):
+    cards = os.path.join(app_folder, "dish_cards.pickle")
+    df = os.stat(os.path.join(app_folder, "initial_df.pickle"))
+    save_dish_cards(cards, {})
+
+    os.utime(cards, ns=(df.st_atime_ns, df.st_mtime_ns + 10 ** 9))
+    store = ModelStore(app_folder)
+    store.warm_up()
+    assert store.get().cards == {}
+
+    os.utime(cards, ns=(df.st_atime_ns, df.st_mtime_ns - 10 ** 9))
+    store = ModelStore(app_folder)
+    store.warm_up()
+    assert set(store.get().cards) == set(store.get().names.names)
+
+
+def test_missing_artifacts_raise_and_report(tmp_path):
+    store = ModelStore(str(tmp_path))
+
+    with pytest.raises(RuntimeError, match="not loaded"):
+        store.get(timeout=1)
+    assert not store.status()["ready"] and store.status()["error"]
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from text_normalize import tidy, tidy_series, condense_term, condense_series, clean_origin_series, ORIGIN_NOTES, DISPUTED
+
+TEXTS = ["pho  vietnamese soup / rice 12 noodle x", "café ― très  bon. a b c", "", "one.two 3 4 5 six", "   "]
+TERMS = ["a b", "c;d", "Café. x= y", "  spaced   out  ", "Ñandú", ""]
+
+
+def test_tidy_series_matches_tidy():
+    assert tidy_series(pd.Series(TEXTS, dtype=object)).tolist() == [tidy(text) for text in TEXTS]
+
+
+def test_condense_series_matches_condense_term():
+    assert condense_series(pd.Series(TERMS, dtype=object)).tolist() == [condense_term(term) for term in TERMS]
+
+
+def test_clean_origin_series_keeps_nan():
+    origins = ["vietnam (north)", np.nan, "japan [1]", "disputed: japan"]
+    cleaned = clean_origin_series(pd.Series(origins, dtype=object)).tolist()
+
+    assert cleaned[0] == "vietnam" and cleaned[2] == "japan"
+    assert np.isnan(cleaned[1])
+    assert cleaned[3] == DISPUTED.sub("", ORIGIN_NOTES.sub("", "disputed: japan"))
+
+
+def test_series_functions_on_empty_series():
+    assert tidy_series(pd.Series([], dtype=object)).tolist() == []
+    assert condense_series(pd.Series([], dtype=object)).tolist() == []
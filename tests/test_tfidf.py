@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import benchmarks
+from conftest import WIKI
+from Tfidf import IncrementalTfidf, TfidfService
+from wikipedia_functions import process_full_df
+
+DOCUMENTS = {
+    "Pho": "vietnam noodle soup beef broth rice noodles herbs",
+    "Bun bo Hue": "vietnam noodle soup beef lemongrass spicy",
+    "Ramen": "japan noodle soup pork broth wheat noodles",
+    "Udon": "japan noodle wheat thick broth",
+    "Ratatouille": "france stewed vegetable eggplant zucchini tomato",
+    "Caponata": "italy sicily eggplant celery capers sweet sour",
+    "Paella": "spain rice saffron seafood chicken",
+}
+
+
+def weights(matrix, terms):
+    '''Returns a {(row, term): weight} dict of a matrix's nonzero weights, for comparing across vocabularies.'''
+
+    matrix = matrix.tocoo()
+    return {(row, terms[column]): round(float(value), 6) for row, column, value in zip(matrix.row, matrix.col, matrix.data)}
+
+
+def assert_matches_a_fresh_fit(model, documents):
+    '''The model's weights and (after a rebuild) its neighbor lists are those of a fit of its current corpus.'''
+
+    current = [documents[name] for name in model.names]
+    fresh = IncrementalTfidf.fit(model.names, current, k=model.k)
+    vectorizer = TfidfVectorizer(stop_words="english")
+    expected = vectorizer.fit_transform(current)
+
+    terms = sorted(model.vocabulary, key=model.vocabulary.get)
+    assert weights(model.matrix(), terms) == weights(expected, vectorizer.get_feature_names_out().tolist())
+    model.rebuild()
+    for name in model.names:
+        assert model.closest(name) == fresh.closest(name)
+    assert all(model.names[model.rows[name]] == name for name in model.names)
+
+
+def test_fit_matches_tfidf_vectorizer():
+    model = IncrementalTfidf.fit(list(DOCUMENTS), list(DOCUMENTS.values()), k=3)
+
+    assert_matches_a_fresh_fit(model, DOCUMENTS)
+    assert [name for name, _ in model.closest("Pho", 1)] == ["Bun bo Hue"]
+    assert model.neighbors.shape == (len(DOCUMENTS), 3)
+
+
+def test_add_update_remove_then_query():
+    names = list(DOCUMENTS)[:5]
+    model = IncrementalTfidf.fit(names, [DOCUMENTS[name] for name in names], k=3)
+
+    model.add("Caponata", DOCUMENTS["Caponata"])
+    assert "Caponata" in model and len(model) == 6
+    assert model.closest("Caponata", 1)[0][0] == "Ratatouille"
+
+    documents = dict(DOCUMENTS, Udon="vietnam noodle soup beef broth rice herbs")
+    model.update("Udon", documents["Udon"])
+    assert model.closest("Pho", 1)[0][0] == "Udon"
+
+    model.remove("Bun bo Hue")
+    assert "Bun bo Hue" not in model and len(model) == 5
+    assert all("Bun bo Hue" != name for dish in model.names for name, _ in model.closest(dish))
+
+    model.add("Paella", DOCUMENTS["Paella"])
+    assert_matches_a_fresh_fit(model, documents)
+
+
+def test_fit_rejects_repeated_names():
+    with pytest.raises(ValueError, match="Ramen"):
+        IncrementalTfidf.fit(["Pho", "Ramen", "Ramen"], ["soup", "noodles", "broth"])
+
+
+def test_add_of_a_name_already_there_updates_it():
+    names = list(DOCUMENTS)
+    model = IncrementalTfidf.fit(names, list(DOCUMENTS.values()), k=3)
+
+    model.add("Udon", "spain rice saffron seafood")
+
+    assert len(model) == len(DOCUMENTS) and model.names.count("Udon") == 1
+    assert model.closest("Udon", 1)[0][0] == "Paella"
+    # One row per name, so remove drops that row and leaves every other mapping right
+    model.remove("Udon")
+    assert "Udon" not in model and model.closest("Paella", 1)[0][0] != "Udon"
+    assert all(model.names[model.rows[name]] == name for name in model.names)
+
+
+def service_df(names):
+    return pd.DataFrame({"Food": names, "Text": [DOCUMENTS[name] for name in names], "Origin": ["x"] * len(names),
+                         "WORKING URLs": [["img.jpg"]] * len(names), "URL": [WIKI + name for name in names],
+                         "CORPUS": [DOCUMENTS[name] for name in names]})
+
+
+def test_service_add_and_remove_reach_a_reloaded_service(tmp_path):
+    service = TfidfService.create(str(tmp_path), service_df(list(DOCUMENTS)[:5]), k=3)
+
+    service.add_dish({"Food": "Caponata", "Text": "", "Origin": "italy", "WORKING URLs": [], "URL": ""}, DOCUMENTS["Caponata"])
+    service.remove_dish("Udon")
+
+    reloaded = TfidfService(str(tmp_path))
+    assert "Caponata" in reloaded.model and "Udon" not in reloaded.model
+    assert reloaded.df["Food"].tolist() == ["Pho", "Bun bo Hue", "Ramen", "Ratatouille", "Caponata"]
+    assert reloaded.model.closest("Caponata", 1)[0][0] == "Ratatouille"
+
+
+def test_service_batch_writes_once(tmp_path, monkeypatch):
+    service = TfidfService.create(str(tmp_path), service_df(list(DOCUMENTS)[:4]), k=3)
+    writes = []
+    write = service._write
+    monkeypatch.setattr(service, "_write", lambda: writes.append(1) or write())
+
+    rows = [{"Food": name, "Text": "", "Origin": "", "WORKING URLs": [], "URL": ""} for name in ["Ratatouille", "Caponata", "Paella"]]
+    service.add_dishes(rows, [DOCUMENTS[row["Food"]] for row in rows])
+    assert len(writes) == 1
+
+    with service.batch():
+        service.add_dish({"Food": "Pho", "Text": "replaced"}, DOCUMENTS["Pho"])
+        service.remove_dish("Paella")
+        service.remove_dish("Ramen")
+        assert len(writes) == 1
+    assert len(writes) == 2
+
+    reloaded = TfidfService(str(tmp_path))
+    assert reloaded.df["Food"].tolist() == ["Bun bo Hue", "Udon", "Ratatouille", "Caponata", "Pho"]
+    assert reloaded.df["Text"].iloc[-1] == "replaced"
+    assert sorted(reloaded.model.names) == sorted(reloaded.df["Food"])
+
+
+def test_add_to_foods_df_reaches_a_tfidf_service_query(offline_pages, rough_nlp, tmp_path):
+    store = str(tmp_path / "processed.pickle")
+    df = pd.DataFrame({"Food": ["Ratatouille", "Pho", "Ramen"],
+                       "Text": ["Ratatouille is a French stewed eggplant dish from France.", "Pho is a Vietnamese soup.", "Ramen is a Japanese soup."],
+                       "Wikilinks raw": [["Category:Vegetable_dishes"], ["Category:Soups"], ["Category:Soups"]],
+                       "Infobox": [["Main ingredients: eggplant, zucchini"], np.nan, np.nan], "Category": ["Vegetable dishes", "Soups", "Soups"],
+                       "Image links": [[], [], []], "URL": [WIKI + "Ratatouille", WIKI + "Pho", WIKI + "Ramen"], "Places": [[], [], []], "Wikilinks": [[], [], []]})
+    processed = process_full_df(df, store=store)
+    app_df = processed.rename(columns={"Image links": "WORKING URLs"})[["Food", "Text", "Origin", "WORKING URLs", "URL", "All together"]]
+    (tmp_path / "app").mkdir()
+    service = TfidfService.create(str(tmp_path / "app"), app_df, documents_column="All together", k=2)
+
+    results = benchmarks.check_add_to_foods_df(processed, WIKI + "Caponata", store, model=service)
+
+    assert results["in_model"] and results["in_app_df"]
+    assert results["closest"][0] == "Ratatouille"
+    assert "Caponata" in TfidfService(str(tmp_path / "app")).model
+
+
+def test_single_dish_and_growing_from_empty():
+    model = IncrementalTfidf.fit(["Pho"], [DOCUMENTS["Pho"]], k=3)
+    assert model.closest("Pho") == []
+    model.update("Pho", DOCUMENTS["Bun bo Hue"])
+
+    model.add("Ramen", DOCUMENTS["Ramen"])
+    assert model.closest("Pho", 1)[0][0] == "Ramen"
+    model.remove("Ramen")
+    assert model.closest("Pho") == []
+
+    empty = IncrementalTfidf(k=3)
+    empty.add("Udon", DOCUMENTS["Udon"])
+    empty.add("Ramen", DOCUMENTS["Ramen"])
+    assert empty.closest("Udon", 1)[0][0] == "Ramen"
@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import WIKI, SavedResponse
+from page_cache import PageCache
+from wiki_crawler import Crawler, canonical_title
+from wiki_fetcher import Fetcher, get_default_fetcher, set_default_fetcher
+from wikipedia_functions import get_all_soups, parse_wikilinks
+
+# URL title -> (heading, links)
+SITE = {
+    "List_of_soups": ("List of soups", ["Pho", "Pho#History", "Ramen", "Noodle_soup_(Vietnam)", "Category:Soups", "File:Pho.jpg", "Udon"]),
+    "Pho": ("Pho", ["Beef", "List_of_soups"]),
+    "Ramen": ("Ramen", ["Udon", "Pork"]),
+    # A redirect to a page already crawled
+    "Noodle_soup_(Vietnam)": ("Pho", ["Beef"]),
+    "Udon": ("Udon", ["Ramen"]),
+    "Beef": ("Beef", []),
+    "Pork": ("Pork", []),
+}
+
+
+def page(heading, links):
+    anchors = " ".join(f'<a href="/wiki/{link}">{link}</a>' for link in links)
+    return f'<html><body><h1 id="firstHeading">{heading}</h1><div id="bodyContent"><p>{heading} {anchors}</p></div></body></html>'
+
+
+@pytest.fixture
+def site(tmp_path):
+    '''Makes the default fetcher serve SITE from an offline PageCache and returns the fetcher.'''
+
+    cache = PageCache(str(tmp_path / "wiki_cache"), ttl=None)
+    for name, (heading, links) in SITE.items():
+        cache.put(WIKI + name, SavedResponse(WIKI + name, page(heading, links)))
+    cache.offline = True
+
+    previous = get_default_fetcher()
+    fetcher = Fetcher(cache=cache, max_workers=2)
+    set_default_fetcher(fetcher)
+    yield fetcher
+    set_default_fetcher(previous)
+    fetcher.close()
+
+
+def test_canonical_title():
+    assert canonical_title(WIKI + "Ph%E1%BB%9F#History") == "Phở"
+    assert canonical_title("/wiki/bun_bo_Hue") == "Bun bo Hue"
+    assert canonical_title(WIKI + "%27Ota_%27ika") == canonical_title(WIKI + "'Ota_'ika") == "'Ota 'ika"
+
+
+def test_crawl_is_breadth_first_and_deduplicated(site):
+    results = Crawler(parse_wikilinks, max_depth=1).crawl(WIKI + "List_of_soups")
+
+    # Namespaced links aren't crawled, a fragment is the same page, the redirect's heading is already
+    # there and the pages two hops away are not reached. Within one hop the order is that of the link set
+    assert list(results)[0] == "List of soups" and sorted(list(results)[1:]) == ["Pho", "Ramen", "Udon"]
+    html, links = results["Ramen"]
+    assert "firstHeading" in html and links[0] == ("Ramen", "Ramen")
+    assert sorted(links[1:]) == [("Pork", "Pork"), ("Udon", "Udon")]
+
+
+def test_crawl_goes_deeper_with_max_depth(site):
+    results = Crawler(parse_wikilinks, max_depth=2).crawl(WIKI + "List_of_soups")
+
+    assert list(results)[0] == "List of soups" and sorted(list(results)[1:4]) == ["Pho", "Ramen", "Udon"]
+    assert sorted(list(results)[4:]) == ["Beef", "Pork"]
+
+
+def test_max_pages_and_resuming_from_a_checkpoint(site, tmp_path):
+    checkpoint = str(tmp_path / "crawl.pickle")
+
+    first = Crawler(parse_wikilinks, max_pages=2, checkpoint=checkpoint).crawl(WIKI + "List_of_soups")
+    assert len(first) == 2 and list(first)[0] == "List of soups"
+
+    resumed = Crawler(parse_wikilinks, checkpoint=checkpoint).crawl(WIKI + "List_of_soups")
+    assert list(resumed)[:2] == list(first)
+    assert sorted(list(resumed)[1:]) == ["Pho", "Ramen", "Udon"]
+
+
+def test_get_all_soups_drops_the_start_page(site):
+    soups = get_all_soups(WIKI + "List_of_soups")
+
+    assert sorted(soups) == ["Pho", "Ramen", "Udon"]
+    # Also when the start URL is a redirect whose page has a different heading
+    assert list(get_all_soups(WIKI + "Noodle_soup_(Vietnam)")) == ["Beef"]
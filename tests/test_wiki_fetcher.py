@@ -0,0 +1,125 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from wiki_fetcher import Fetcher, RateLimiter, retry_after_seconds, get_default_fetcher, set_default_fetcher
+
+
+class Wiki(BaseHTTPRequestHandler):
+    '''Serves /wiki/<name> as a page naming it, after first answering with any statuses queued for it.'''
+
+    queued = {}
+    seen = []
+
+    def do_GET(self):
+        self.seen.append((self.path, self.headers.get("User-Agent")))
+        statuses = self.queued.get(self.path)
+        status = statuses.pop(0) if statuses else 200
+        body = f'<h1 id="firstHeading">{self.path.rsplit("/", 1)[-1]}</h1>'.encode("utf-8") if status == 200 else b"busy"
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def wiki():
+    Wiki.queued, Wiki.seen = {}, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Wiki)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def fetcher(base_url, **options):
+    options = dict(dict(requests_per_second=None, backoff=0.0, max_workers=4), **options)
+    return Fetcher(base_url=base_url, **options)
+
+
+def test_base_url_serves_wikipedia_urls_locally(wiki):
+    with_base = fetcher(wiki)
+
+    response = with_base.get("https://en.wikipedia.org/wiki/Pho")
+
+    assert response.status_code == 200 and ">Pho<" in response.text
+    assert Wiki.seen[0][0] == "/wiki/Pho" and Wiki.seen[0][1].startswith("wiki2vec")
+    assert with_base.resolve("https://example.org/wiki/Pho") == "https://example.org/wiki/Pho"
+    with_base.close()
+
+
+def test_retries_429_and_5xx(wiki):
+    Wiki.queued = {"/wiki/Pho": [503, 429, 502]}
+    retrying = fetcher(wiki, retries=4)
+
+    assert retrying.get("https://en.wikipedia.org/wiki/Pho").status_code == 200
+    assert len(Wiki.seen) == 4
+    retrying.close()
+
+
+def test_gives_up_after_the_last_retry(wiki):
+    Wiki.queued = {"/wiki/Pho": [503, 503, 503]}
+    retrying = fetcher(wiki, retries=1)
+
+    assert retrying.get("https://en.wikipedia.org/wiki/Pho").status_code == 503
+    assert len(Wiki.seen) == 2
+    retrying.close()
+
+
+def test_connection_errors_raise_after_retries():
+    unreachable = Fetcher(base_url="http://127.0.0.1:9", requests_per_second=None, backoff=0.0, retries=1, timeout=0.5)
+
+    with pytest.raises(requests.ConnectionError):
+        unreachable.get("https://en.wikipedia.org/wiki/Pho")
+    unreachable.close()
+
+
+def test_iter_many_keeps_the_order(wiki):
+    names = [f'Dish_{i}' for i in range(12)]
+    many = fetcher(wiki, max_workers=3)
+
+    responses = many.get_many([f'https://en.wikipedia.org/wiki/{name}' for name in names])
+
+    assert [response.text for response in responses] == [f'<h1 id="firstHeading">{name}</h1>' for name in names]
+    many.close()
+
+
+def test_rate_limiter_spaces_out_one_host():
+    limiter = RateLimiter(20)
+
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait("en.wikipedia.org")
+    limiter.wait("example.org")
+
+    assert 0.19 <= time.monotonic() - start < 1.0
+
+
+def test_retry_after_seconds():
+    class Response:
+        def __init__(self, value):
+            self.headers = {"Retry-After": value} if value is not None else {}
+
+    assert retry_after_seconds(Response("3")) == 3.0
+    assert retry_after_seconds(Response(None)) is None
+    assert retry_after_seconds(Response("Wed, 21 Oct 2015 07:28:00 GMT")) == 0.0
+    assert retry_after_seconds(Response("soon")) is None
+
+
+def test_default_fetcher_can_be_replaced():
+    previous = get_default_fetcher()
+    replacement = Fetcher(requests_per_second=None)
+
+    set_default_fetcher(replacement)
+    assert get_default_fetcher() is replacement
+    set_default_fetcher(previous)
+    replacement.close()
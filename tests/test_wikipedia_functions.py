@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pytest
+from bs4 import BeautifulSoup
+
+import benchmarks
+from conftest import WIKI, saved_page
+from wiki_fetcher import get_default_fetcher
+from wikipedia_functions import (SOURCE_COLUMNS, PROCESSED_COLUMNS, add_to_foods_df, parse_infobox, process_full_df,
+                                 update_processed_df, save_df, load_df, condense_list, condense_lists)
+
+URL = WIKI + "Caponata"
+
+
+def foods_df():
+    return pd.DataFrame({
+        "Food": ["Pho", "Ratatouille", "Ramen", "Stroopwafel"],
+        "Text": ["Pho is a Vietnamese soup with rice noodles from Vietnam and Ho Chi Minh, 2 / 3 x.  See also nothing",
+                 "Ratatouille is a French stewed vegetable dish ― from France. Très bon -- café.",
+                 "Ramen is a Japanese noodle soup from Japan.",
+                 "Stroopwafel of the Netherlands is nice a b c 12 13 waffles."],
+        "Wikilinks raw": [["Vietnam", "Category:Soups", "List_of_soups"], ["France", "Category:Vegetable_dishes"], np.nan, ["Category:Dutch_cuisine"]],
+        "Infobox": [["Place of origin: Vietnam (north)", "Main ingredients: rice noodles, beef", "Type: Noodle soup"], np.nan,
+                    ["Place of origin: Disputed: Japan [1]", "Course: main"], ["Region: x"]],
+        "Category": ["Soups", "Vegetable dishes", None, np.nan],
+        "Image links": [["pho.jpg"], ["ratatouille.jpg"], ["ramen.jpg"], ["stroopwafel.jpg"]],
+        "URL": [WIKI + "Pho", WIKI + "Ratatouille", WIKI + "Ramen", WIKI + "Stroopwafel"],
+        "Places": [[], [], [], []],
+        "Wikilinks": [[], [], [], []],
+    })
+
+
+def test_process_full_df_columns(rough_nlp, tmp_path):
+    processed = process_full_df(foods_df(), store=str(tmp_path / "processed.pickle"))
+
+    pho, ratatouille, ramen, stroopwafel = processed.to_dict("records")
+    assert pho["All together"] == "pho vietnamese soup rice noodles vietnam ho chi minh soups soups rice noodles, beef noodle soup soups vietnam ho chi minh vietnam"
+    assert pho["Origin"] == "vietnam"
+    assert pho["Wiki categories"] == ["soups", "soups", "soups"]
+    assert pho["Main ingredients"] == "rice noodles, beef" and pho["Type"] == "noodle soup"
+    assert ratatouille["Text: lemmatized"] == "ratatouille french stewed vegetable dish france trè bon café"
+    assert ratatouille["Text: lemmatized and unidecoded"] == "ratatouille french stewed vegetable dish france tre bon cafe"
+    assert ratatouille["Text: lower case"] == "ratatouille french stewed vegetable dish france tres bon cafe"
+    assert np.isnan(ratatouille["Origin"])
+    # No links and no category
+    assert ramen["Wiki categories"] == [] and ramen["All places"] == ["japan", "disputed: japan"]
+    assert stroopwafel["All together"] == "stroopwafel netherlands nice c waffles dutch cuisine netherlands"
+
+
+def test_update_processed_df_only_processes_new_rows(rough_nlp, tmp_path):
+    store = str(tmp_path / "processed.pickle")
+    df = foods_df()
+    first = process_full_df(df.iloc[:3].copy(), store=store)
+
+    updated = update_processed_df(df.copy(), store=store)
+
+    for column in PROCESSED_COLUMNS:
+        assert repr(updated[column].iloc[:3].tolist()) == repr(first[column].tolist())
+    # The new row, with no place of origin in its infobox
+    assert pd.isna(updated["Origin"].iloc[3]) and updated["Wiki categories"].iloc[3] == ["dutch cuisine"]
+    assert repr(load_df(store)["All together"].tolist()) == repr(updated["All together"].tolist())
+
+
+def test_condense_lists_matches_condense_list():
+    lists = [["a b", "c;d", "Café. x= y"], [], ["  spaced   out  ", "Ñandú"], ["x"]]
+
+    assert condense_lists(lists) == [condense_list(terms) for terms in lists]
+    assert condense_lists(pd.Series(lists, index=[5, 3, 9, 1])) == [condense_list(terms) for terms in lists]
+
+
+def test_parse_infobox():
+    rows = parse_infobox(BeautifulSoup(saved_page("Caponata"), "lxml"))
+
+    assert rows == ["Course: Appetizer", "Place of origin: Italy", "Region or state: Sicily", "Main ingredients: Eggplant, celery, capers"]
+    assert np.isnan(parse_infobox(BeautifulSoup("<html><body><p>No infobox</p></body></html>", "lxml")))
+
+
+def test_add_to_foods_df_row_has_the_columns_processing_needs(offline_pages, rough_nlp):
+    df = foods_df()
+
+    added = add_to_foods_df(URL, df, category="Vegetable dishes")
+
+    assert len(added) == len(df) + 1
+    row = added.iloc[-1]
+    assert row["Food"] == "Caponata" and row["URL"] == URL
+    assert set(SOURCE_COLUMNS) <= set(added.columns)
+    assert {"Category:Sicilian_cuisine", "Category:Eggplant_dishes", "Eggplant", "Caponata"} <= set(row["Wikilinks raw"])
+    assert "Place of origin: Italy" in row["Infobox"]
+    assert row["Category"] == "Vegetable dishes"
+
+    # And processing takes the row as it is
+    processed = process_full_df(added, store=str(offline_pages.folder) + "/processed.pickle").iloc[-1]
+    assert processed["Origin"] == "italy"
+    assert processed["Main ingredients"] == "eggplant, celery, capers"
+    # The link categories (in the order of the link set), then the row's own category
+    assert sorted(processed["Wiki categories"][:2]) == ["eggplant dishes", "sicilian cuisine"]
+    assert processed["Wiki categories"][2] == "vegetable dishes"
+
+
+def test_add_to_foods_df_fetches_the_page_once(offline_pages, rough_nlp, monkeypatch):
+    fetcher = get_default_fetcher()
+    fetched = []
+    get = fetcher.get
+    monkeypatch.setattr(fetcher, "get", lambda url, headers=None: fetched.append(url) or get(url, headers))
+
+    add_to_foods_df(URL, foods_df())
+
+    assert fetched == [URL]
+
+
+def test_add_to_foods_df_loads_the_pickled_df(offline_pages, rough_nlp, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        add_to_foods_df(URL)
+
+    save_df(foods_df(), "foods_df.pickle")
+    added = add_to_foods_df(URL, pickle=True)
+
+    assert added["Food"].tolist() == ["Pho", "Ratatouille", "Ramen", "Stroopwafel", "Caponata"]
+    assert load_df("foods_df.pickle")["Food"].tolist() == added["Food"].tolist()
+
+
+def test_check_add_to_foods_df(offline_pages, rough_nlp, tmp_path):
+    store = str(tmp_path / "processed.pickle")
+    df = process_full_df(foods_df(), store=store)
+
+    results = benchmarks.check_add_to_foods_df(df, URL, store)
+
+    assert results["dish"] == "Caponata"
+    assert results["added_one_row"] and results["stored_rows_unchanged"] and results["new_row_processed"]
+    assert results["infobox_rows"] == 4
+
+
+def test_batch_size_does_not_change_the_output(rough_nlp, tmp_path):
+    one = process_full_df(foods_df(), batch_size=1, store=str(tmp_path / "one.pickle"))
+    # Pipes the pipeline doesn't have are left out of disable
+    many = process_full_df(foods_df(), batch_size=64, disable=("parser", "no such pipe"), store=str(tmp_path / "many.pickle"))
+
+    for column in PROCESSED_COLUMNS:
+        assert repr(one[column].tolist()) == repr(many[column].tolist()), column